@@ -0,0 +1,88 @@
+"""
+Shared fixtures for the hepfile benchmark suite.
+
+The benchmarks use pytest-benchmark and are not part of the unit tests. Run them
+from the top-level directory of the repo with
+
+    python -m pytest benchmarks --benchmark-only
+
+The number of buckets in the benchmark data can be changed with the
+HEPFILE_BENCH_NBUCKETS environment variable, a comma separated list of sizes.
+"""
+import os
+import tracemalloc
+
+import pytest
+import hepfile as hf
+
+# the benchmark data, Poisson distributed jets and muons and a couple of singletons
+SCHEMA = {
+    "jet": {
+        "counter": "njet",
+        "mean": 5,
+        "datasets": {"e": float, "px": float, "py": float, "pz": float},
+    },
+    "muons": {
+        "counter": "nmuon",
+        "mean": 1,
+        "datasets": {"e": float, "px": float, "py": float, "pz": float},
+    },
+    "_SINGLETONS_GROUP_": {"datasets": {"METpx": float, "METpy": float}},
+}
+
+NBUCKETS = [
+    int(n) for n in os.environ.get("HEPFILE_BENCH_NBUCKETS", "1000,10000").split(",")
+]
+
+# the number of rounds of the benchmarks that need a setup before every round
+SETUP_ROUNDS = 5
+
+
+@pytest.fixture(scope="session", params=NBUCKETS, ids=lambda n: f"nbuckets={n}")
+def nbuckets(request):
+    return request.param
+
+
+@pytest.fixture(scope="session")
+def data(nbuckets):
+    return hf.synthetic.make_data(nbuckets, schema=SCHEMA, seed=42)
+
+
+@pytest.fixture(scope="session")
+def hepfile_path(tmp_path_factory, data, nbuckets):
+    filename = str(tmp_path_factory.mktemp("hepfiles") / f"bench_{nbuckets}.h5")
+    hf.write_to_file(filename, data)
+    return filename
+
+
+@pytest.fixture
+def run(benchmark):
+    """
+    Time func with pytest-benchmark and record its peak (python and numpy) memory
+    allocations, in MB, in the extra_info of the benchmark.
+
+    If setup is not None, it is called (untimed) before every round, for
+    benchmarks that change their input, and the benchmark runs SETUP_ROUNDS
+    rounds.
+    """
+
+    def _run(func, *args, setup=None, **kwargs):
+        if setup is not None:
+            setup()
+
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["peak_memory_mb"] = peak / 1e6
+
+        if setup is not None:
+            return benchmark.pedantic(
+                func, args=args, kwargs=kwargs, setup=setup, rounds=SETUP_ROUNDS
+            )
+
+        return benchmark(func, *args, **kwargs)
+
+    return _run
@@ -0,0 +1,94 @@
+"""
+Benchmarks for the converters in awkward_tools, df_tools, dict_tools, csv_tools,
+and arrow_tools
+"""
+import awkward as ak
+import pytest
+import hepfile as hf
+
+
+@pytest.fixture(scope="module")
+def awk(data):
+    return hf.awkward_tools.hepfile_to_awkward(data)
+
+
+@pytest.fixture(scope="module")
+def dfs(data):
+    return hf.df_tools.hepfile_to_df(data)
+
+
+@pytest.fixture(scope="module")
+def events(awk):
+    return ak.to_list(awk)
+
+
+@pytest.fixture(scope="module")
+def csvs(tmp_path_factory, dfs):
+    csvdir = tmp_path_factory.mktemp("csvs")
+    paths = []
+    for group in ("jet", "muons"):
+        path = str(csvdir / f"{group}.csv")
+        dfs[group].to_csv(path, index=False)
+        paths.append(path)
+
+    return paths
+
+
+# awkward_tools
+def test_hepfile_to_awkward(run, data):
+    run(hf.awkward_tools.hepfile_to_awkward, data)
+
+
+def test_awkward_to_hepfile(run, awk):
+    run(hf.awkward_tools.awkward_to_hepfile, awk, write_hepfile=False)
+
+
+# df_tools
+def test_hepfile_to_df(run, data):
+    run(hf.df_tools.hepfile_to_df, data)
+
+
+def test_awkward_to_df(run, awk):
+    run(hf.df_tools.awkward_to_df, awk)
+
+
+def test_df_to_hepfile(run, dfs):
+    run(hf.df_tools.df_to_hepfile, dfs, write_hepfile=False)
+
+
+# dict_tools
+@pytest.mark.parametrize("how_to_pack", ["classic", "awkward"])
+def test_dictlike_to_hepfile(run, events, tmp_path, how_to_pack):
+    run(
+        hf.dict_tools.dictlike_to_hepfile,
+        events,
+        str(tmp_path / "dicts.h5"),
+        how_to_pack=how_to_pack,
+    )
+
+
+def accumulate(events):
+    """Append every event to an EventAccumulator and build the awkward array"""
+
+    acc = hf.dict_tools.EventAccumulator()
+    acc.extend(events)
+    return acc.snapshot()
+
+
+def test_event_accumulator(run, events):
+    run(accumulate, events)
+
+
+# csv_tools
+def test_csv_to_hepfile(run, csvs):
+    run(hf.csv_tools.csv_to_hepfile, csvs, "event_num", write_hepfile=False)
+
+
+# arrow_tools
+def test_hepfile_to_arrow(run, data):
+    run(hf.arrow_tools.hepfile_to_arrow, data)
+
+
+def test_arrow_to_hepfile(run, data):
+    batch = hf.arrow_tools.hepfile_to_arrow(data)
+    run(hf.arrow_tools.arrow_to_hepfile, batch, write_hepfile=False)
@@ -0,0 +1,48 @@
+"""
+Benchmarks for skimming, merging, and splitting hepfiles
+"""
+import pytest
+import hepfile as hf
+
+
+def two_jets(data):
+    """Keep the buckets with at least two jets"""
+
+    return data["jet/njet"] >= 2
+
+
+def test_skim(run, hepfile_path, nbuckets, tmp_path):
+    run(
+        hf.skim,
+        hepfile_path,
+        str(tmp_path / "skim.h5"),
+        two_jets,
+        chunk_size=max(1, nbuckets // 4),
+    )
+
+
+@pytest.fixture(scope="module")
+def shards(tmp_path_factory, nbuckets):
+    """Four compressed shards, like the output of parallel jobs"""
+
+    shard_dir = tmp_path_factory.mktemp("shards")
+    paths = []
+    for i in range(4):
+        path = str(shard_dir / f"shard{i}.h5")
+        hf.synthetic.generate(path, nbuckets, seed=i, comp_type="gzip")
+        paths.append(path)
+
+    return paths
+
+
+def test_merge(run, shards, tmp_path):
+    run(hf.merge, shards, str(tmp_path / "merged.h5"))
+
+
+def test_split(run, hepfile_path, tmp_path):
+    outfiles = [str(tmp_path / f"split{i}.h5") for i in range(4)]
+    run(hf.split, hepfile_path, outfiles)
+
+
+def test_merge_virtual(run, shards, tmp_path):
+    run(hf.merge, shards, str(tmp_path / "virtual.h5"), virtual=True)
@@ -0,0 +1,21 @@
+"""
+Benchmarks for the time it takes to import hepfile in a fresh interpreter
+"""
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "pass",
+        "import hepfile",
+        "import hepfile; hepfile.awkward_tools",
+        "import hepfile; hepfile.df_tools",
+    ],
+)
+def test_import(benchmark, statement):
+    # "pass" is the startup time of the interpreter itself, for reference
+    benchmark(subprocess.run, [sys.executable, "-c", statement], check=True)
@@ -0,0 +1,29 @@
+"""
+Benchmarks for processing hepfiles in parallel
+"""
+import numpy as np
+import pytest
+import hepfile as hf
+
+
+def jet_energy_histogram(data):
+    counts, _ = np.histogram(data["jet/e"], bins=100, range=(0, 500))
+    return counts
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_process(run, hepfile_path, nbuckets, max_workers):
+    run(
+        hf.process,
+        hepfile_path,
+        jet_energy_histogram,
+        max_workers=max_workers,
+        chunk_size=max(1, nbuckets // 8),
+    )
+
+
+def test_load_shared(run, hepfile_path):
+    def load_and_close():
+        hf.load_shared(hepfile_path).close()
+
+    run(load_and_close)
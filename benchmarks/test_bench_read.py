@@ -0,0 +1,87 @@
+"""
+Benchmarks for reading hepfiles and unpacking buckets
+"""
+import asyncio
+
+import numpy as np
+import pytest
+import hepfile as hf
+
+
+def test_load(run, hepfile_path):
+    run(hf.load, hepfile_path)
+
+
+def test_load_subset(run, hepfile_path, nbuckets):
+    run(hf.load, hepfile_path, subset=(nbuckets // 4, nbuckets // 2))
+
+
+def test_load_desired_groups(run, hepfile_path):
+    run(hf.load, hepfile_path, desired_groups=["jet"])
+
+
+def test_file_load_subset(run, hepfile_path, nbuckets):
+    # the file is already open and its counters are cached
+    with hf.File(hepfile_path) as f:
+        f.load(subset=(0, 1))
+        run(f.load, subset=(nbuckets // 4, nbuckets // 2))
+
+
+def unpack_all(data, bucket):
+    """Unpack every bucket in data one at a time"""
+
+    for i in range(hf.get_nbuckets_in_data(data)):
+        hf.unpack(bucket, data, i)
+
+
+def test_unpack(run, hepfile_path):
+    data, bucket = hf.load(hepfile_path)
+    run(unpack_all, data, bucket)
+
+
+def get_nearby_buckets(f, start):
+    """Fetch 100 buckets next to each other by their index"""
+
+    for i in range(start, start + 100):
+        f.get_bucket(i)
+
+
+def test_get_bucket(run, hepfile_path, nbuckets):
+    with hf.File(hepfile_path) as f:
+        run(get_nearby_buckets, f, nbuckets // 2 - 50)
+
+
+def test_load_subset_indices(run, hepfile_path, nbuckets):
+    rng = np.random.default_rng(42)
+    indices = np.sort(rng.choice(nbuckets, size=max(1, nbuckets // 100), replace=False))
+    run(hf.load, hepfile_path, subset=indices)
+
+
+def iterate_and_sum(hepfile_path, prefetch):
+    """Read the file in chunks and do some work on each chunk"""
+
+    total = 0.0
+    for data, _ in hf.iterate(hepfile_path, chunk_size=10_000, prefetch=prefetch):
+        total += np.sort(data["jet/e"]).sum()
+
+    return total
+
+
+@pytest.mark.parametrize("prefetch", [0, 2])
+def test_iterate(run, hepfile_path, prefetch):
+    run(iterate_and_sum, hepfile_path, prefetch)
+
+
+def load_many_async(hepfile_path, nfiles):
+    """Load the same file nfiles times at once with hepfile.load_async"""
+
+    async def load_all():
+        return await asyncio.gather(
+            *[hf.load_async(hepfile_path) for _ in range(nfiles)]
+        )
+
+    return asyncio.run(load_all())
+
+
+def test_load_async(run, hepfile_path):
+    run(load_many_async, hepfile_path, 8)
@@ -0,0 +1,59 @@
+"""
+Benchmarks for packing buckets and writing hepfiles
+"""
+import shutil
+
+import numpy as np
+import pytest
+import hepfile as hf
+
+
+def pack_buckets(nbuckets):
+    """Fill a data dictionary one bucket at a time with hepfile.pack"""
+
+    data = hf.initialize()
+    hf.create_group(data, "jet", counter="njet")
+    hf.create_dataset(data, ["e", "px", "py", "pz"], group="jet", dtype=float)
+    hf.create_dataset(data, ["METpx", "METpy"], dtype=float)
+
+    bucket = hf.create_single_bucket(data)
+    rng = np.random.default_rng(42)
+    for num in rng.poisson(5, size=nbuckets):
+        for dataset in ("e", "px", "py", "pz"):
+            bucket[f"jet/{dataset}"] = list(rng.random(num))
+        bucket["METpx"] = rng.random()
+        bucket["METpy"] = rng.random()
+        hf.pack(data, bucket)
+
+    return data
+
+
+def test_pack(run, nbuckets):
+    run(pack_buckets, nbuckets)
+
+
+@pytest.mark.parametrize("comp_type", [None, "gzip"])
+def test_write_to_file(run, data, tmp_path, comp_type):
+    run(hf.write_to_file, str(tmp_path / "write.h5"), data, comp_type=comp_type)
+
+
+def test_generate(run, nbuckets, tmp_path):
+    run(
+        hf.synthetic.generate,
+        str(tmp_path / "generate.h5"),
+        nbuckets,
+        seed=42,
+        chunk_size=max(1, nbuckets // 4),
+    )
+
+
+def test_append(run, data, tmp_path):
+    base = str(tmp_path / "base.h5")
+    filename = str(tmp_path / "append.h5")
+    hf.write_to_file(base, data, append=True)
+
+    def setup():
+        # start every round from the same file, so it doesn't grow over the rounds
+        shutil.copyfile(base, filename)
+
+    run(hf.write_to_file, filename, data, append=True, setup=setup)
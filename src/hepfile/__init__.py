@@ -6,7 +6,9 @@ Entries in Parallel-file.
 See hepfile.readthedocs.io for detailed documentation!
 """
 from __future__ import annotations
+import importlib
 from importlib.util import find_spec
+from types import ModuleType
 
 from ._version import __version__
 from .errors import MissingOptionalDependency
@@ -14,36 +16,45 @@ from .errors import MissingOptionalDependency
 # explicitly set the package variable to ensure relative import work
 __package__ = "hepfile"
 
-# set some other module wide attributes
-_AWKWARD = False
-_PANDAS = False
-
 # import modules
 from hepfile.read import *
 from hepfile.write import *
+from hepfile.file_tools import *
+from hepfile.parallel import *
+from hepfile.async_tools import *
 import hepfile.dict_tools
-
-if find_spec("awkward") is not None:
-    import hepfile.awkward_tools
-
-    _AWKWARD = True
-
-if find_spec("pandas") is not None:
-    import hepfile.df_tools
-    import hepfile.csv_tools
-
-    _PANDAS = True
+import hepfile.stats
+import hepfile.synthetic
+
+# The optional backends are only imported the first time they are accessed (see
+# __getattr__ below) so that importing hepfile doesn't also import awkward, pandas,
+# and pyarrow. Here we only check that they are installed.
+_AWKWARD = find_spec("awkward") is not None
+_PANDAS = find_spec("pandas") is not None
+_ARROW = find_spec("pyarrow") is not None
+
+# map the lazily imported submodules to the optional dependency they need
+_OPTIONAL_MODULES = {
+    "awkward_tools": "awkward",
+    "df_tools": "pandas",
+    "csv_tools": "pandas",
+    "arrow_tools": "arrow",
+}
 
 # put all these variables in __all__
-__all__ = ("__version__", "__package__", "_AWKWARD", "_PANDAS")
+__all__ = ("__version__", "__package__", "_AWKWARD", "_PANDAS", "_ARROW")
 
 
 # override getattr
-def __getattr__(name: str) -> bool:
-    if not _AWKWARD and name == "awkward_tools":
-        raise MissingOptionalDependency("awkward")
-
-    if not _PANDAS and name == "csv_tools" or name == "df_tools":
-        raise MissingOptionalDependency("pandas")
-
-    raise AttributeError
+def __getattr__(name: str) -> ModuleType:
+    if name not in _OPTIONAL_MODULES:
+        raise AttributeError(f"module 'hepfile' has no attribute '{name}'")
+
+    dependency = _OPTIONAL_MODULES[name]
+    installed = {"awkward": _AWKWARD, "pandas": _PANDAS, "arrow": _ARROW}
+    if not installed[dependency]:
+        raise MissingOptionalDependency(dependency)
+
+    # importing the submodule also sets it as an attribute of hepfile, so this
+    # is only called the first time it is accessed
+    return importlib.import_module(f"hepfile.{name}")
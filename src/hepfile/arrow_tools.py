@@ -0,0 +1,310 @@
+"""
+Tools to convert between hepfile data and Apache Arrow RecordBatches, and to
+stream hepfiles to and from Parquet files.
+
+Each row of a RecordBatch is one bucket. Singletons are plain columns and every
+other group is a single :code:`list<struct>` column whose list offsets are built
+from the group counter, so the dataset buffers are shared rather than copied.
+
+Note: The base installation package does not contain these tools!
+You must have installed hepfile with either \n
+1) :code:`python -m pip install hepfile[arrow]`, or \n
+2) :code:`python -m pip install hepfile[all]`
+"""
+from __future__ import annotations
+
+import itertools
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from hepfile.read import iterate, _offsets_from_counter
+from hepfile.write import (
+    initialize,
+    create_group,
+    create_dataset,
+    write_to_file,
+    _stream_to_file,
+)
+from hepfile.dict_tools import _get_dtype
+from hepfile.errors import InputError
+
+
+################################################################################
+def hepfile_to_arrow(data: dict, groups: list[str] = None) -> pa.RecordBatch:
+    """
+    Converts hepfile data to an Arrow RecordBatch with one row per bucket.
+
+    Singletons become plain columns and each group becomes a list<struct> column
+    named after the group, where the struct fields are the datasets in the group.
+    Numeric datasets are not copied.
+
+    Args:
+        data (dict): data object either loaded from a hepfile or about to be
+                     written to a hepfile.
+        groups (list): groups to include, None (default) means include all groups.
+                       Use '_SINGLETONS_GROUP_' to include the singletons.
+
+    Returns:
+        pa.RecordBatch: RecordBatch of the requested groups
+
+    Raises:
+        InputError: Something is wrong with the specified input
+    """
+
+    if isinstance(groups, str):
+        groups = [groups]
+
+    if groups is None:
+        groups = list(data["_GROUPS_"].keys())
+
+    if not all(group in data["_GROUPS_"] for group in groups):
+        raise InputError("Groups must be a subset of the group names in data!")
+
+    counters = set(data["_LIST_OF_COUNTERS_"])
+
+    columns = []
+    names = []
+    for group in groups:
+        if group == "_SINGLETONS_GROUP_":
+            for dataset in data["_GROUPS_"][group]:
+                if dataset == "COUNTER" or dataset not in data:
+                    continue
+                columns.append(_to_arrow_array(data[dataset]))
+                names.append(dataset)
+            continue
+
+        children = []
+        fields = []
+        for dataset in data["_GROUPS_"][group]:
+            name = f"{group}/{dataset}"
+            if name in counters or name not in data:
+                continue
+            children.append(_to_arrow_array(data[name]))
+            fields.append(dataset)
+
+        if len(children) == 0:
+            continue
+
+        counter = data["_MAP_DATASETS_TO_COUNTERS_"][group]
+        offsets = _offsets_from_counter(data[counter])
+
+        # Arrow lists use 32 bit offsets, so very large groups need large lists
+        list_type = pa.ListArray
+        if offsets[-1] > np.iinfo(np.int32).max:
+            list_type = pa.LargeListArray
+        else:
+            offsets = offsets.astype(np.int32)
+
+        columns.append(
+            list_type.from_arrays(
+                pa.array(offsets), pa.StructArray.from_arrays(children, fields)
+            )
+        )
+        names.append(group)
+
+    return pa.RecordBatch.from_arrays(columns, names)
+
+
+################################################################################
+def arrow_to_hepfile(
+    batch: pa.RecordBatch | pa.Table | Iterable[pa.RecordBatch],
+    outfile: str = None,
+    write_hepfile: bool = True,
+    **kwargs,
+) -> dict:
+    """
+    Converts an Arrow RecordBatch (or Table) with one row per bucket to hepfile data.
+    The opposite of `hepfile.arrow_tools.hepfile_to_arrow`.
+
+    list<struct> columns become groups with a counter named n<group> and every
+    other column becomes a singleton. The input can also be an iterator of
+    RecordBatches (like a `pyarrow.RecordBatchReader`), in which case each batch is
+    appended to outfile as it is read.
+
+    Args:
+        batch (pa.RecordBatch): Arrow data to convert, or an iterator of them
+        outfile (str): output file name, required if write_hepfile is True
+        write_hepfile (bool): should we write the hepfile data to a hepfile?
+        **kwargs: passed to `hepfile.write.write_to_file`
+
+    Returns:
+        dict: hepfile data dictionary. If the input is an iterator of batches this is
+              the data dictionary of only the last batch.
+
+    Raises:
+        InputError: If something is wrong with the specific input.
+    """
+
+    if write_hepfile and outfile is None:
+        raise InputError("Please provide an outfile path if write_hepfile=True!")
+
+    if isinstance(batch, (Iterator, list, tuple, pa.RecordBatchReader)):
+        if not write_hepfile:
+            raise InputError(
+                "Batches of arrow data can only be streamed to a hepfile! "
+                + "Please set write_hepfile=True."
+            )
+
+        datas = (arrow_to_hepfile(item, write_hepfile=False) for item in batch)
+        data = _stream_to_file(outfile, datas, **kwargs)
+        if data is None:
+            raise InputError("There were no RecordBatches in the input!")
+        return data
+
+    if isinstance(batch, pa.Table):
+        batch = batch.combine_chunks()
+    elif not isinstance(batch, pa.RecordBatch):
+        raise InputError("Please input an Arrow RecordBatch or Table!")
+
+    data = initialize()
+    for name in batch.schema.names:
+        column = batch.column(name)
+        if isinstance(column, pa.ChunkedArray):
+            column = column.combine_chunks()
+
+        if pa.types.is_list(column.type) or pa.types.is_large_list(column.type):
+            if not pa.types.is_struct(column.type.value_type):
+                raise InputError(
+                    f"Column {name} is a list but not a list of structs! Groups "
+                    + "must be stored as list<struct> columns."
+                )
+
+            counter = f"n{name}"
+            create_group(data, name, counter=counter)
+
+            # these both respect any slicing of the arrays, unlike column.values
+            # and StructArray.field
+            children = column.flatten().flatten()
+            for field, child in zip(column.type.value_type, children):
+                values = _to_numpy(child)
+                create_dataset(data, field.name, group=name, dtype=_get_dtype(values))
+                data[f"{name}/{field.name}"] = values
+
+            offsets = column.offsets.to_numpy()
+            data[f"{name}/{counter}"] = np.diff(offsets).astype(np.int32)
+
+        else:
+            values = _to_numpy(column)
+            create_dataset(data, name, dtype=_get_dtype(values))
+            data[name] = values
+
+    data["_SINGLETONS_GROUP_/COUNTER"] = np.ones(batch.num_rows, dtype=int)
+
+    if write_hepfile:
+        write_to_file(outfile, data, **kwargs)
+
+    return data
+
+
+################################################################################
+def iter_record_batches(
+    filename: str, batch_size: int = 100_000, groups: list[str] = None
+) -> Iterator[pa.RecordBatch]:
+    """
+    Read a hepfile as a stream of Arrow RecordBatches, batch_size buckets at a time.
+
+    Args:
+        filename (str): hepfile to read
+        batch_size (int): number of buckets in each RecordBatch. Default is 100,000.
+        groups (list): groups (or full dataset names) to read, None (default) means
+                       read all groups. Use '_SINGLETONS_GROUP_' to read the
+                       singletons.
+
+    Yields:
+        pa.RecordBatch: The next batch_size buckets in the file
+    """
+
+    for data, _ in iterate(
+        filename, chunk_size=batch_size, desired_groups=groups, match="exact"
+    ):
+        yield hepfile_to_arrow(data)
+
+
+################################################################################
+def hepfile_to_parquet(
+    filename: str,
+    outfile: str,
+    batch_size: int = 100_000,
+    groups: list[str] = None,
+    **kwargs,
+) -> str:
+    """
+    Convert a hepfile to a Parquet file, batch_size buckets at a time.
+
+    Args:
+        filename (str): hepfile to read
+        outfile (str): path to the Parquet file to write
+        batch_size (int): number of buckets to convert at once. Default is 100,000.
+        groups (list): groups to read, None (default) means read all groups
+        **kwargs: passed to `pyarrow.parquet.ParquetWriter`
+
+    Returns:
+        str: path to the output Parquet file
+    """
+
+    batches = iter_record_batches(filename, batch_size=batch_size, groups=groups)
+    first = next(batches, None)
+    if first is None:
+        raise InputError(f"There are no buckets in {filename}!")
+
+    with pq.ParquetWriter(outfile, first.schema, **kwargs) as writer:
+        for batch in itertools.chain([first], batches):
+            writer.write_batch(batch)
+
+    return outfile
+
+
+################################################################################
+def parquet_to_hepfile(
+    filename: str, outfile: str, batch_size: int = 100_000, **kwargs
+) -> str:
+    """
+    Convert a Parquet file with one row per bucket to a hepfile, batch_size rows
+    at a time. The columns must follow the format of
+    `hepfile.arrow_tools.hepfile_to_arrow`.
+
+    Args:
+        filename (str): Parquet file to read
+        outfile (str): path to the hepfile to write
+        batch_size (int): number of rows to convert at once. Default is 100,000.
+        **kwargs: passed to `hepfile.write.write_to_file`
+
+    Returns:
+        str: path to the output hepfile
+    """
+
+    parquet_file = pq.ParquetFile(filename)
+    arrow_to_hepfile(
+        parquet_file.iter_batches(batch_size=batch_size), outfile=outfile, **kwargs
+    )
+
+    return outfile
+
+
+################################################################################
+def _to_arrow_array(values: np.ndarray) -> pa.Array:
+    """
+    Private method to convert a dataset to an Arrow array. Byte strings are
+    decoded, everything else is passed to Arrow without a copy.
+    """
+
+    values = np.asarray(values)
+    if values.dtype.kind in {"O", "S"}:
+        array = pa.array(values)
+        if pa.types.is_binary(array.type):
+            array = array.cast(pa.string())
+        return array
+
+    return pa.array(values)
+
+
+def _to_numpy(array: pa.Array) -> np.ndarray:
+    """
+    Private method to convert an Arrow array to numpy. Numeric arrays without
+    nulls share memory with the Arrow array.
+    """
+
+    return array.to_numpy(zero_copy_only=False)
@@ -0,0 +1,346 @@
+"""
+Async versions of the functions that read hepfiles, for code that runs on an
+asyncio event loop.
+
+The HDF5 work runs on a bounded pool of worker threads (or processes), so the
+event loop is never blocked and at most max_workers files are read at the same
+time. The other calls wait in a queue. Cancelling a call that is still waiting
+removes it from the queue, a call that has already started runs to the end but
+its result is dropped.
+
+.. code-block:: python
+
+    async def handle(request):
+        data, bucket = await hepfile.load_async(request.filename, subset=(0, 100))
+        async for chunk, _ in hepfile.iterate_async("big.h5", chunk_size=10_000):
+            ...
+
+Use a `hepfile.async_tools.AsyncReader` to choose the number of workers, or to
+run the reads in processes. The module level functions share one reader with
+`hepfile.constants.async_max_workers` threads.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+
+from hepfile import constants
+from hepfile.errors import InputError
+from hepfile.read import (
+    load,
+    get_nbuckets_in_file,
+    get_file_metadata,
+    get_file_header,
+    _check_chunk_size,
+    _check_prefetch,
+)
+
+__all__ = [
+    "AsyncReader",
+    "load_async",
+    "iterate_async",
+    "get_nbuckets_in_file_async",
+    "get_file_metadata_async",
+    "get_file_header_async",
+]
+
+# the reader used by the module level functions, created when it is first needed
+_DEFAULT_READER = None
+
+
+################################################################################
+class AsyncReader:
+    """
+    Runs the reading functions of hepfile on a bounded pool of workers and awaits
+    their results.
+
+    h5py only runs one HDF5 call at a time in a process, so with threads (the
+    default) the reads take turns in HDF5 while the rest of the work, like
+    converting to the return_type, and the event loop run alongside them. With
+    processes=True the reads really run at the same time, but the outputs are
+    copied back from the worker processes.
+
+    .. code-block:: python
+
+        async with hepfile.AsyncReader(max_workers=8) as reader:
+            results = await asyncio.gather(
+                *[reader.load(filename) for filename in filenames]
+            )
+
+    Attributes:
+        max_workers (int): maximum number of calls that run at the same time
+        processes (bool): True if the calls run in worker processes
+    """
+
+    def __init__(
+        self, max_workers: int = constants.async_max_workers, processes: bool = False
+    ):
+        """
+        Args:
+            max_workers (int): maximum number of calls that run at the same time.
+                               Default is `hepfile.constants.async_max_workers`.
+            processes (bool): True to run the calls in worker processes instead of
+                              threads. Default is False.
+
+        Raises:
+            InputError: If max_workers isn't a positive integer
+        """
+
+        if not isinstance(max_workers, (int, np.integer)) or max_workers <= 0:
+            raise InputError("max_workers must be a positive integer!")
+
+        self.max_workers = max_workers
+        self.processes = processes
+
+        executor_type = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self._executor: Executor = executor_type(max_workers=max_workers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        workers = "processes" if self.processes else "threads"
+        return f"<hepfile.AsyncReader ({self.max_workers} {workers})>"
+
+    def close(self) -> None:
+        """
+        Shut down the workers. Calls that are still waiting are cancelled, calls
+        that are running are finished in the background.
+        """
+
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) on the workers and await its result. With
+        processes=True func, its arguments, and its output must be picklable.
+
+        Args:
+            func (Callable): the function to run
+            *args: positional arguments of func
+            **kwargs: keyword arguments of func
+
+        Returns:
+            the output of func
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def load(self, filename: str, **kwargs) -> tuple[dict, dict]:
+        """
+        Async version of `hepfile.read.load`.
+
+        Args:
+            filename (str): Name of the input file
+            **kwargs: passed to `hepfile.read.load`, like desired_groups or subset
+
+        Returns:
+            tuple(dict, dict): Selected data from HDF5, An empty bucket dictionary
+        """
+
+        return await self.run(load, filename, **kwargs)
+
+    async def iterate(
+        self,
+        filename: str,
+        chunk_size: int = 100_000,
+        prefetch: int = 1,
+        **kwargs,
+    ) -> AsyncIterator[tuple[dict, dict]]:
+        """
+        Async version of `hepfile.read.iterate`. Each chunk is read with
+        `hepfile.read.load` on the workers, so use chunks that are big compared to
+        the time it takes to open the file.
+
+        Args:
+            filename (str): Name of the input file
+            chunk_size (int): Number of buckets to read in each chunk.
+                              Default is 100,000.
+            prefetch (int): Number of chunks that are read ahead while the caller
+                            works on the current one. Default is 1.
+            **kwargs: passed to `hepfile.read.load`, like desired_groups
+
+        Yields:
+            tuple(dict, dict): Data from one chunk of the file, An empty bucket
+                               dictionary
+
+        Raises:
+            InputError: If chunk_size is not a positive integer or prefetch is
+                        negative
+        """
+
+        _check_chunk_size(chunk_size)
+        _check_prefetch(prefetch)
+
+        nbuckets = await self.get_nbuckets(filename)
+
+        pending = deque()
+        try:
+            for low in range(0, nbuckets, chunk_size):
+                subset = [low, min(low + chunk_size, nbuckets)]
+                pending.append(
+                    asyncio.ensure_future(self.load(filename, subset=subset, **kwargs))
+                )
+                if len(pending) > prefetch:
+                    yield await pending.popleft()
+
+            while len(pending) > 0:
+                yield await pending.popleft()
+        finally:
+            # stop reading ahead when the caller stops iterating
+            for task in pending:
+                task.cancel()
+
+    async def get_nbuckets(self, filename: str) -> int:
+        """
+        Async version of `hepfile.read.get_nbuckets_in_file`.
+
+        Args:
+            filename (str): Name of the input file
+
+        Returns:
+            int: number of buckets in filename
+        """
+
+        return await self.run(get_nbuckets_in_file, filename)
+
+    async def get_metadata(self, filename: str) -> dict:
+        """
+        Async version of `hepfile.read.get_file_metadata`.
+
+        Args:
+            filename (str): Name of the input file
+
+        Returns:
+            dict: Dictionary of the hepfile's metadata.
+        """
+
+        return await self.run(get_file_metadata, filename)
+
+    async def get_header(self, filename: str, return_type: str = "dict") -> dict:
+        """
+        Async version of `hepfile.read.get_file_header`.
+
+        Args:
+            filename (str): Name of the input file
+            return_type (str): 'dict' or 'df', see `hepfile.read.get_file_header`
+
+        Returns:
+            dict: Dictionary with the header information.
+        """
+
+        return await self.run(get_file_header, filename, return_type=return_type)
+
+
+################################################################################
+async def load_async(filename: str, **kwargs) -> tuple[dict, dict]:
+    """
+    Async version of `hepfile.read.load`, run on the shared
+    `hepfile.async_tools.AsyncReader`.
+
+    Args:
+        filename (str): Name of the input file
+        **kwargs: passed to `hepfile.read.load`, like desired_groups or subset
+
+    Returns:
+        tuple(dict, dict): Selected data from HDF5, An empty bucket dictionary
+    """
+
+    return await _get_default_reader().load(filename, **kwargs)
+
+
+async def iterate_async(
+    filename: str, chunk_size: int = 100_000, prefetch: int = 1, **kwargs
+) -> AsyncIterator[tuple[dict, dict]]:
+    """
+    Async version of `hepfile.read.iterate`, run on the shared
+    `hepfile.async_tools.AsyncReader`. See `hepfile.async_tools.AsyncReader.iterate`.
+
+    Args:
+        filename (str): Name of the input file
+        chunk_size (int): Number of buckets to read in each chunk. Default is
+                          100,000.
+        prefetch (int): Number of chunks that are read ahead. Default is 1.
+        **kwargs: passed to `hepfile.read.load`, like desired_groups
+
+    Yields:
+        tuple(dict, dict): Data from one chunk of the file, An empty bucket
+                           dictionary
+    """
+
+    chunks = _get_default_reader().iterate(
+        filename, chunk_size=chunk_size, prefetch=prefetch, **kwargs
+    )
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+
+async def get_nbuckets_in_file_async(filename: str) -> int:
+    """
+    Async version of `hepfile.read.get_nbuckets_in_file`.
+
+    Args:
+        filename (str): Name of the input file
+
+    Returns:
+        int: number of buckets in filename
+    """
+
+    return await _get_default_reader().get_nbuckets(filename)
+
+
+async def get_file_metadata_async(filename: str) -> dict:
+    """
+    Async version of `hepfile.read.get_file_metadata`.
+
+    Args:
+        filename (str): Name of the input file
+
+    Returns:
+        dict: Dictionary of the hepfile's metadata.
+    """
+
+    return await _get_default_reader().get_metadata(filename)
+
+
+async def get_file_header_async(filename: str, return_type: str = "dict") -> dict:
+    """
+    Async version of `hepfile.read.get_file_header`.
+
+    Args:
+        filename (str): Name of the input file
+        return_type (str): 'dict' or 'df', see `hepfile.read.get_file_header`
+
+    Returns:
+        dict: Dictionary with the header information.
+    """
+
+    return await _get_default_reader().get_header(filename, return_type=return_type)
+
+
+################################################################################
+def _get_default_reader() -> AsyncReader:
+    """
+    Private method to get the reader shared by the module level functions
+    """
+
+    global _DEFAULT_READER
+    if _DEFAULT_READER is None:
+        _DEFAULT_READER = AsyncReader()
+
+    return _DEFAULT_READER
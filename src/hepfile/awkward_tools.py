@@ -9,12 +9,17 @@ You must have installed hepfile with either \n
 """
 from __future__ import annotations
 
+import itertools
 import warnings
+from collections.abc import Iterable, Iterator
+
 import awkward as ak
 import numpy as np
+from hepfile.read import _offsets_from_counter
 from hepfile.write import (
     initialize,
     write_to_file,
+    _stream_to_file,
 )
 from hepfile.errors import AwkwardStructureError, InputError
 from hepfile.constants import char_codes
@@ -155,6 +160,15 @@ def pack_single_awkward_array(
     else:
         counter = "_SINGLETONS_GROUP_/COUNTER"
 
+    # The counter only needs to be calculated once per group, so only do it
+    # if nothing has filled it yet
+    if group_name is not None:
+        need_counter = counter not in data
+    else:
+        need_counter = len(data[counter]) == 0
+
+    num = None
+
     # Tells us if this is jagged or not
     if arr.ndim == 1:
         # Get the datatpe before we flatten it
@@ -163,7 +177,8 @@ def pack_single_awkward_array(
         else:
             dtype = _get_awkward_type(arr)
 
-        num = np.ones(len(arr), dtype=int)
+        if need_counter:
+            num = np.ones(len(arr), dtype=int)
         np_arr = ak.to_numpy(arr)
 
     else:
@@ -173,12 +188,15 @@ def pack_single_awkward_array(
         else:
             dtype = _get_awkward_type(arr)
 
-        # This saves the counter as int64, taking up a bit more space
-        # Probably minimal though.
-        # num = ak.num(x)
-        # This saves the counter as int32
-        num = ak.to_numpy(ak.num(arr)).astype(np.int32)
-        np_arr = ak.flatten(arr).to_numpy()
+        # Take the flat content buffer straight from the layout rather than
+        # copying it with ak.flatten
+        offsets, np_arr = _offsets_and_content(arr)
+
+        # This saves the counter as int32 rather than int64, which takes up a bit
+        # less space. The counter is the difference of the offsets so we don't need
+        # to compute ak.num for every dataset in the group.
+        if need_counter:
+            num = np.diff(offsets).astype(np.int32)
 
     data[dset_name] = np_arr
 
@@ -187,7 +205,7 @@ def pack_single_awkward_array(
         data["_MAP_DATASETS_TO_DATA_TYPES_"][dset_name] = dtype
         data["_MAP_DATASETS_TO_COUNTERS_"][dset_name] = counter
         data["_GROUPS_"][group_name].append(dset_name.split("/")[1])
-        if counter not in data:
+        if need_counter:
             data[counter] = num
 
     # If it is a SINGLETON
@@ -195,7 +213,7 @@ def pack_single_awkward_array(
         data["_MAP_DATASETS_TO_DATA_TYPES_"][dset_name] = dtype
         data["_MAP_DATASETS_TO_COUNTERS_"][dset_name] = "_SINGLETONS_GROUP_/COUNTER"
         data["_GROUPS_"]["_SINGLETONS_GROUP_"].append(dset_name)
-        if len(data[counter]) == 0:
+        if need_counter:
             data[counter] = num
 
 
@@ -253,14 +271,23 @@ def pack_multiple_awkward_arrays(
 
 
 def awkward_to_hepfile(
-    ak_array: ak.Array, outfile: str = None, write_hepfile: bool = True, **kwargs
+    ak_array: ak.Array | Iterable[ak.Array],
+    outfile: str = None,
+    write_hepfile: bool = True,
+    **kwargs,
 ) -> dict:
     """
     Write an awkward array with depth <= 2 to a hepfile
 
+    The input can also be an iterator (like a generator or `uproot.iterate`) of
+    awkward arrays with the same fields. In that case, each batch is appended to
+    the hepfile as it is read, so the whole input never has to be in memory.
+
     Args:
         ak_array (ak.Array): awkward array with fields of groups/singletons.
                              Under the group fields are the dataset fields.
+                             Or, an iterator (or list) of these awkward arrays to
+                             stream into the hepfile batch by batch.
         outfile (str): path to where the hepfile should be written. Default is None
                        and can only be None if write_hepfile=False.
         write_hepfile (bool): if True, write the hepfile and return the data dictionary.
@@ -269,7 +296,8 @@ def awkward_to_hepfile(
         **kwargs: passed to `hepfile.write_to_file`
 
     Returns:
-        dict: Data dictionary in the hepfile
+        dict: Data dictionary in the hepfile. If the input is an iterable of batches
+              this is the data dictionary of only the last batch.
 
     Raises:
         AwkwardStructureError: If the input awkward array is not formatted properly.
@@ -277,6 +305,9 @@ def awkward_to_hepfile(
         Warning: If write_hepfile is false but you still give an output path
     """
 
+    if isinstance(ak_array, (Iterator, list, tuple)):
+        return _awkward_batches_to_hepfile(ak_array, outfile, write_hepfile, **kwargs)
+
     _is_valid_awkward(ak_array)
 
     if write_hepfile is True and outfile is None:
@@ -298,11 +329,41 @@ def awkward_to_hepfile(
             pack_multiple_awkward_arrays(data, ak_array[group], group_name=group)
 
     if write_hepfile:
-        write_to_file(outfile, data)
+        write_to_file(outfile, data, **kwargs)
 
     return data
 
 
+def _awkward_batches_to_hepfile(
+    batches: Iterable[ak.Array],
+    outfile: str = None,
+    write_hepfile: bool = True,
+    **kwargs,
+) -> dict:
+    """
+    Private method to stream an iterable of awkward arrays into a single hepfile.
+    The first batch creates the file with extendible datasets and every later
+    batch is appended to the end of them, so only one batch is packed at a time.
+    """
+
+    batches = iter(batches)
+    first_batch = next(batches, None)
+    if first_batch is None:
+        raise AwkwardStructureError("There were no awkward arrays in the input!")
+
+    # packing the first batch also validates its structure
+    data = awkward_to_hepfile(first_batch, write_hepfile=False)
+
+    if write_hepfile is False or outfile is None:
+        raise InputError(
+            "Batches of awkward arrays can only be streamed to a hepfile! "
+            + "Please provide an outfile path and set write_hepfile=True."
+        )
+
+    rest = (awkward_to_hepfile(batch, write_hepfile=False) for batch in batches)
+    return _stream_to_file(outfile, itertools.chain([data], rest), **kwargs)
+
+
 def _awkward_depth_check(ak_array: ak.Record) -> int:
     for field in ak_array.fields:
         if not isinstance(ak_array[field], (ak.Record, ak.Array)):
@@ -371,3 +432,30 @@ def _get_awkward_type(ak_array: ak.Record) -> type:
         ) from exc
 
     return np_dtype
+
+
+def _offsets_and_content(ak_array: ak.Array) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Private method to get the offsets and flat content of a jagged awkward array
+    straight from its layout. This avoids the extra copies and counts computations
+    from calling `ak.num` and `ak.flatten`. The returned offsets always start at 0.
+    """
+
+    layout = ak.to_layout(ak_array)
+    if isinstance(layout, (ak.contents.ListArray, ak.contents.RegularArray)):
+        layout = layout.to_ListOffsetArray64(True)
+
+    if (
+        not isinstance(layout, ak.contents.ListOffsetArray)
+        or layout.parameter("__array__") is not None
+    ):
+        # fall back to the slow way for anything that isn't a simple list
+        offsets = _offsets_from_counter(ak.to_numpy(ak.num(ak_array)))
+        return offsets, ak.to_numpy(ak.flatten(ak_array))
+
+    offsets = np.asarray(layout.offsets)
+    content = layout.content[offsets[0] : offsets[-1]]
+    if offsets[0] != 0:
+        offsets = offsets - offsets[0]
+
+    return offsets, ak.to_numpy(ak.Array(content))
@@ -14,7 +14,36 @@ protected_names = {
     "_META_",
     "_HEADER_",
     "_SINGLETONSGROUPFORSTORAGE_",
+    "_SCHEMA_",
+    "_OFFSETS_",
 }
 
 # NumPy Character Codes that can be stored in HDF5 files
 char_codes = {"i", "u", "f", "c"}
+
+# Maximum number of entries of a dataset that are converted and written to
+# (or read from) an HDF5 file at once. Larger arrays are streamed in slices of
+# this size so that we never hold more than one extra copy of a slice in memory.
+buffer_size = 1_000_000
+
+# Version of the schema record (the _SCHEMA_ dataset) written by write_to_file.
+# Readers fall back to the _MAP_DATASETS_TO_COUNTERS_ and
+# _SINGLETONSGROUPFORSTORAGE_ tables for files without (or with a newer) record.
+schema_version = 1
+
+# Default maximum number of bytes of decompressed blocks that a hepfile.File keeps
+# in memory for random access to buckets with File.get_bucket.
+cache_size = 64_000_000
+
+# Number of rows read at once by File.get_bucket from datasets that are not
+# chunked. Chunked datasets are read one HDF5 chunk at a time.
+cache_block_rows = 4096
+
+# When load reads many separate ranges of rows from a dataset that is not chunked,
+# ranges that are less than this many rows apart are read at once. Chunked datasets
+# use their chunk size instead.
+read_gap_rows = 4096
+
+# Default number of threads (or processes) that run the HDF5 work of the async
+# readers in hepfile.async_tools, and so the number of files read at the same time.
+async_max_workers = 4
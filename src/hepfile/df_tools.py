@@ -82,18 +82,12 @@ def hepfile_to_df(
 
         # compute the event numbers
         counter_name = data["_MAP_DATASETS_TO_COUNTERS_"][group]
-        counters_for_df = []
-        for i, counter in enumerate(data[counter_name]):
-            for _ in range(counter):
-                counters_for_df.append(i)
-        for_df["event_num"] = counters_for_df
+        for_df["event_num"] = _event_index(data[counter_name])
 
         group_df = pd.DataFrame(for_df)  # make for_df a df
         # get rid of anything not in events
-        if events is None:
-            events = group_df.event_num.unique()
-
-        group_df = group_df[group_df.event_num.isin(events)]
+        if events is not None:
+            group_df = group_df[group_df.event_num.isin(events)]
 
         dfs[group] = group_df
 
@@ -134,7 +128,7 @@ def awkward_to_df(
     if not hf._AWKWARD:
         raise MissingOptionalDependency("awkward")
 
-    import awkward as ak
+    from hepfile.awkward_tools import _offsets_and_content
 
     dfs = {}  # list to of dataframes to return
 
@@ -165,23 +159,23 @@ def awkward_to_df(
             singletons[group] = ak_array[group].to_numpy()
             continue
 
-        group_df = ak.to_dataframe(ak_array[group])
+        # pull the flat buffers for each dataset straight out of the layout
+        # so the dataframe can share memory with the awkward array
+        for_df = {}
+        offsets = None
+        for field in ak_array[group].fields:
+            field_offsets, for_df[field] = _offsets_and_content(ak_array[group][field])
+            if offsets is None:
+                # make the assumption that all datasets are the same length
+                offsets = field_offsets
 
-        # caluclate the indexes
-        nums_record = ak.num(ak_array[group])
-        nums = nums_record[
-            nums_record.fields[0]
-        ]  # make the assumption that all datasets are the same length
-        idx = ak.flatten(
-            ak.Array([ak.Array([i] * num) for i, num in enumerate(nums)])
-        ).to_numpy()
         # put event number in the dataframe
-        group_df["event_num"] = idx
+        for_df["event_num"] = _event_index(np.diff(offsets))
+        group_df = pd.DataFrame(for_df, copy=False)
 
         # only take events with event numbers in events
-        if events is None:
-            events = group_df.event_num.unique()
-        group_df = group_df[group_df.event_num.isin(events)]
+        if events is not None:
+            group_df = group_df[group_df.event_num.isin(events)]
 
         dfs[group] = group_df
 
@@ -301,3 +295,13 @@ def groups_to_events(
                 if key != event_num_col:
                     event[group_name][key] = []
     return out
+
+
+def _event_index(counters: np.ndarray) -> np.ndarray:
+    """
+    Private method to calculate the event number of every row in a group
+    from the counter of that group
+    """
+
+    counters = np.asarray(counters, dtype=np.int64)
+    return np.repeat(np.arange(len(counters)), counters)
@@ -173,6 +173,9 @@ def append(ak_dict: ak.Record, new_dict: dict) -> ak.Record:  # noqa: F821
     """
     Append a new event to an existing awkward dictionary with events
 
+    This rebuilds the whole awkward array, so to append many events one at a time
+    use `hepfile.dict_tools.EventAccumulator` instead.
+
     Note: This tool requires awkward to be installed. Make sure you installed with
     either: \n
     1) :code:`python -m pip install hepfile[awkward]` or, \n
@@ -209,12 +212,134 @@ def append(ak_dict: ak.Record, new_dict: dict) -> ak.Record:  # noqa: F821
     return ak.Array(ak_list)
 
 
+class EventAccumulator:
+    """
+    Accumulate events (dictionaries) one at a time into an awkward array
+
+    Unlike `hepfile.dict_tools.append`, which rebuilds the entire awkward array
+    every time it is called, this fills an awkward ArrayBuilder so that each
+    append only costs as much as the new event. The awkward array (or hepfile data
+    dictionary) is only built when it is requested.
+
+    Note: This tool requires awkward to be installed. Make sure you installed with
+    either: \n
+    1) :code:`python -m pip install hepfile[awkward]` or, \n
+    2) :code:`python -m pip install hepfile[all]`
+
+    Args:
+        ak_dict (ak.Record): Optional awkward Record of existing events to start from.
+                             New events are appended after these. Default is None.
+
+    Raises:
+        MissingOptionalDependency: If awkward isn't installed
+        AwkwardStructureError: If something is wrong with the input array
+    """
+
+    def __init__(self, ak_dict: ak.Record = None) -> None:  # noqa: F821
+        if not hf._AWKWARD:
+            raise MissingOptionalDependency("awkward")
+
+        import awkward as ak
+        from hepfile.awkward_tools import _is_valid_awkward
+
+        self._fields = None
+        self._existing = None
+        if ak_dict is not None:
+            _is_valid_awkward(ak_dict)
+            self._existing = ak_dict
+            self._fields = sorted(ak_dict.fields)
+
+        self._builder = ak.ArrayBuilder()
+        self._nevents = 0
+
+    def __len__(self) -> int:
+        nexisting = 0 if self._existing is None else len(self._existing)
+        return nexisting + self._nevents
+
+    def append(self, new_dict: dict) -> None:
+        """
+        Append a new event to the accumulator
+
+        Args:
+            new_dict (dict): Dictionary of values for one event. All keys must match
+                             the previously appended events!
+
+        Raises:
+            InputError: If keys of the new event don't match the existing keys
+        """
+
+        keys = sorted(new_dict.keys())
+        if self._fields is None:
+            self._fields = keys
+        elif keys != self._fields:
+            raise InputError(
+                "Keys of new array do not match keys of existing array!\nExisting "
+                + f"Array Keys: {self._fields}\nNew Dictionary Keys: {keys}"
+            )
+
+        self._builder.append(new_dict)
+        self._nevents += 1
+
+    def extend(self, dict_list: list[dict]) -> None:
+        """
+        Append a list of events to the accumulator
+
+        Args:
+            dict_list (list): list of dictionaries, one per event
+
+        Raises:
+            InputError: If keys of the new events don't match the existing keys
+        """
+
+        for new_dict in dict_list:
+            self.append(new_dict)
+
+    def snapshot(self) -> ak.Array:  # noqa: F821
+        """
+        Build an awkward array of all of the accumulated events
+
+        Returns:
+            ak.Array: Awkward Array of all of the events appended so far
+        """
+
+        import awkward as ak
+
+        new = self._builder.snapshot()
+        if self._existing is None:
+            return new
+        if self._nevents == 0:
+            return self._existing
+
+        return ak.concatenate([self._existing, new])
+
+    def to_hepfile(
+        self, outfile: str = None, write_hepfile: bool = True, **kwargs
+    ) -> dict:
+        """
+        Convert the accumulated events to a hepfile data dictionary
+
+        Args:
+            outfile (str): path to write output hepfile to
+            write_hepfile (bool): if True, write the hepfile. Default is True.
+            **kwargs: passed to `hepfile.write.write_to_file`
+
+        Returns:
+            dict: hepfile data dictionary
+        """
+
+        from hepfile.awkward_tools import awkward_to_hepfile
+
+        return awkward_to_hepfile(
+            self.snapshot(), outfile=outfile, write_hepfile=write_hepfile, **kwargs
+        )
+
+
 def _get_dtype(test: list[any]) -> type:
     """get the datatype of a list"""
 
     if not isinstance(test, np.ndarray):
         test = np.array(test)
     np_dtype = test.dtype
-    if np_dtype.char == "U":
+    if np_dtype.kind in {"U", "O"}:
         return str
     return np_dtype.type
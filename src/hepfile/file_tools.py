@@ -0,0 +1,1194 @@
+"""
+Tools that read one or more hepfiles and write new ones, without holding the whole
+input in memory.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py as h5
+import numpy as np
+
+from hepfile import constants
+from hepfile.errors import InputError
+from hepfile.read import (
+    File,
+    get_nbuckets_in_file,
+    _check_chunk_size,
+    _offsets_from_counter,
+    _read_counter,
+    _read_nbuckets,
+    _read_schema,
+)
+from hepfile.stats import IOStats
+from hepfile.write import (
+    write_file_metadata,
+    _convert_dict_to_string_data,
+    _convert_list_and_key_to_string_data,
+    _offsets_path,
+    _stream_to_file,
+    _write_dataset,
+    _write_schema,
+)
+
+__all__ = [
+    "skim",
+    "merge",
+    "write_parallel",
+    "split_boundaries",
+    "split",
+    "add_group_to_file",
+    "add_dataset_to_file",
+    "drop_from_file",
+    "repack_file",
+]
+
+
+################################################################################
+def skim(
+    infile: str,
+    outfile: str,
+    selection: Callable[[dict], np.ndarray] = None,
+    columns: list[str] = None,
+    match: str = "exact",
+    chunk_size: int = 100_000,
+    verbose: bool = False,
+    stats: IOStats = None,
+    **kwargs,
+) -> int:
+    """
+    Write the buckets of a hepfile that pass a selection to a new hepfile.
+
+    The input is read chunk_size buckets at a time. For each chunk, selection is
+    called with the data dictionary of the chunk and returns a boolean mask with one
+    entry per bucket. The buckets where the mask is True, with their counters
+    recalculated, are appended to the output, so only one chunk is in memory at once.
+
+    .. code-block:: python
+
+        def two_jets(data):
+            return data["jet/njet"] >= 2
+
+        hepfile.skim("myfile.h5", "skimmed.h5", two_jets, columns=["jet", "METpx"])
+
+    Args:
+        infile (str): path to the input hepfile
+        outfile (str): path to the output hepfile
+        selection (Callable): function that takes the data dictionary of a chunk and
+                              returns a boolean numpy array, True for the buckets to
+                              keep. If None, every bucket is kept, which is useful to
+                              only keep some of the columns.
+        columns (list): groups and datasets to read and write, see the desired_groups
+                        argument of `hepfile.read.load`. Default is all of them. The
+                        selection can only use these.
+        match (str): How columns are matched, see `hepfile.read.load`. Default is
+                     'exact'.
+        chunk_size (int): number of buckets to read and select at once.
+                          Default is 100,000.
+        verbose (bool): True to print out info as it runs
+        stats (IOStats): `hepfile.stats.IOStats` to record the reads and writes in
+        **kwargs: passed to `hepfile.write.write_to_file`, like comp_type
+
+    Returns:
+        int: number of buckets written to outfile
+
+    Raises:
+        InputError: If the input file has no buckets or the selection does not return
+                    a boolean mask with one entry per bucket
+    """
+
+    _check_chunk_size(chunk_size)
+
+    with File(infile) as f:
+        if f.nbuckets == 0:
+            raise InputError(f"{infile} has no buckets to skim!")
+
+        chunks = f.iterate(
+            chunk_size=chunk_size,
+            desired_groups=columns,
+            verbose=verbose,
+            stats=stats,
+            match=match,
+        )
+        _stream_to_file(
+            outfile,
+            _skim_chunks(chunks, selection),
+            verbose=verbose,
+            stats=stats,
+            **kwargs,
+        )
+
+    return get_nbuckets_in_file(outfile)
+
+
+################################################################################
+def merge(
+    inputs: list[str],
+    output: str,
+    comp_type: str = None,
+    comp_opts: int = None,
+    extendible: bool = False,
+    buffer_size: int = None,
+    verbose: bool = False,
+    stats: IOStats = None,
+    virtual: bool = False,
+) -> int:
+    """
+    Merge hepfiles with the same groups and datasets into one hepfile, like ROOT's
+    hadd. The buckets of the first input come first, then the buckets of the second
+    input, and so on.
+
+    The datasets are copied straight from the inputs to the output, buffer_size
+    entries at a time, so the inputs are never fully loaded in memory. Where the
+    output has the same chunks and compression as an input, and the input starts on
+    a chunk boundary of the output, the compressed chunks are copied as they are,
+    without decompressing them. The counters are copied as they are too, and the
+    number of buckets is the sum of the inputs.
+
+    With virtual=True nothing is copied: the datasets and counters of the output
+    are HDF5 virtual datasets that map to the datasets of the inputs, and only the
+    offsets are written. The output is read like any other hepfile, but the inputs
+    must be kept, at the same paths relative to the output.
+
+    .. code-block:: python
+
+        hepfile.merge(["shard0.h5", "shard1.h5", "shard2.h5"], "merged.h5")
+
+    Args:
+        inputs (list): paths to the hepfiles to merge
+        output (str): path to the merged hepfile
+        comp_type (str): Type of compression of the output. Default is None, which
+                         uses the chunks and compression of the first input, so that
+                         the compressed chunks can be copied.
+        comp_opts (int): Options of the compression of the output
+        extendible (bool): True if the datasets should be created so that more
+                           buckets can be appended to the output later.
+                           Default is False.
+        buffer_size (int): Maximum number of entries of a dataset copied at once.
+                           Default is None, which uses `hepfile.constants.buffer_size`.
+        verbose (bool): True to print out info as it runs
+        stats (IOStats): `hepfile.stats.IOStats` to record the writes in
+        virtual (bool): True to map the datasets of the inputs with virtual datasets
+                        instead of copying them. comp_type only applies to the
+                        offsets then. Default is False.
+
+    Returns:
+        int: number of buckets in the output
+
+    Raises:
+        InputError: If there are no inputs, or their groups, datasets, or data types
+                    are not the same, or extendible and virtual are both True
+    """
+
+    if isinstance(inputs, str) or len(inputs) == 0:
+        raise InputError("Please give a list of the hepfiles to merge!")
+
+    if virtual and extendible:
+        raise InputError("A virtual merge can not be extendible!")
+
+    if buffer_size is None:
+        buffer_size = constants.buffer_size
+
+    infiles = []
+    try:
+        for filename in inputs:
+            infiles.append(h5.File(filename, "r"))
+
+        schema = _read_schema(infiles[0])
+        names = _get_dataset_names(infiles[0], schema)
+        for infile in infiles[1:]:
+            _check_compatible(infiles[0], schema, names, infile)
+
+        nbuckets = sum(_read_nbuckets(infile) for infile in infiles)
+
+        with h5.File(output, "w") as outfile:
+            for table in ["_MAP_DATASETS_TO_COUNTERS_", "_SINGLETONSGROUPFORSTORAGE_"]:
+                infiles[0].copy(table, outfile)
+            if "_HEADER_" in infiles[0]:
+                infiles[0].copy("_HEADER_", outfile)
+
+            dataset_info = {}
+            for name in schema["_LIST_OF_DATASETS_"]:
+                source = infiles[0][name]
+                if isinstance(source, h5.Group):
+                    outfile.create_group(name)
+                    outfile[name].attrs.update(source.attrs)
+                    continue
+
+                if verbose:
+                    print(f"Merging {name}")
+
+                if virtual:
+                    dataset = _create_virtual_dataset(
+                        outfile, name, [infile[name] for infile in infiles], output
+                    )
+                    dataset.attrs.update(source.attrs)
+                    dataset_info[name] = _get_dataset_info(dataset)
+                    continue
+
+                dataset = _create_merged_dataset(
+                    outfile,
+                    name,
+                    [infile[name] for infile in infiles],
+                    comp_type=comp_type,
+                    comp_opts=comp_opts,
+                    extendible=extendible,
+                )
+                dataset.attrs.update(source.attrs)
+                dataset_info[name] = _get_dataset_info(dataset)
+
+                start = 0
+                for infile in infiles:
+                    start = _copy_dataset(
+                        infile[name], dataset, start, buffer_size, stats=stats
+                    )
+
+            # the counters are copied as they are, but the offsets continue from
+            # the end of the previous input
+            offsets = {}
+            for counter in schema["_LIST_OF_COUNTERS_"]:
+                if counter == "_SINGLETONS_GROUP_/COUNTER":
+                    continue
+
+                offsets[counter] = _offsets_path(counter)
+                total = sum(infile[counter].shape[0] for infile in infiles)
+                dataset = outfile.create_dataset(
+                    offsets[counter],
+                    shape=(total + 1,),
+                    maxshape=(None,) if extendible else None,
+                    dtype=np.int64,
+                    compression=comp_type,
+                    compression_opts=comp_opts,
+                )
+                _merge_offsets(infiles, counter, dataset, buffer_size)
+
+            _write_schema(
+                outfile,
+                {
+                    "_MAP_DATASETS_TO_COUNTERS_": schema["_MAP_DATASETS_TO_COUNTERS_"],
+                    "_GROUPS_": {"_SINGLETONS_GROUP_": schema["_SINGLETONS_GROUP_"]},
+                },
+                dataset_info,
+                offsets,
+            )
+            outfile.attrs["_NUMBER_OF_BUCKETS_"] = nbuckets
+    finally:
+        for infile in infiles:
+            infile.close()
+
+    write_file_metadata(output)
+
+    return nbuckets
+
+
+################################################################################
+def write_parallel(
+    output: str,
+    producer: Callable[[int], dict | Iterator[dict]],
+    nshards: int,
+    max_workers: int = None,
+    verbose: bool = False,
+    **kwargs,
+) -> int:
+    """
+    Write a hepfile from many processes at once. Each worker writes its own shard
+    and the shards are then put together in output with a virtual merge (see
+    `hepfile.file_tools.merge`), so nothing is copied. Reading output reads the
+    shards, which are written next to it as <output name>.shard<i>.h5 and must be
+    kept with it.
+
+    .. code-block:: python
+
+        def simulate(i):
+            return hepfile.synthetic.make_data(100_000, seed=i)
+
+        hepfile.write_parallel("simulated.h5", simulate, nshards=16, max_workers=8)
+
+    Args:
+        output (str): path to the top level hepfile
+        producer (Callable): called as producer(i) in a worker to get the data of
+                             shard i, as a data dictionary or an iterator of data
+                             dictionaries that are written one after the other. It
+                             must be picklable, like a function defined at the top
+                             level of a module.
+        nshards (int): number of shards
+        max_workers (int): number of processes that write the shards. Default is
+                           the number of CPUs.
+        verbose (bool): True to print out info as it runs
+        **kwargs: passed to `hepfile.write.write_to_file`, like comp_type
+
+    Returns:
+        int: number of buckets in the output
+
+    Raises:
+        InputError: If nshards isn't a positive integer or a producer returns no
+                    data
+    """
+
+    if not isinstance(nshards, (int, np.integer)) or nshards <= 0:
+        raise InputError("nshards must be a positive integer!")
+
+    root, ext = os.path.splitext(output)
+    shards = [f"{root}.shard{i}{ext or '.h5'}" for i in range(nshards)]
+
+    if verbose:
+        print(f"Writing {nshards} shards of {output}")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_write_producer_shard, producer, i, shard, kwargs)
+            for i, shard in enumerate(shards)
+        ]
+        for future in futures:
+            future.result()
+
+    return merge(shards, output, verbose=verbose, virtual=True)
+
+
+################################################################################
+def split_boundaries(infile: str, nshards: int, weight: str = "storage") -> np.ndarray:
+    """
+    Get the bucket boundaries that split a hepfile into nshards shards of about the
+    same size. Because the number of entries in each bucket varies, splitting by the
+    number of buckets can give very unbalanced shards. Instead, the counters are
+    used to get the size of every bucket.
+
+    Args:
+        infile (str): path to the hepfile
+        nshards (int): number of shards
+        weight (str): what should be the same in each shard. Options are \n
+                      - 'storage' (default): the bytes on disk, after compression.
+                        Virtual datasets are counted by their uncompressed size. \n
+                      - 'nbytes': the uncompressed bytes. Variable length strings
+                        are counted by their size on disk. \n
+                      - 'buckets': the number of buckets
+
+    Returns:
+        np.ndarray: nshards + 1 bucket indices, shard i has the buckets from
+                    boundaries[i] up to (but not including) boundaries[i+1]
+
+    Raises:
+        InputError: If nshards or weight are not valid, or there are fewer buckets
+                    than shards
+    """
+
+    if weight not in {"storage", "nbytes", "buckets"}:
+        raise InputError("weight must be storage, nbytes, or buckets")
+
+    if not isinstance(nshards, (int, np.integer)) or nshards <= 0:
+        raise InputError("nshards must be a positive integer!")
+
+    with h5.File(infile, "r") as f:
+        nbuckets = _read_nbuckets(f)
+        if nbuckets < nshards:
+            raise InputError(f"Can not split {nbuckets} buckets into {nshards} shards!")
+
+        if weight == "buckets":
+            weights = np.ones(nbuckets)
+        else:
+            weights = _bucket_weights(f, _read_schema(f), nbuckets, weight)
+
+    cumulative = np.cumsum(weights)
+    targets = cumulative[-1] * np.arange(1, nshards) / nshards
+
+    # cut before or after the bucket that crosses each target, whichever is closer
+    after = np.searchsorted(cumulative, targets)
+    before = np.concatenate(([0.0], cumulative))[after]
+    cuts = np.where(cumulative[after] - targets < targets - before, after + 1, after)
+
+    # every shard needs at least one bucket
+    boundaries = [0]
+    for i, cut in enumerate(cuts, start=1):
+        boundaries.append(
+            min(max(int(cut), boundaries[-1] + 1), nbuckets - nshards + i)
+        )
+    boundaries.append(nbuckets)
+
+    return np.array(boundaries)
+
+
+def split(
+    infile: str,
+    outfiles: list[str],
+    weight: str = "storage",
+    chunk_size: int = 100_000,
+    max_workers: int = 1,
+    verbose: bool = False,
+    **kwargs,
+) -> list[tuple[int, int]]:
+    """
+    Split a hepfile into one shard per output file, with about the same number of
+    bytes in each shard (see `hepfile.file_tools.split_boundaries`).
+
+    Each shard is written chunk_size buckets at a time, so only one chunk per shard
+    is in memory at once. With max_workers > 1, the shards are written in parallel
+    in that many processes.
+
+    .. code-block:: python
+
+        outfiles = [f"shard{i}.h5" for i in range(8)]
+        hepfile.split("myfile.h5", outfiles, max_workers=4)
+
+    Args:
+        infile (str): path to the hepfile to split
+        outfiles (list): paths to the shards
+        weight (str): what should be the same in each shard, 'storage', 'nbytes',
+                      or 'buckets'. Default is 'storage'.
+        chunk_size (int): number of buckets to read and write at once.
+                          Default is 100,000.
+        max_workers (int): number of processes that write the shards.
+                           Default is 1, which writes them one after the other.
+        verbose (bool): True to print out info as it runs
+        **kwargs: passed to `hepfile.write.write_to_file`, like comp_type. The data
+                  types of the input are kept unless force_single_precision=True is
+                  passed.
+
+    Returns:
+        list: the (low, high) range of buckets of the input in each shard
+
+    Raises:
+        InputError: If the inputs are not valid
+    """
+
+    if isinstance(outfiles, str) or len(outfiles) == 0:
+        raise InputError("Please give a list of the files to write the shards to!")
+
+    _check_chunk_size(chunk_size)
+    kwargs.setdefault("force_single_precision", False)
+
+    boundaries = split_boundaries(infile, len(outfiles), weight=weight)
+    ranges = [
+        (int(low), int(high)) for low, high in zip(boundaries[:-1], boundaries[1:])
+    ]
+
+    if verbose:
+        for outfile, (low, high) in zip(outfiles, ranges):
+            print(f"Writing buckets {low} to {high} of {infile} to {outfile}")
+
+    if max_workers <= 1:
+        for outfile, (low, high) in zip(outfiles, ranges):
+            _write_shard(infile, outfile, low, high, chunk_size, kwargs)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    _write_shard, infile, outfile, low, high, chunk_size, kwargs
+                )
+                for outfile, (low, high) in zip(outfiles, ranges)
+            ]
+            for future in futures:
+                future.result()
+
+    return ranges
+
+
+################################################################################
+def add_group_to_file(
+    filename: str,
+    group: str,
+    counter: str,
+    counts: np.ndarray,
+    datasets: dict,
+    comp_type: str = None,
+    comp_opts: int = None,
+    force_single_precision: bool = True,
+) -> None:
+    """
+    Add a new group, with its counter and datasets, to an existing hepfile without
+    rewriting the rest of the file.
+
+    .. code-block:: python
+
+        hepfile.add_group_to_file(
+            "myfile.h5", "tracks", "ntrack", ntrack, {"pt": pt, "eta": eta}
+        )
+
+    Args:
+        filename (str): path to the hepfile
+        group (str): name of the new group
+        counter (str): name of the counter of the group, like 'ntrack'
+        counts (np.ndarray): number of entries of the group in every bucket
+        datasets (dict): the name and values of every dataset of the group. Each
+                         must have sum(counts) entries.
+        comp_type (str): Type of compression of the new datasets
+        comp_opts (int): Options of the compression of the new datasets
+        force_single_precision (bool): True if 64 bit floats should be written in
+                                       single precision, like
+                                       `hepfile.write.write_to_file`
+
+    Raises:
+        InputError: If the group already exists, its name is protected, or the
+                    number of entries don't match the counts or the number of
+                    buckets in the file
+    """
+
+    if group in constants.protected_names or "/" in group:
+        raise InputError(f"{group} can not be used as a group name!")
+
+    counts = np.asarray(counts)
+    counter_name = f"{group}/{counter}"
+
+    with h5.File(filename, "a") as hdfile:
+        schema = _read_schema(hdfile)
+        if group in hdfile:
+            raise InputError(f"{group} is already in {filename}!")
+
+        nbuckets = _read_nbuckets(hdfile)
+        if counts.shape != (nbuckets,) or counts.dtype.kind not in {"i", "u"}:
+            raise InputError(
+                f"counts must be integers with one entry for each of the {nbuckets} "
+                + "buckets in the file!"
+            )
+
+        nentries = int(counts.sum())
+        for name, values in datasets.items():
+            if name == counter or len(values) != nentries:
+                raise InputError(
+                    f"{group}/{name} has {len(values)} entries but the counts add up "
+                    + f"to {nentries}!"
+                )
+
+        extendible = _is_extendible(hdfile)
+        kwargs = {
+            "comp_type": comp_type,
+            "comp_opts": comp_opts,
+            "extendible": extendible,
+        }
+
+        hdfile.create_group(group)
+        hdfile[group].attrs["counter"] = np.string_(counter_name)
+        _write_dataset(hdfile, counter_name, counts, counts.dtype, **kwargs)
+        _write_dataset(
+            hdfile,
+            _offsets_path(counter_name),
+            _offsets_from_counter(counts),
+            np.int64,
+            **kwargs,
+        )
+
+        schema["_MAP_DATASETS_TO_COUNTERS_"][group] = counter_name
+        for name, values in datasets.items():
+            _write_dataset(
+                hdfile,
+                f"{group}/{name}",
+                values,
+                _single_precision(values, force_single_precision),
+                **kwargs,
+            )
+            schema["_MAP_DATASETS_TO_COUNTERS_"][f"{group}/{name}"] = counter_name
+
+        _rewrite_schema(hdfile, schema)
+
+
+def add_dataset_to_file(
+    filename: str,
+    name: str,
+    values: np.ndarray,
+    comp_type: str = None,
+    comp_opts: int = None,
+    force_single_precision: bool = True,
+) -> None:
+    """
+    Add a new dataset to an existing group of a hepfile, or a new singleton,
+    without rewriting the rest of the file. Only the new dataset is written.
+
+    .. code-block:: python
+
+        # one b-tag score for every jet in the file
+        hepfile.add_dataset_to_file("myfile.h5", "jet/btag", btag)
+
+    Args:
+        filename (str): path to the hepfile
+        name (str): full name of the dataset, like 'jet/btag'. A name without a
+                    group, like 'MET', adds a singleton.
+        values (np.ndarray): the values of the dataset. A dataset in a group must
+                             have as many entries as the sum of the counter of the
+                             group, a singleton one entry per bucket.
+        comp_type (str): Type of compression of the new dataset
+        comp_opts (int): Options of the compression of the new dataset
+        force_single_precision (bool): True if 64 bit floats should be written in
+                                       single precision, like
+                                       `hepfile.write.write_to_file`
+
+    Raises:
+        InputError: If the name is protected, the dataset already exists, its group
+                    doesn't exist, or it doesn't have the right number of entries
+    """
+
+    with h5.File(filename, "a") as hdfile:
+        schema = _read_schema(hdfile)
+        if name in constants.protected_names:
+            raise InputError(f"{name} is a protected name, use another name!")
+        if name in hdfile:
+            raise InputError(f"{name} is already in {filename}!")
+
+        if "/" in name:
+            group = name.split("/")[0]
+            if group not in schema["_MAP_DATASETS_TO_COUNTERS_"] or not isinstance(
+                hdfile[group], h5.Group
+            ):
+                raise InputError(f"There is no group {group} in {filename}!")
+            counter = schema["_MAP_DATASETS_TO_COUNTERS_"][group]
+            offsets_name = schema["_OFFSETS_"].get(counter)
+            if offsets_name is not None and offsets_name in hdfile:
+                nentries = int(hdfile[offsets_name][-1])
+            else:
+                nentries = int(np.sum(hdfile[counter][:], dtype=np.int64))
+        else:
+            counter = "_SINGLETONS_GROUP_/COUNTER"
+            nentries = _read_nbuckets(hdfile)
+            schema["_SINGLETONS_GROUP_"].append(name)
+
+        if len(values) != nentries:
+            raise InputError(
+                f"{name} has {len(values)} entries but needs {nentries} for the "
+                + f"buckets in {filename}!"
+            )
+
+        _write_dataset(
+            hdfile,
+            name,
+            values,
+            _single_precision(values, force_single_precision),
+            comp_type=comp_type,
+            comp_opts=comp_opts,
+            extendible=_is_extendible(hdfile),
+        )
+        schema["_MAP_DATASETS_TO_COUNTERS_"][name] = counter
+
+        _rewrite_schema(hdfile, schema)
+
+
+def drop_from_file(filename: str, names: list[str], repack: bool = False) -> None:
+    """
+    Remove groups, datasets, or singletons from a hepfile in place.
+
+    HDF5 does not give the space of the removed datasets back, so the file does not
+    get smaller unless it is repacked, see `hepfile.file_tools.repack_file`.
+
+    .. code-block:: python
+
+        hepfile.drop_from_file("myfile.h5", ["photons", "jet/btag"], repack=True)
+
+    Args:
+        filename (str): path to the hepfile
+        names (list): groups (with all of their datasets), full names of datasets,
+                      like 'jet/btag', or singletons to remove
+        repack (bool): True to repack the file afterwards to reclaim the space.
+                       Default is False.
+
+    Raises:
+        InputError: If a name is not in the file, or is a counter
+    """
+
+    if isinstance(names, str):
+        names = [names]
+
+    # each name is only dropped once
+    names = list(dict.fromkeys(names))
+
+    with h5.File(filename, "a") as hdfile:
+        schema = _read_schema(hdfile)
+        mapping = schema["_MAP_DATASETS_TO_COUNTERS_"]
+
+        for name in names:
+            if name in mapping.values():
+                raise InputError(f"{name} is a counter, drop its group instead!")
+            if name not in mapping or name in constants.protected_names:
+                raise InputError(f"Can not drop {name}, it is not in {filename}!")
+
+        # the datasets of the groups that are dropped go with their group
+        groups = {name for name in names if isinstance(hdfile[name], h5.Group)}
+        names = [
+            name for name in names if name in groups or name.split("/")[0] not in groups
+        ]
+
+        for name in names:
+            if isinstance(hdfile[name], h5.Group):
+                counter = mapping[name]
+                offsets_name = _offsets_path(counter)
+                if offsets_name in hdfile:
+                    del hdfile[offsets_name]
+                for key in [key for key, value in mapping.items() if value == counter]:
+                    del mapping[key]
+            else:
+                if name in schema["_SINGLETONS_GROUP_"]:
+                    schema["_SINGLETONS_GROUP_"].remove(name)
+                del mapping[name]
+
+            del hdfile[name]
+
+        _rewrite_schema(hdfile, schema)
+
+    if repack:
+        repack_file(filename)
+
+
+def repack_file(filename: str, outfile: str = None) -> str:
+    """
+    Copy a hepfile into a new file to reclaim the space left behind by removed
+    datasets, like the h5repack tool. The datasets keep their chunks and
+    compression, and their compressed chunks are copied without decompressing them.
+
+    Args:
+        filename (str): path to the hepfile
+        outfile (str): path to the repacked file. Default is None, which replaces
+                       filename with the repacked file.
+
+    Returns:
+        str: path to the repacked file
+    """
+
+    target = filename + ".repack" if outfile is None else outfile
+
+    with h5.File(filename, "r") as infile, h5.File(target, "w") as repacked:
+        for name in infile:
+            infile.copy(name, repacked)
+        repacked.attrs.update(infile.attrs)
+
+    if outfile is None:
+        os.replace(target, filename)
+        return filename
+
+    return outfile
+
+
+################################################################################
+def _skim_chunks(
+    chunks: Iterator[tuple[dict, dict]], selection: Callable[[dict], np.ndarray]
+) -> Iterator[dict]:
+    """
+    Private generator of the selected buckets of each chunk
+    """
+
+    for data, _ in chunks:
+        if selection is None:
+            yield data
+            continue
+
+        mask = np.asarray(selection(data))
+        if mask.dtype != bool or mask.shape != (data["_NUMBER_OF_BUCKETS_"],):
+            raise InputError(
+                "The selection must return a boolean array with one entry per "
+                + f"bucket, not {mask.dtype} with shape {mask.shape}!"
+            )
+
+        yield _select_buckets(data, mask)
+
+
+def _select_buckets(data: dict, mask: np.ndarray) -> dict:
+    """
+    Private method to get a data dictionary with only the buckets of data where
+    mask is True. The counters and their indices are recalculated.
+    """
+
+    out = dict(data)
+    counters = set(data["_LIST_OF_COUNTERS_"])
+
+    # the rows of the datasets of each group that belong to the selected buckets
+    rows = {}
+    for counter in counters:
+        rows[counter] = np.repeat(mask, data[counter])
+        out[counter] = data[counter][mask]
+        out[f"{counter}_INDEX"] = _offsets_from_counter(out[counter])[:-1]
+
+    for name in data["_LIST_OF_DATASETS_"]:
+        # skip the counters, the list of singletons, and the groups which aren't
+        # in data
+        if (
+            name in counters
+            or name in constants.protected_names
+            or not isinstance(data.get(name), np.ndarray)
+        ):
+            continue
+
+        out[name] = data[name][rows[data["_MAP_DATASETS_TO_COUNTERS_"][name]]]
+
+    out["_NUMBER_OF_BUCKETS_"] = int(np.count_nonzero(mask))
+
+    return out
+
+
+def _get_dataset_names(infile: h5.File, schema: dict) -> list[str]:
+    """
+    Private method to get the names of all of the datasets of a hepfile, including
+    the counters and the singletons
+    """
+
+    return [
+        name
+        for name in schema["_LIST_OF_DATASETS_"]
+        if isinstance(infile[name], h5.Dataset)
+    ]
+
+
+def _check_compatible(
+    first: h5.File, schema: dict, names: list[str], infile: h5.File
+) -> None:
+    """
+    Private method to check that a hepfile has the same groups, datasets, and data
+    types as the first of the files to merge
+    """
+
+    other = _read_schema(infile)
+    problems = []
+    if other["_MAP_DATASETS_TO_COUNTERS_"] != schema["_MAP_DATASETS_TO_COUNTERS_"]:
+        problems.append("the groups, datasets, or counters are not the same")
+
+    if set(other["_SINGLETONS_GROUP_"]) != set(schema["_SINGLETONS_GROUP_"]):
+        problems.append("the singletons are not the same")
+
+    if len(problems) == 0:
+        for name in names:
+            ours = first[name]
+            theirs = infile[name]
+            if ours.dtype != theirs.dtype or ours.shape[1:] != theirs.shape[1:]:
+                problems.append(
+                    f"{name} is {theirs.dtype} with shape {theirs.shape[1:]} instead "
+                    + f"of {ours.dtype} with shape {ours.shape[1:]}"
+                )
+
+    if len(problems) > 0:
+        raise InputError(
+            f"{infile.filename} can not be merged with {first.filename}: "
+            + ", ".join(problems)
+        )
+
+
+def _create_merged_dataset(
+    outfile: h5.File,
+    name: str,
+    sources: list[h5.Dataset],
+    comp_type: str = None,
+    comp_opts: int = None,
+    extendible: bool = False,
+) -> h5.Dataset:
+    """
+    Private method to create the dataset that holds the entries of all of the
+    sources. Without a comp_type it has the chunks and compression of the first.
+    """
+
+    first = sources[0]
+    shape = (sum(source.shape[0] for source in sources),) + first.shape[1:]
+
+    kwargs = {"compression": comp_type, "compression_opts": comp_opts}
+    if comp_type is None and first.chunks is not None:
+        kwargs = {
+            "chunks": first.chunks,
+            "compression": first.compression,
+            "compression_opts": first.compression_opts,
+            "shuffle": first.shuffle,
+            "fletcher32": first.fletcher32,
+            "scaleoffset": first.scaleoffset,
+        }
+
+    # HDF5 needs at least one entry per chunk, and chunks of a dataset that can't
+    # grow can't be longer than the dataset. Empty extendible inputs, like a sparse
+    # group without entries, have long chunks. A clamped chunk no longer matches
+    # the input, so its chunks are not copied as they are.
+    if kwargs.get("chunks") is not None:
+        if shape[0] == 0:
+            kwargs["chunks"] = None
+        elif not extendible and kwargs["chunks"][0] > shape[0]:
+            kwargs["chunks"] = (shape[0],) + kwargs["chunks"][1:]
+
+    return outfile.create_dataset(
+        name,
+        shape=shape,
+        maxshape=(None,) + first.shape[1:] if extendible else None,
+        dtype=first.dtype,
+        **kwargs,
+    )
+
+
+def _create_virtual_dataset(
+    outfile: h5.File, name: str, sources: list[h5.Dataset], output: str
+) -> h5.Dataset:
+    """
+    Private method to create a virtual dataset that maps to the entries of all of
+    the sources, one after the other. The sources are stored with their paths
+    relative to the output, so the files can be moved together.
+    """
+
+    first = sources[0]
+    shape = (sum(source.shape[0] for source in sources),) + first.shape[1:]
+    layout = h5.VirtualLayout(shape=shape, dtype=first.dtype)
+
+    start = 0
+    for source in sources:
+        nentries = source.shape[0]
+        if nentries == 0:
+            continue
+
+        path = _relative_path(source.file.filename, output)
+        layout[start : start + nentries] = h5.VirtualSource(
+            path, name, shape=source.shape
+        )
+        start += nentries
+
+    return outfile.create_virtual_dataset(name, layout)
+
+
+def _relative_path(filename: str, output: str) -> str:
+    """
+    Private method to get the path of filename relative to the directory of output,
+    or the absolute path if there is none (like on another drive)
+    """
+
+    try:
+        return os.path.relpath(
+            os.path.abspath(filename), os.path.dirname(os.path.abspath(output))
+        )
+    except ValueError:
+        return os.path.abspath(filename)
+
+
+def _same_storage(source: h5.Dataset, dataset: h5.Dataset) -> bool:
+    """
+    Private method to check if the chunks of source can be copied to dataset
+    without decompressing them
+    """
+
+    if source.chunks is None or source.chunks != dataset.chunks:
+        return False
+
+    # variable length data, like strings, points into the heap of the source file
+    if source.dtype.kind == "O":
+        return False
+
+    # only whole rows can be copied
+    if source.chunks[1:] != source.shape[1:]:
+        return False
+
+    settings = (
+        "compression",
+        "compression_opts",
+        "shuffle",
+        "fletcher32",
+        "scaleoffset",
+    )
+    if any(getattr(source, name) != getattr(dataset, name) for name in settings):
+        return False
+
+    # filters that h5py doesn't know about, like plugins, don't show up above
+    source_filters = source.id.get_create_plist().get_nfilters()
+    return source_filters == dataset.id.get_create_plist().get_nfilters()
+
+
+def _copy_dataset(
+    source: h5.Dataset,
+    dataset: h5.Dataset,
+    start: int,
+    buffer_size: int,
+    stats: IOStats = None,
+) -> int:
+    """
+    Private method to copy all of the entries of source into dataset, starting at
+    entry start. Returns the entry after the last one that was copied.
+    """
+
+    nentries = source.shape[0]
+    tic = time.perf_counter()
+    nbytes = 0
+    if nentries == 0:
+        return start
+
+    if _same_storage(source, dataset) and start % dataset.chunks[0] == 0:
+        # copy the compressed chunks
+        zeros = (0,) * (len(dataset.shape) - 1)
+        for low in range(0, nentries, dataset.chunks[0]):
+            filter_mask, chunk = source.id.read_direct_chunk((low,) + zeros)
+            dataset.id.write_direct_chunk((start + low,) + zeros, chunk, filter_mask)
+            nbytes += len(chunk)
+    else:
+        for low in range(0, nentries, buffer_size):
+            high = min(low + buffer_size, nentries)
+            values = source[low:high]
+            dataset[start + low : start + high] = values
+            nbytes += values.nbytes
+
+    if stats is not None:
+        stats.record(
+            dataset.name.lstrip("/"),
+            nbytes=nbytes,
+            storage_size=dataset.id.get_storage_size(),
+            io_time=time.perf_counter() - tic,
+        )
+
+    return start + nentries
+
+
+def _merge_offsets(
+    infiles: list[h5.File], counter: str, dataset: h5.Dataset, buffer_size: int
+) -> None:
+    """
+    Private method to write the offsets of a counter of the merged files. Each
+    input continues from where the previous input ended.
+    """
+
+    dataset[0] = 0
+    end = 0
+    bucket = 0
+    for infile in infiles:
+        source = infile[counter]
+        for low in range(0, source.shape[0], buffer_size):
+            values = source[low : low + buffer_size]
+            offsets = _offsets_from_counter(values, start=end)
+            dataset[bucket + 1 : bucket + 1 + len(values)] = offsets[1:]
+            end = offsets[-1]
+            bucket += len(values)
+
+
+def _bucket_weights(
+    infile: h5.File, schema: dict, nbuckets: int, weight: str
+) -> np.ndarray:
+    """
+    Private method to get the number of bytes, on disk ('storage') or uncompressed
+    ('nbytes'), of every bucket of an open hepfile
+    """
+
+    def bytes_per_entry(name):
+        dataset = infile[name]
+        if len(dataset) == 0:
+            return 0.0
+        # virtual datasets don't take up any storage in this file
+        if dataset.is_virtual or (weight == "nbytes" and dataset.dtype.kind != "O"):
+            return dataset.dtype.itemsize * np.prod(dataset.shape[1:])
+        return dataset.id.get_storage_size() / len(dataset)
+
+    # the bytes of one entry in all of the datasets of the group of each counter
+    per_entry = dict.fromkeys(schema["_LIST_OF_COUNTERS_"], 0.0)
+    for name, counter in schema["_MAP_DATASETS_TO_COUNTERS_"].items():
+        if isinstance(infile[name], h5.Dataset):
+            per_entry[counter] += bytes_per_entry(name)
+
+    # every bucket has one entry in each counter
+    weights = np.full(nbuckets, sum(map(bytes_per_entry, per_entry)), dtype=float)
+    for counter, nbytes in per_entry.items():
+        weights += _read_counter(infile, counter)[0] * nbytes
+
+    return weights
+
+
+def _write_shard(
+    infile: str, outfile: str, low: int, high: int, chunk_size: int, kwargs: dict
+) -> None:
+    """
+    Private method to write buckets low to high of infile to outfile, chunk_size
+    buckets at a time
+    """
+
+    with File(infile) as f:
+        chunks = (
+            f.load(subset=(start, min(start + chunk_size, high)))[0]
+            for start in range(low, high, chunk_size)
+        )
+        _stream_to_file(outfile, chunks, **kwargs)
+
+
+def _write_producer_shard(
+    producer: Callable, index: int, shard: str, kwargs: dict
+) -> None:
+    """
+    Private method to write the data of producer(index) to shard. This runs in the
+    workers of write_parallel.
+    """
+
+    batches = producer(index)
+    if isinstance(batches, dict):
+        batches = [batches]
+
+    if _stream_to_file(shard, batches, **kwargs) is None:
+        raise InputError(f"The producer returned no data for shard {index}!")
+
+
+def _get_dataset_info(dataset: h5.Dataset) -> dict:
+    """
+    Private method to get the dtype and shape (after the first dimension) of a
+    dataset, for the schema record
+    """
+
+    return {
+        "dtype": "str"
+        if h5.check_string_dtype(dataset.dtype) is not None
+        else dataset.dtype.str,
+        "shape": list(dataset.shape[1:]),
+    }
+
+
+def _is_extendible(hdfile: h5.File) -> bool:
+    """
+    Private method to check if buckets can be appended to a hepfile, so that new
+    datasets should be extendible too
+    """
+
+    counter = hdfile.get("_SINGLETONS_GROUP_/COUNTER")
+    return counter is not None and counter.maxshape[0] is None
+
+
+def _single_precision(values: np.ndarray, force_single_precision: bool) -> type:
+    """
+    Private method to get the data type to write values as, like write_to_file
+    """
+
+    values = np.asarray(values)
+    if force_single_precision and values.dtype == np.float64:
+        return np.float32
+
+    return None
+
+
+def _rewrite_schema(hdfile: h5.File, schema: dict) -> None:
+    """
+    Private method to replace the tables that describe the layout of a hepfile
+    (_MAP_DATASETS_TO_COUNTERS_, _SINGLETONSGROUPFORSTORAGE_, and _SCHEMA_) after
+    groups or datasets were added or removed
+    """
+
+    for table in [
+        "_MAP_DATASETS_TO_COUNTERS_",
+        "_SINGLETONSGROUPFORSTORAGE_",
+        "_SCHEMA_",
+    ]:
+        if table in hdfile:
+            del hdfile[table]
+
+    mapping = schema["_MAP_DATASETS_TO_COUNTERS_"]
+    mydataset, length = _convert_dict_to_string_data(mapping)
+    hdfile.create_dataset(
+        "_MAP_DATASETS_TO_COUNTERS_", data=mydataset, dtype=f"S{length}"
+    )
+
+    singletons = list(schema["_SINGLETONS_GROUP_"])
+    mydataset, length = _convert_list_and_key_to_string_data(
+        ["COUNTER"] + singletons, "_SINGLETONSGROUPFORSTORAGE_"
+    )
+    hdfile.create_dataset(
+        "_SINGLETONSGROUPFORSTORAGE_", data=mydataset, dtype=f"S{length}"
+    )
+
+    names = set(mapping) | set(mapping.values())
+    dataset_info = {
+        name: _get_dataset_info(hdfile[name])
+        for name in sorted(names)
+        if isinstance(hdfile.get(name), h5.Dataset)
+    }
+    offsets = {
+        counter: _offsets_path(counter)
+        for counter in set(mapping.values())
+        if _offsets_path(counter) in hdfile
+    }
+
+    _write_schema(
+        hdfile,
+        {
+            "_MAP_DATASETS_TO_COUNTERS_": mapping,
+            "_GROUPS_": {"_SINGLETONS_GROUP_": singletons},
+        },
+        dataset_info,
+        offsets,
+    )
@@ -0,0 +1,431 @@
+"""
+Tools to run an analysis over the buckets of one or more hepfiles on all of the
+local cores, and to share loaded data with worker processes without copying it.
+"""
+from __future__ import annotations
+
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+from hepfile.errors import InputError
+from hepfile.file_tools import split_boundaries
+from hepfile.read import File, load, get_nbuckets_in_file, _check_chunk_size
+
+__all__ = [
+    "process",
+    "SharedData",
+    "load_shared",
+    "attach_shared",
+]
+
+# the arrays in shared memory start at multiples of this many bytes
+_ALIGNMENT = 64
+
+# the shared memory blocks attached to in this process, by name
+_ATTACHED = {}
+
+
+################################################################################
+def process(
+    filenames: str | list[str],
+    func: Callable[[dict], Any],
+    reducer: str | Callable[[Any, Any], Any] = "add",
+    max_workers: int = None,
+    chunk_size: int = 100_000,
+    desired_groups: list[str] = None,
+    match: str = "substring",
+    return_type: str = "dictionary",
+    weight: str = "storage",
+) -> Any:
+    """
+    Run func over every bucket of one or more hepfiles in parallel and combine
+    the results.
+
+    The files are split into ranges of buckets of about the same size (see
+    `hepfile.file_tools.split_boundaries`), a few per worker so that the workers
+    finish at about the same time. Each worker opens its file read only, loads its
+    range chunk_size buckets at a time, calls func on each chunk, and combines the
+    results with reducer. The results of the workers are then combined, in the
+    order of the files and buckets.
+
+    .. code-block:: python
+
+        def jet_energy(data):
+            counts, _ = np.histogram(data["jet/e"], bins=100, range=(0, 500))
+            return counts
+
+        counts = hepfile.process(["run1.h5", "run2.h5"], jet_energy, reducer="add")
+
+    func and reducer are sent to the worker processes, so they must be picklable,
+    like functions defined at the top level of a module. This isn't needed with
+    max_workers=1, which runs everything in this process.
+
+    Args:
+        filenames (str | list): path to the hepfile, or a list of paths
+        func (Callable): function called on the data of each chunk, in the form
+                         given by return_type
+        reducer (str | Callable): how to combine two results of func. Options are \n
+                                  - 'add' (default): add them, like histogram
+                                    counts, numbers, or numpy arrays. Dictionaries
+                                    are added key by key. \n
+                                  - 'concatenate': join them, like numpy arrays,
+                                    lists, awkward arrays, or pandas DataFrames.
+                                    Dictionaries are joined key by key. \n
+                                  - a function reducer(a, b) that returns the
+                                    combined result
+        max_workers (int): number of worker processes. Default is the number of
+                           CPUs.
+        chunk_size (int): number of buckets passed to func at once. Default is
+                          100,000.
+        desired_groups (list): Groups to be read, see `hepfile.load`
+        match (str): How desired_groups are matched, see `hepfile.load`
+        return_type (str): Type of the data passed to func, see `hepfile.load`.
+                           Default is 'dictionary'.
+        weight (str): what should be the same in each range of buckets, 'storage',
+                      'nbytes', or 'buckets'. Default is 'storage'.
+
+    Returns:
+        the combined result of func over all of the buckets, or None if the files
+        have no buckets
+
+    Raises:
+        InputError: If the inputs are not valid
+    """
+
+    if isinstance(filenames, str):
+        filenames = [filenames]
+
+    if len(filenames) == 0:
+        raise InputError("Please give at least one file to process!")
+
+    if isinstance(reducer, str):
+        if reducer not in _REDUCERS:
+            raise InputError(f"reducer must be one of {list(_REDUCERS)} or a function")
+        reducer = _REDUCERS[reducer]
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if not isinstance(max_workers, (int, np.integer)) or max_workers <= 0:
+        raise InputError("max_workers must be a positive integer!")
+
+    _check_chunk_size(chunk_size)
+
+    load_kwargs = {
+        "desired_groups": desired_groups,
+        "match": match,
+        "return_type": return_type,
+    }
+    tasks = [
+        (filename, low, high, func, reducer, chunk_size, load_kwargs)
+        for filename, low, high in _partition(filenames, max_workers, weight)
+    ]
+
+    if max_workers == 1:
+        results = [_process_range(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_process_range, *task) for task in tasks]
+            results = [future.result() for future in futures]
+
+    return _reduce(results, reducer)
+
+
+################################################################################
+class SharedData:
+    """
+    A hepfile data dictionary with its numpy arrays in one block of shared memory,
+    to hand the same data to many worker processes without copying it.
+
+    The workers get the small, picklable descriptor and rebuild the data
+    dictionary with `hepfile.parallel.attach_shared`. Its arrays are read only
+    views of the shared memory, so N workers use the memory of one copy of the
+    data. Object arrays, like variable length strings, can't be shared and are
+    copied into the descriptor.
+
+    .. code-block:: python
+
+        def count_jets(descriptor, low, high):
+            data = hepfile.attach_shared(descriptor)
+            return data["jet/njet"][low:high].sum()
+
+        with hepfile.load_shared("myfile.h5") as shared:
+            with ProcessPoolExecutor() as executor:
+                futures = [
+                    executor.submit(count_jets, shared.descriptor, low, low + 1000)
+                    for low in range(0, 10_000, 1000)
+                ]
+
+    The owner of the SharedData must keep it open until the workers are done, and
+    close it (or use it as a context manager) to free the shared memory. The
+    workers must be started from the owning process, like the workers of a
+    `concurrent.futures.ProcessPoolExecutor` or a `multiprocessing.Pool`.
+
+    Attributes:
+        data (dict): the data dictionary, with views of the shared memory
+        descriptor (dict): what the workers need to attach to the shared memory
+        nbytes (int): size of the shared memory block in bytes
+    """
+
+    def __init__(self, data: dict, release: bool = False):
+        """
+        Args:
+            data (dict): the data dictionary to copy into shared memory, like the
+                         output of `hepfile.load`
+            release (bool): remove the arrays from data as they are copied, so the
+                            memory of each array is freed right away and the peak
+                            memory use stays close to the size of the data.
+                            Default is False.
+        """
+
+        layout = {}
+        nbytes = 0
+        for key, value in data.items():
+            if isinstance(value, np.ndarray) and value.dtype.kind != "O":
+                layout[key] = (nbytes, value.dtype.str, value.shape)
+                nbytes += -(-value.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+        # shared memory blocks can't be empty
+        self._shm = SharedMemory(create=True, size=max(nbytes, 1))
+        self.nbytes = self._shm.size
+
+        self.data = {}
+        values = {}
+        for key in list(data):
+            if key not in layout:
+                values[key] = data[key]
+                self.data[key] = data[key]
+                continue
+
+            view = _shared_view(self._shm, *layout[key])
+            view[...] = data[key]
+            view.flags.writeable = False
+            self.data[key] = view
+            if release:
+                del data[key]
+
+        self.descriptor = {"name": self._shm.name, "arrays": layout, "values": values}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f"<hepfile.SharedData {self._shm.name!r} ({self.nbytes} bytes)>"
+
+    def close(self) -> None:
+        """
+        Free the shared memory. The arrays in data (and in the workers) must not
+        be used after this. This is called automatically when used as a context
+        manager.
+        """
+
+        if self._shm is None:
+            return
+
+        self.data = {}
+        try:
+            self._shm.close()
+        except BufferError:
+            # arrays that are still referenced keep the memory mapped until they
+            # are deleted
+            pass
+        self._shm.unlink()
+        self._shm = None
+
+
+def load_shared(filename: str, **kwargs) -> SharedData:
+    """
+    Load a hepfile into shared memory, see `hepfile.parallel.SharedData`. The
+    arrays are moved into the shared memory one at a time as they are loaded, so
+    only about one copy of the data is in memory.
+
+    Args:
+        filename (str): Name of the input file
+        **kwargs: passed to `hepfile.load`, like desired_groups, subset, or
+                  friends. return_type must be 'dictionary'.
+
+    Returns:
+        SharedData: the data in shared memory
+
+    Raises:
+        InputError: If return_type isn't 'dictionary'
+    """
+
+    if kwargs.get("return_type", "dictionary") != "dictionary":
+        raise InputError("Only a data dictionary can be loaded into shared memory!")
+
+    data, _ = load(filename, **kwargs)
+    return SharedData(data, release=True)
+
+
+def attach_shared(descriptor: dict) -> dict:
+    """
+    Rebuild a data dictionary from the descriptor of a
+    `hepfile.parallel.SharedData`, without copying the arrays. Call this in the
+    worker processes. The arrays are read only.
+
+    A process attaches to each block of shared memory once, later calls with the
+    same descriptor reuse it. The memory is given back to the system after the
+    SharedData is closed and the workers have exited.
+
+    Args:
+        descriptor (dict): the descriptor of the SharedData
+
+    Returns:
+        dict: the data dictionary
+    """
+
+    name = descriptor["name"]
+    if name not in _ATTACHED:
+        _ATTACHED[name] = SharedMemory(name=name)
+    shm = _ATTACHED[name]
+
+    data = dict(descriptor["values"])
+    for key, (offset, dtype, shape) in descriptor["arrays"].items():
+        data[key] = _shared_view(shm, offset, dtype, shape)
+        data[key].flags.writeable = False
+
+    return data
+
+
+################################################################################
+def _partition(
+    filenames: list[str], max_workers: int, weight: str
+) -> list[tuple[str, int, int]]:
+    """
+    Private method to split the files into (filename, low, high) ranges of
+    buckets, about 4 per worker over all of the files, with more ranges for the
+    bigger files
+    """
+
+    nbuckets = [get_nbuckets_in_file(filename) for filename in filenames]
+    sizes = np.array([os.path.getsize(filename) for filename in filenames], float)
+    nranges = 4 * max_workers * sizes / max(sizes.sum(), 1.0)
+
+    ranges = []
+    for filename, n, nrange in zip(filenames, nbuckets, nranges):
+        if n == 0:
+            continue
+
+        nrange = int(min(max(round(nrange), 1), n))
+        boundaries = split_boundaries(filename, nrange, weight=weight)
+        ranges += [
+            (filename, int(low), int(high))
+            for low, high in zip(boundaries[:-1], boundaries[1:])
+        ]
+
+    return ranges
+
+
+def _process_range(
+    filename: str,
+    low: int,
+    high: int,
+    func: Callable,
+    reducer: Callable,
+    chunk_size: int,
+    load_kwargs: dict,
+) -> Any:
+    """
+    Private method to run func on buckets low to high of a file, chunk_size
+    buckets at a time, and combine the results. This runs in the workers.
+    """
+
+    results = []
+    with File(filename) as f:
+        for start in range(low, high, chunk_size):
+            data, _ = f.load(
+                subset=(start, min(start + chunk_size, high)), **load_kwargs
+            )
+            results.append(func(data))
+
+    return _reduce(results, reducer)
+
+
+def _shared_view(
+    shm: SharedMemory, offset: int, dtype: str, shape: tuple
+) -> np.ndarray:
+    """
+    Private method to get the array at offset of a shared memory block
+    """
+
+    count = int(np.prod(shape, dtype=np.int64))
+    if count == 0:
+        return np.empty(shape, dtype=dtype)
+
+    return np.frombuffer(shm.buf, dtype=dtype, count=count, offset=offset).reshape(
+        shape
+    )
+
+
+def _reduce(results: list, reducer: Callable) -> Any:
+    """
+    Private method to combine a list of results, in order, with reducer
+    """
+
+    if len(results) == 0:
+        return None
+
+    combined = results[0]
+    for result in results[1:]:
+        combined = reducer(combined, result)
+
+    return combined
+
+
+def _add(a: Any, b: Any) -> Any:
+    """
+    Private reducer that adds two results, key by key for dictionaries
+    """
+
+    if isinstance(a, dict):
+        return {
+            key: _add(a[key], b[key])
+            if key in a and key in b
+            else a.get(key, b.get(key))
+            for key in {**a, **b}
+        }
+
+    return a + b
+
+
+def _concatenate(a: Any, b: Any) -> Any:
+    """
+    Private reducer that joins two results, key by key for dictionaries
+    """
+
+    if isinstance(a, dict):
+        return {
+            key: _concatenate(a[key], b[key])
+            if key in a and key in b
+            else a.get(key, b.get(key))
+            for key in {**a, **b}
+        }
+
+    if isinstance(a, np.ndarray):
+        return np.concatenate((a, b))
+
+    module = type(a).__module__.split(".")[0]
+    if module == "awkward":
+        import awkward as ak
+
+        return ak.concatenate((a, b))
+
+    if module == "pandas":
+        import pandas as pd
+
+        return pd.concat((a, b), ignore_index=True)
+
+    return a + b
+
+
+# the built in reducers of process
+_REDUCERS = {"add": _add, "concatenate": _concatenate}
@@ -4,7 +4,16 @@ Functions to assist in reading and accessing information in hepfiles.
 
 from __future__ import annotations
 
+import fnmatch
+import json
+import re
+import threading
+import time
 import warnings
+from collections import OrderedDict
+from contextlib import ExitStack
+from queue import Queue
+from collections.abc import Iterator
 import h5py as h5
 import numpy as np
 
@@ -17,6 +26,20 @@ from hepfile.errors import (
     HeaderNotFound,
     MissingOptionalDependency,
 )
+from hepfile.stats import IOStats
+
+__all__ = [
+    "load",
+    "iterate",
+    "File",
+    "unpack",
+    "get_nbuckets_in_file",
+    "get_nbuckets_in_data",
+    "get_file_metadata",
+    "get_file_header",
+    "print_file_metadata",
+    "print_file_header",
+]
 
 
 ################################################################################
@@ -26,19 +49,33 @@ def load(
     desired_groups: list[str] = None,
     subset: int = None,
     return_type: str = "dictionary",
+    stats: IOStats = None,
+    match: str = "substring",
+    friends: list[str] = None,
 ) -> tuple[dict, dict]:
     """
     Reads all, or a subset of the data, from the HDF5 file to fill a data dictionary.
     Returns an empty dictionary to be filled later with data from individual buckets.
 
+    To read from the same file many times, use a `hepfile.read.File` instead so that
+    the file is only opened and its schema only parsed once.
+
     Args:
         filename (string): Name of the input file
 
         verbose (boolean): True if debug output is required
 
-        desired_groups (list): Groups to be read from input file,
+        desired_groups (list): Groups to be read from input file. How these select
+                               the groups and datasets depends on match.
 
-        subset (int): Number of buckets to be read from input file
+        subset (int | list | np.ndarray): Number of buckets to be read from input
+                                          file, or the [low, high) range of buckets
+                                          to read. A numpy array, or a list that is
+                                          not two integers, selects any buckets:
+                                          either a sorted array of bucket indices or
+                                          a boolean mask with one entry per bucket.
+                                          The selected rows are coalesced into as
+                                          few contiguous reads as possible.
 
         return_type (str): Type to return. Options are 'dictionary', 'awkward', and '
                            'pandas'. Default is 'dictionary'. Note: the 'awkward' option
@@ -46,6 +83,33 @@ def load(
                            option and the 'pandas' option requires hepfile to be
                            installed with the pandas or all option!
 
+        stats (IOStats): If not None, a `hepfile.stats.IOStats` object that records
+                         the bytes read and the I/O time of each dataset and the
+                         time spent on building the counter indices. The conversion
+                         to the return_type is only timed in total. Default is None.
+
+        match (str): How desired_groups are matched against the names of the groups
+                     and datasets. Options are \n
+                     - 'substring' (default): read every dataset with any of
+                       desired_groups in its full name, and all of the counters.
+                       Note that 'jet' also reads 'fatjet/e'. \n
+                     - 'exact': desired_groups are the names of groups (all of their
+                       datasets are read), full dataset names like 'jet/e', or
+                       singletons. \n
+                     - 'glob': like 'exact' but with shell-style wildcards, like
+                       'jet/p*'. \n
+                     - 'regex': like 'exact' but desired_groups are regular
+                       expressions that must match the whole name. \n
+                     With 'exact', 'glob', and 'regex' only the selected datasets,
+                     the counters they need, and the singletons counter are read.
+                     Use '_SINGLETONS_GROUP_' to select all of the singletons.
+
+        friends (list): Names of friend files, hepfiles with the same number of
+                        buckets whose groups and datasets are added to the output as
+                        if they were in filename. They are read with the same subset
+                        and desired_groups. A friend can add datasets to a group of
+                        filename if it stores the same counter. Default is None.
+
     Returns:
         tuple(dict, dict): Selected data from HDF5, An empty bucket dictionary to be
                            filled by data from select buckets
@@ -61,6 +125,729 @@ def load(
 
     """
 
+    _check_return_type(return_type)
+    friends = _check_friends(friends)
+
+    with ExitStack() as stack:
+        infile = stack.enter_context(h5.File(filename, "r"))
+        schema_start = time.perf_counter()
+        schema = _read_schema(infile, verbose=verbose)
+        friend_files = []
+        for friend in friends:
+            friend_infile = stack.enter_context(h5.File(friend, "r"))
+            friend_schema = _read_schema(friend_infile, verbose=verbose)
+            _check_friend(infile, schema, friend_infile, friend_schema, friend)
+            friend_files.append((friend, friend_infile, friend_schema))
+        if stats is not None:
+            stats.record_time("schema", time.perf_counter() - schema_start)
+
+        groups = _split_desired_groups(
+            [schema] + [entry[2] for entry in friend_files], desired_groups, match
+        )
+
+        data, bucket = _load(
+            infile,
+            schema,
+            desired_groups=groups[0],
+            subset=subset,
+            verbose=verbose,
+            stats=stats,
+            match=match,
+        )
+
+        for (friend, friend_infile, friend_schema), friend_groups in zip(
+            friend_files, groups[1:]
+        ):
+            friend_data, friend_bucket = _load(
+                friend_infile,
+                friend_schema,
+                desired_groups=friend_groups,
+                subset=subset,
+                verbose=verbose,
+                stats=stats,
+                match=match,
+            )
+            _add_friend(data, bucket, friend_data, friend_bucket, friend)
+
+    if verbose:
+        print("Data is read in and input file is closed.")
+
+    return _convert_return_type(data, bucket, return_type, stats=stats)
+
+
+################################################################################
+def iterate(
+    filename: str,
+    chunk_size: int = 100_000,
+    desired_groups: list[str] = None,
+    return_type: str = "dictionary",
+    verbose: bool = False,
+    stats: IOStats = None,
+    match: str = "substring",
+    friends: list[str] = None,
+    prefetch: int = 0,
+) -> Iterator[tuple[dict, dict]]:
+    """
+    Iterate over a hepfile chunk_size buckets at a time.
+
+    This reads the file in contiguous chunks so that only one chunk of the file is
+    ever in memory. The file is kept open, and its schema and counters are only
+    read once, for the whole iteration.
+
+    With prefetch > 0 the next chunks are read (and converted to the return_type)
+    in a background thread while the caller works on the current chunk, so that
+    at most prefetch + 1 chunks are in memory. How much of the reading overlaps
+    with the caller depends on how much of the caller's work releases the GIL, as
+    most numpy functions do.
+
+    Args:
+        filename (str): Name of the input file
+
+        chunk_size (int): Number of buckets to read in each chunk. The last chunk may
+                          be smaller. Default is 100,000.
+
+        desired_groups (list): Groups to be read from input file
+
+        return_type (str): Type of each chunk, see `hepfile.load`. Default is
+                           'dictionary'.
+
+        verbose (boolean): True if debug output is required
+
+        stats (IOStats): If not None, a `hepfile.stats.IOStats` object that records
+                         the bytes read and the time spent on each dataset, summed
+                         over all of the chunks. Default is None.
+
+        match (str): How desired_groups are matched, see `hepfile.load`. Default is
+                     'substring'.
+
+        friends (list): Names of friend files, see `hepfile.load`. Default is None.
+
+        prefetch (int): Number of chunks to read ahead in a background thread.
+                        Default is 0, which reads each chunk when it is needed.
+
+    Yields:
+        tuple(dict, dict): Data from one chunk of the file, An empty bucket dictionary
+                           (the same as the output of `hepfile.load`)
+
+    Raises:
+        InputError: If chunk_size is not a positive integer or prefetch is negative
+    """
+
+    # check the input here, not in the generator, so the error is raised when
+    # iterate is called instead of at the first chunk
+    _check_chunk_size(chunk_size)
+    _check_prefetch(prefetch)
+
+    return _iterate_file(
+        filename,
+        friends,
+        chunk_size=chunk_size,
+        desired_groups=desired_groups,
+        return_type=return_type,
+        verbose=verbose,
+        stats=stats,
+        match=match,
+        prefetch=prefetch,
+    )
+
+
+def _iterate_file(filename: str, friends: list[str], **kwargs) -> Iterator:
+    """
+    Private generator for `hepfile.read.iterate` that keeps the file open while
+    iterating over it
+    """
+
+    with File(filename, friends=friends) as infile:
+        yield from infile.iterate(**kwargs)
+
+
+################################################################################
+class File:
+    """
+    An open hepfile, to read the data and metadata from the same file many times.
+
+    The file is opened once, in read only mode, and its schema is parsed once when
+    the File is created. The counters and their indices are read the first time
+    they are needed and then cached, so later calls to `hepfile.read.File.load`
+    only read the requested datasets.
+
+    .. code-block:: python
+
+        with hepfile.File("myfile.h5") as f:
+            print(f.nbuckets)
+            data, bucket = f.load(subset=(0, 1000))
+            metadata = f.get_metadata()
+
+    Single buckets can be fetched by their index with `hepfile.read.File.get_bucket`.
+    This only reads the blocks of the datasets that hold the bucket, and keeps the
+    most recently used blocks in memory, so that fetching the same or nearby
+    buckets again does not touch the file.
+
+    Friend files, with more groups or datasets for the same buckets, are opened
+    with the File and read along with it, see `hepfile.load`.
+
+    Attributes:
+        filename (str): Name of the input file
+        cache_size (int): Maximum number of bytes of blocks kept in memory by
+                          `hepfile.read.File.get_bucket`
+        friends (list): the open `hepfile.read.File` of each friend file
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        cache_size: int = constants.cache_size,
+        friends: list[str] = None,
+    ):
+        """
+        Args:
+            filename (str): Name of the input file
+            cache_size (int): Maximum number of bytes of decompressed blocks kept in
+                              memory by `hepfile.read.File.get_bucket`. 0 turns the
+                              cache off. Default is 64 MB.
+            friends (list): Names of friend files, see `hepfile.load`. Each friend
+                            has its own cache of cache_size bytes. Default is None.
+
+        Raises:
+            InputError: If cache_size is negative or a friend file doesn't match
+                        the file
+        """
+
+        if cache_size < 0:
+            raise InputError("cache_size must not be negative!")
+
+        self.filename = filename
+        self.cache_size = cache_size
+        self._infile = h5.File(filename, "r")
+        try:
+            self._schema = _read_schema(self._infile)
+        except Exception:
+            self._infile.close()
+            raise
+
+        self._counters = {}
+        self._nbuckets = None
+        self._datasets = {}
+        self._plans = {}
+        self._blocks = OrderedDict()
+        self._cache_nbytes = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+        self.friends = []
+        try:
+            for friend in _check_friends(friends):
+                self.friends.append(File(friend, cache_size=cache_size))
+                _check_friend(
+                    self._infile,
+                    self._schema,
+                    self.friends[-1]._infile,
+                    self.friends[-1]._schema,
+                    friend,
+                )
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        state = "open" if self._infile else "closed"
+        return f"<hepfile.File {self.filename!r} ({state})>"
+
+    def close(self) -> None:
+        """
+        Close the file. This is called automatically when used as a context manager.
+        """
+
+        self._counters = {}
+        self._datasets = {}
+        self.clear_cache()
+        self._infile.close()
+        for friend in self.friends:
+            friend.close()
+
+    def _get_infile(self) -> h5.File:
+        """
+        Private method to get the open HDF5 file
+
+        Raises:
+            ValueError: If the file is closed
+        """
+
+        if not self._infile:
+            raise ValueError(f"{self.filename} is closed!")
+
+        return self._infile
+
+    @property
+    def nbuckets(self) -> int:
+        """
+        int: number of buckets in the file, see `hepfile.read.get_nbuckets_in_file`
+        """
+
+        infile = self._get_infile()
+        if self._nbuckets is None:
+            self._nbuckets = _read_nbuckets(infile)
+
+        return self._nbuckets
+
+    @property
+    def groups(self) -> dict:
+        """
+        dict: the groups in the file and the datasets in each group
+        """
+
+        return _build_groups(
+            self._schema["_SINGLETONS_GROUP_"], self._schema["_LIST_OF_DATASETS_"]
+        )
+
+    def load(
+        self,
+        desired_groups: list[str] = None,
+        subset: int = None,
+        return_type: str = "dictionary",
+        verbose: bool = False,
+        stats: IOStats = None,
+        match: str = "substring",
+    ) -> tuple[dict, dict]:
+        """
+        Reads all, or a subset of the data, from the file. See `hepfile.read.load`
+        for the details of the arguments and output.
+
+        Args:
+            desired_groups (list): Groups to be read from input file
+            subset (int | list | np.ndarray): Number of buckets, the range of buckets,
+                                              or an array of bucket indices or a
+                                              boolean mask of the buckets to read
+            return_type (str): Type to return. Options are 'dictionary', 'awkward',
+                               and 'pandas'. Default is 'dictionary'.
+            verbose (boolean): True if debug output is required
+            stats (IOStats): `hepfile.stats.IOStats` to record the reads in
+            match (str): How desired_groups are matched, see `hepfile.load`
+
+        Returns:
+            tuple(dict, dict): Selected data from the file, An empty bucket dictionary
+        """
+
+        _check_return_type(return_type)
+
+        groups = self._split_desired_groups(desired_groups, match)
+        data, bucket = _load(
+            self._get_infile(),
+            self._schema,
+            desired_groups=groups[0],
+            subset=subset,
+            verbose=verbose,
+            stats=stats,
+            cache=self._counters,
+            match=match,
+        )
+
+        for friend, friend_groups in zip(self.friends, groups[1:]):
+            friend_data, friend_bucket = _load(
+                friend._get_infile(),
+                friend._schema,
+                desired_groups=friend_groups,
+                subset=subset,
+                verbose=verbose,
+                stats=stats,
+                cache=friend._counters,
+                match=match,
+            )
+            _add_friend(data, bucket, friend_data, friend_bucket, friend.filename)
+
+        return _convert_return_type(data, bucket, return_type, stats=stats)
+
+    def iterate(
+        self,
+        chunk_size: int = 100_000,
+        desired_groups: list[str] = None,
+        return_type: str = "dictionary",
+        verbose: bool = False,
+        stats: IOStats = None,
+        match: str = "substring",
+        prefetch: int = 0,
+    ) -> Iterator[tuple[dict, dict]]:
+        """
+        Iterate over the file chunk_size buckets at a time. See `hepfile.read.iterate`.
+
+        While prefetching, the File is used by the background thread, so don't
+        read from it in the loop.
+
+        Args:
+            chunk_size (int): Number of buckets to read in each chunk
+            desired_groups (list): Groups to be read from input file
+            return_type (str): Type of each chunk. Default is 'dictionary'.
+            verbose (boolean): True if debug output is required
+            stats (IOStats): `hepfile.stats.IOStats` to record the reads in
+            match (str): How desired_groups are matched, see `hepfile.load`
+            prefetch (int): Number of chunks to read ahead in a background thread.
+                            Default is 0.
+
+        Yields:
+            tuple(dict, dict): Data from one chunk of the file, An empty bucket
+                               dictionary
+
+        Raises:
+            InputError: If chunk_size is not a positive integer or prefetch is
+                        negative
+        """
+
+        _check_chunk_size(chunk_size)
+        _check_prefetch(prefetch)
+
+        nbuckets = self.nbuckets
+        chunks = (
+            self.load(
+                desired_groups=desired_groups,
+                subset=[low, min(low + chunk_size, nbuckets)],
+                return_type=return_type,
+                verbose=verbose,
+                stats=stats,
+                match=match,
+            )
+            for low in range(0, nbuckets, chunk_size)
+        )
+
+        if prefetch == 0:
+            return chunks
+
+        return _prefetch(chunks, prefetch)
+
+    def get_bucket(
+        self, index: int, desired_groups: list[str] = None, match: str = "substring"
+    ) -> dict:
+        """
+        Read a single bucket. The bucket is in the same form as the buckets filled by
+        `hepfile.read.unpack`: the counters and singletons are single values and the
+        other datasets are arrays with the entries of the bucket.
+
+        Only the blocks of the datasets that hold the bucket are read, using the
+        offsets stored in the file, and the blocks are kept in a least recently used
+        cache of at most cache_size bytes. Fetching the same or nearby buckets again
+        is then served from memory.
+
+        .. code-block:: python
+
+            with hepfile.File("myfile.h5") as f:
+                bucket = f.get_bucket(12345)
+                print(bucket["jet/e"])
+
+        Args:
+            index (int): index of the bucket. Negative indices count from the end.
+            desired_groups (list): Groups or datasets to read, see `hepfile.load`.
+                                   Default is all of them.
+            match (str): How desired_groups are matched, see `hepfile.load`
+
+        Returns:
+            dict: the bucket
+
+        Raises:
+            RangeSubsetError: If index is out of range
+        """
+
+        nbuckets = self.nbuckets
+        if index < 0:
+            index += nbuckets
+        if not 0 <= index < nbuckets:
+            raise RangeSubsetError(
+                f"Bucket {index} is out of range for a file with {nbuckets} buckets!"
+            )
+
+        groups = self._split_desired_groups(desired_groups, match)
+        plan, counters = self._get_plan(groups[0], match)
+
+        # the bucket spans offsets[counter] in the datasets of the group of counter
+        offsets = {
+            counter: self._get_bucket_offsets(counter, index) for counter in counters
+        }
+
+        bucket = {}
+        for name, counter in plan:
+            if counter is None:
+                bucket[name] = self._read_rows(name, index, index + 1)[0]
+            else:
+                bucket[name] = self._read_rows(name, *offsets[counter])
+
+        for friend, friend_groups in zip(self.friends, groups[1:]):
+            # the counters of shared groups are the same, keep the ones read above
+            for name, value in friend.get_bucket(index, friend_groups, match).items():
+                bucket.setdefault(name, value)
+
+        return bucket
+
+    def get_buckets(
+        self,
+        indices: list[int],
+        desired_groups: list[str] = None,
+        match: str = "substring",
+    ) -> list[dict]:
+        """
+        Read many buckets, see `hepfile.read.File.get_bucket`.
+
+        Args:
+            indices (list): indices of the buckets
+            desired_groups (list): Groups or datasets to read, see `hepfile.load`
+            match (str): How desired_groups are matched, see `hepfile.load`
+
+        Returns:
+            list: the buckets, in the order of indices
+        """
+
+        return [
+            self.get_bucket(index, desired_groups=desired_groups, match=match)
+            for index in indices
+        ]
+
+    def cache_info(self) -> dict:
+        """
+        Get the state of the block cache used by `hepfile.read.File.get_bucket`.
+
+        Returns:
+            dict: number of cache 'hits' and 'misses', the number of cached 'blocks',
+                  the bytes they take up ('nbytes'), and the 'maxsize' in bytes
+        """
+
+        return {
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "blocks": len(self._blocks),
+            "nbytes": self._cache_nbytes,
+            "maxsize": self.cache_size,
+        }
+
+    def clear_cache(self) -> None:
+        """
+        Drop all of the blocks cached by `hepfile.read.File.get_bucket`.
+        """
+
+        self._blocks.clear()
+        self._cache_nbytes = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def _split_desired_groups(self, desired_groups: list[str], match: str) -> list:
+        """
+        Private method to get the desired_groups of the file and of each friend
+        """
+
+        if len(self.friends) == 0:
+            return [desired_groups]
+
+        schemas = [self._schema] + [friend._schema for friend in self.friends]
+        return _split_desired_groups(schemas, desired_groups, match)
+
+    def _get_plan(
+        self, desired_groups: list[str], match: str
+    ) -> tuple[list[tuple[str, str]], list[str]]:
+        """
+        Private method to get the datasets to read for a selection, as a list of
+        (name, counter) where counter is None for the counters and singletons (which
+        have one entry per bucket), and the counters of the other datasets.
+        """
+
+        key = (
+            desired_groups
+            if desired_groups is None or isinstance(desired_groups, str)
+            else tuple(desired_groups),
+            match,
+        )
+        if key in self._plans:
+            return self._plans[key]
+
+        datasets, _ = _select_datasets(
+            self._schema, desired_groups=desired_groups, match=match
+        )
+
+        infile = self._get_infile()
+        counters = set(self._schema["_LIST_OF_COUNTERS_"])
+        singletons = set(self._schema["_SINGLETONS_GROUP_"])
+        plan = []
+        for name in datasets:
+            # skip the groups
+            if name not in infile or not isinstance(infile[name], h5.Dataset):
+                continue
+
+            if name in counters or name in singletons:
+                plan.append((name, None))
+            else:
+                plan.append((name, self._schema["_MAP_DATASETS_TO_COUNTERS_"][name]))
+
+        needed = sorted({counter for _, counter in plan if counter is not None})
+        self._plans[key] = (plan, needed)
+
+        return self._plans[key]
+
+    def _get_bucket_offsets(self, counter_name: str, index: int) -> tuple[int, int]:
+        """
+        Private method to get the range of entries of bucket index in the datasets
+        of the group of a counter. Files without stored offsets read the whole
+        counter once.
+        """
+
+        if counter_name == "_SINGLETONS_GROUP_/COUNTER":
+            return index, index + 1
+
+        offsets_name = self._schema["_OFFSETS_"].get(counter_name)
+        if offsets_name is None:
+            offsets = self.get_offsets(counter_name)
+        else:
+            offsets = self._read_rows(offsets_name, index, index + 2)
+            index = 0
+
+        return int(offsets[index]), int(offsets[index + 1])
+
+    def _read_rows(self, name: str, start: int, stop: int) -> np.ndarray:
+        """
+        Private method to read rows start to stop of a dataset through the block
+        cache.
+        """
+
+        if name not in self._datasets:
+            dataset = self._get_infile()[name]
+            block_rows = constants.cache_block_rows
+            if dataset.chunks is not None:
+                block_rows = dataset.chunks[0]
+            empty = np.empty((0,) + dataset.shape[1:], dtype=dataset.dtype)
+            self._datasets[name] = (dataset, block_rows, empty)
+
+        dataset, block_rows, empty = self._datasets[name]
+        if stop <= start:
+            return empty.copy()
+
+        first = start // block_rows
+        last = (stop - 1) // block_rows
+        pieces = []
+        for block in range(first, last + 1):
+            values = self._read_block(dataset, name, block, block_rows)
+            low = max(start - block * block_rows, 0)
+            high = min(stop - block * block_rows, block_rows)
+            pieces.append(values[low:high])
+
+        if len(pieces) == 1:
+            # copy so that the cached blocks can't be edited through the output
+            return pieces[0].copy()
+
+        return np.concatenate(pieces)
+
+    def _read_block(
+        self, dataset: h5.Dataset, name: str, block: int, block_rows: int
+    ) -> np.ndarray:
+        """
+        Private method to get a block of a dataset from the cache, or read it and
+        add it to the cache, dropping the least recently used blocks to stay under
+        cache_size bytes.
+        """
+
+        key = (name, block)
+        if key in self._blocks:
+            self._cache_hits += 1
+            self._blocks.move_to_end(key)
+            return self._blocks[key]
+
+        self._cache_misses += 1
+        values = dataset[block * block_rows : (block + 1) * block_rows]
+        if values.nbytes > self.cache_size:
+            return values
+
+        self._blocks[key] = values
+        self._cache_nbytes += values.nbytes
+        while self._cache_nbytes > self.cache_size:
+            _, dropped = self._blocks.popitem(last=False)
+            self._cache_nbytes -= dropped.nbytes
+
+        return values
+
+    def get_counter(self, counter_name: str) -> np.ndarray:
+        """
+        Get a counter of the whole file. The counters are cached after the first read.
+
+        Args:
+            counter_name (str): full name of the counter, like 'jet/njet'
+
+        Returns:
+            np.ndarray: the counter, read only because it is shared with the cache
+        """
+
+        return _read_counter(self._get_infile(), counter_name, cache=self._counters)[0]
+
+    def get_offsets(self, counter_name: str) -> np.ndarray:
+        """
+        Get the offsets of the entries of the buckets in the datasets of a group, so
+        that bucket i spans offsets[i] to offsets[i+1]. The offsets are cached after
+        the first read.
+
+        Args:
+            counter_name (str): full name of the counter, like 'jet/njet'
+
+        Returns:
+            np.ndarray: the offsets, with one more entry than the counter. Read only
+                        because they are shared with the cache.
+        """
+
+        return _read_counter(self._get_infile(), counter_name, cache=self._counters)[1]
+
+    def get_metadata(self) -> dict:
+        """
+        Get the file metadata, see `hepfile.read.get_file_metadata`.
+
+        Returns:
+            dict: Dictionary of the hepfile's metadata.
+        """
+
+        return _read_metadata(self._get_infile(), self.filename)
+
+    def get_header(self, return_type: str = "dict") -> dict:
+        """
+        Get the file header, see `hepfile.read.get_file_header`.
+
+        Args:
+            return_type (string): 'dict', 'df', or 'dataframe'
+
+        Returns:
+            dict: Dictionary (or dataframe) with the header information.
+        """
+
+        return _read_header(self._get_infile(), self.filename, return_type=return_type)
+
+    def print_metadata(self) -> str:
+        """
+        Pretty print the file metadata, see `hepfile.read.print_file_metadata`.
+
+        Returns:
+            str: String representation of the hepfile's metadata.
+        """
+
+        try:
+            metadata = self.get_metadata()
+        except MetadataNotFound:
+            warnings.warn(f"No Metadata in {self.filename}!")
+            return ""
+
+        return _print_metadata(metadata)
+
+    def print_header(self) -> str:
+        """
+        Pretty print the file header, see `hepfile.read.print_file_header`.
+
+        Returns:
+            str: String representation of the header information, if it exists.
+        """
+
+        return _print_header(self.get_header(return_type="dict"))
+
+
+################################################################################
+def _check_return_type(return_type: str) -> None:
+    """
+    Private method to check the return_type of load
+    """
+
     if return_type not in {"dictionary", "awkward", "pandas"}:
         raise InputError("return_type must be dictionary, awkward, or pandas")
 
@@ -70,293 +857,1034 @@ def load(
     if return_type == "pandas" and not hf._PANDAS:
         raise MissingOptionalDependency(return_type)
 
-    with h5.File(filename, "r+") as infile:
-        # Create the initial data and bucket dictionary to hold the data
-        data = {}
-        bucket = {}
 
-        # We'll fill the data dictionary with some extra fields, though we won't
-        # need them all for the bucket
-        data["_MAP_DATASETS_TO_COUNTERS_"] = {}
-        data["_MAP_DATASETS_TO_INDEX_"] = {}
-        data["_LIST_OF_COUNTERS_"] = []
-        data["_LIST_OF_DATASETS_"] = []
-        data["_META_"] = {}
-
-        # Get the number of buckets.
-        # In HEP (High Energy Physics), this would be the number of events
-        data["_NUMBER_OF_BUCKETS_"] = infile.attrs["_NUMBER_OF_BUCKETS_"]
-
-        # We might only read in a subset of the data though!
-        if subset is not None:
-            if isinstance(subset, tuple):
-                subset = list(subset)
-
-            if isinstance(subset, int):
-                if verbose:
-                    warning = "\n".join(
-                        (
-                            f"Single subset value ({subset}) being used as high range",
-                            f"subset being set to a range of (0,{subset})\n",
-                        )
-                    )
-                    warnings.warn(warning)
+def _check_chunk_size(chunk_size: int) -> None:
+    """
+    Private method to check the chunk_size of iterate
+    """
 
-                subset = [0, subset]
+    if not isinstance(chunk_size, (int, np.integer)) or chunk_size <= 0:
+        raise InputError("chunk_size must be a positive integer!")
 
-            # If the user has specified `subset` incorrectly, then let's return
-            # an empty data and bucket
-            if subset[1] - subset[0] <= 0:
-                raise RangeSubsetError(
-                    "The range in subset is either 0 or negative! "
-                    + f"{subset[1]} - {subset[0]} = {subset[1] - subset[0]}"
-                )
 
-            # Make sure the user is not asking for something bigger than the file!
-            nbuckets = data["_NUMBER_OF_BUCKETS_"]
+def _check_prefetch(prefetch: int) -> None:
+    """
+    Private method to check the prefetch argument of the iterators
+    """
+
+    if not isinstance(prefetch, (int, np.integer)) or prefetch < 0:
+        raise InputError("prefetch must be a non-negative integer!")
 
-            if subset[0] > nbuckets:
-                raise RangeSubsetError(
-                    "Range for subset starts greater than number of buckets "
-                    + f"in file! {subset[0]} > {nbuckets}"
-                )
 
-            if subset[1] > nbuckets:
-                warnings.warn(
-                    "Range for subset is greater than number of buckets in "
-                    + f"file!\n{subset[1]} > {nbuckets}\nHigh range of subset will "
-                    + f"be set to {nbuckets}\n"
-                )
-                subset[1] = nbuckets
+def _prefetch(items: Iterator, depth: int) -> Iterator:
+    """
+    Private generator that runs the items iterator in a background thread, at most
+    depth items ahead of the caller. With the item the caller is working on, at
+    most depth + 1 items exist at once. Errors in the thread are raised in the
+    caller, and the thread is stopped when the caller stops iterating.
+    """
+
+    queue = Queue()
+    # one slot for every item that is read and not yet given back by the caller
+    slots = threading.Semaphore(depth + 1)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            iterator = iter(items)
+            while True:
+                # wait for a free slot, unless the caller stopped iterating
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+
+                item = next(iterator, done)
+                queue.put((item, None))
+                if item is done:
+                    return
+        except BaseException as error:
+            queue.put((None, error))
+
+    thread = threading.Thread(target=produce, name="hepfile-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = queue.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+
+            # the caller asked for the next item, so it is done with this one
+            del item
+            slots.release()
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _convert_return_type(
+    data: dict, bucket: dict, return_type: str, stats: IOStats = None
+) -> tuple:
+    """
+    Private method to convert the data dictionary from _load to the return_type
+    """
 
-            data["_NUMBER_OF_BUCKETS_"] = subset[1] - subset[0]
-            nbuckets = data["_NUMBER_OF_BUCKETS_"]
+    conversion_start = time.perf_counter()
 
-            if verbose:
-                print("Will read in a subset of the file!")
-                print(
-                    f"From bucket {subset[0]} (inclusive) through bucket"
-                    + f"{subset[1]-1} (inclusive)"
-                )
-                print(f"Bucket {subset[1]} is not read in")
-                print(f"Reading in {nbuckets} buckets\n")
-
-        ############################################################################
-        # Get the datasets and counters
-        ############################################################################
-        allvalues = infile["_MAP_DATASETS_TO_COUNTERS_"]
-        for vals in allvalues:
-            if verbose:
-                print(f"Map datasets to counters: {vals}")
+    if return_type == "awkward":
+        from hepfile.awkward_tools import hepfile_to_awkward
 
+        data = hepfile_to_awkward(data)
+
+    elif return_type == "pandas":
+        from hepfile.df_tools import hepfile_to_df
+
+        data = hepfile_to_df(data)
+
+    if stats is not None:
+        stats.record_time("conversion", time.perf_counter() - conversion_start)
+
+    return data, bucket
+
+
+def _read_nbuckets(infile: h5.File) -> int:
+    """
+    Private method to get the number of buckets in an open hepfile
+    """
+
+    attr = infile.attrs
+    if "_NUMBER_OF_BUCKETS_" not in attr:
+        raise AttributeError(
+            'File does not contain the attribute, "_NUMBER_OF_BUCKETS_"'
+        )
+
+    return attr.get("_NUMBER_OF_BUCKETS_")
+
+
+def _read_schema(infile: h5.File, verbose: bool = False) -> dict:
+    """
+    Private method to read the datasets, counters, and singletons of an open
+    hepfile. This is one small read of the _SCHEMA_ record if the file has one,
+    otherwise it is rebuilt from the _MAP_DATASETS_TO_COUNTERS_ and
+    _SINGLETONSGROUPFORSTORAGE_ tables.
+    """
+
+    record = None
+    if "_SCHEMA_" in infile:
+        record = json.loads(infile["_SCHEMA_"][()])
+        if record.get("version", 0) > constants.schema_version:
+            warnings.warn(
+                f"The schema record of {infile.filename} is version "
+                + f"{record.get('version')} but this version of hepfile only "
+                + f"knows up to version {constants.schema_version}! Reading the "
+                + "schema from the other tables in the file instead."
+            )
+            record = None
+
+    if record is not None:
+        map_datasets_to_counters = record["map_datasets_to_counters"]
+        singletons = list(record["singletons"])
+    else:
+        map_datasets_to_counters = {}
+        for vals in infile["_MAP_DATASETS_TO_COUNTERS_"][:]:
             # The decode is there because vals were stored as numpy.bytes
-            counter = vals[1].decode()
-            index = f"{counter}_INDEX"
-            data["_MAP_DATASETS_TO_COUNTERS_"][vals[0].decode()] = counter
-            data["_MAP_DATASETS_TO_INDEX_"][vals[0].decode()] = index
-            data["_LIST_OF_COUNTERS_"].append(vals[1].decode())
-            data["_LIST_OF_DATASETS_"].append(vals[0].decode())
-            data["_LIST_OF_DATASETS_"].append(
-                vals[1].decode()
-            )  # Get the counters as well
-
-        # We may have added some counters and datasets multiple times.
-        # So just to be sure, only keep the unique values
-        data["_LIST_OF_COUNTERS_"] = np.unique(data["_LIST_OF_COUNTERS_"]).tolist()
-        data["_LIST_OF_DATASETS_"] = np.unique(data["_LIST_OF_DATASETS_"]).tolist()
-        ############################################################################
-
-        ############################################################################
-        # Pull out the SINGLETON datasets
-        ############################################################################
-        # This is a numpy array of strings
+            map_datasets_to_counters[vals[0].decode()] = vals[1].decode()
+
+        # The singletons are stored as one string, separated by __:__
         singletons_group = infile["_SINGLETONSGROUPFORSTORAGE_"][0]
-        decoded_string = singletons_group[1].decode()
+        singletons = singletons_group[1].decode().split("__:__")
+        if "COUNTER" in singletons:
+            singletons.remove("COUNTER")
+
+    schema = {
+        "_MAP_DATASETS_TO_COUNTERS_": {},
+        "_MAP_DATASETS_TO_INDEX_": {},
+        "_SINGLETONS_GROUP_": singletons,
+        # these are only in the schema record
+        "_DATASETS_": {} if record is None else record["datasets"],
+        "_OFFSETS_": {} if record is None else record["offsets"],
+    }
+
+    counters = set()
+    datasets = set()
+    for dataset, counter in map_datasets_to_counters.items():
+        if verbose:
+            print(f"Map datasets to counters: {dataset} {counter}")
 
-        vals = decoded_string.split("__:__")
-        vals.remove("COUNTER")
+        schema["_MAP_DATASETS_TO_COUNTERS_"][dataset] = counter
+        schema["_MAP_DATASETS_TO_INDEX_"][dataset] = f"{counter}_INDEX"
+        counters.add(counter)
+        datasets.add(dataset)
+        datasets.add(counter)  # Get the counters as well
 
-        data["_SINGLETONS_GROUP_"] = vals
-        ############################################################################
+    schema["_LIST_OF_COUNTERS_"] = sorted(counters)
+    schema["_LIST_OF_DATASETS_"] = sorted(datasets)
 
-        ############################################################################
-        # Get the list of datasets and groups
-        ############################################################################
-        all_datasets = data["_LIST_OF_DATASETS_"]
+    if verbose:
+        print(f"all_datasets: {schema['_LIST_OF_DATASETS_']}")
 
-        if verbose:
-            print(f"all_datasets: {all_datasets}")
-        ############################################################################
-
-        ############################################################################
-        # Only keep select data from file, if we have specified desired_groups
-        ############################################################################
-        if desired_groups is not None:
-            if not isinstance(desired_groups, list):
-                desired_groups = list(desired_groups)
-
-            # Count backwards because we'll be removing stuff as we go.
-            i = len(all_datasets) - 1
-            while i >= 0:
-                entry = all_datasets[i]
-
-                is_dropped = True
-                # This is looking to see if the string is anywhere in the name
-                # of the dataset
-                for desdat in desired_groups:
-                    if desdat in entry:
-                        is_dropped = False
-                        break
-
-                if is_dropped is True:
-                    if verbose:
-                        print(f"Not reading out {entry} from the file....")
-                    all_datasets.remove(entry)
+    return schema
 
-                i -= 1
 
-            if verbose:
-                print("After only selecting certain datasets ----- ")
-                print(f"all_datasets: {all_datasets}")
-        ###########################################################################
+def _select_datasets(
+    schema: dict,
+    desired_groups: list[str] = None,
+    match: str = "substring",
+    verbose: bool = False,
+) -> tuple[list[str], list[str]]:
+    """
+    Private method to select the datasets of the schema to read, and the counters
+    they need.
 
-        # We might need the counter for SINGLETONS so let's pull it out
-        data["_SINGLETONS_GROUP_/COUNTER"] = infile["_SINGLETONS_GROUP_"]["COUNTER"]
+    With match='substring' a dataset is read if any of the desired_groups is in its
+    name and all of the counters are read. Otherwise desired_groups are matched
+    against the full names of the groups and datasets with `_match_names`. A
+    matching group selects all of its datasets, and only the counters of the
+    selected datasets are read.
 
-        if verbose:
-            print("\nDatasets and counters:")
-            print(data["_MAP_DATASETS_TO_COUNTERS_"])
-            print("\nList of counters:")
-            print(data["_LIST_OF_COUNTERS_"])
-            print("\n_SINGLETONS_GROUP_/COUNTER:")
-            print(data["_SINGLETONS_GROUP_/COUNTER"])
-            print("\n")
-
-        ############################################################################
-        # Pull out the counters and build the indices
-        ############################################################################
+    Returns:
+        tuple(list, list): sorted names of the datasets (and counters), sorted names
+                           of the counters
+    """
+
+    if match not in {"substring", "exact", "glob", "regex"}:
+        raise InputError("match must be substring, exact, glob, or regex")
+
+    all_datasets = schema["_LIST_OF_DATASETS_"]
+    all_counters = schema["_LIST_OF_COUNTERS_"]
+    if desired_groups is None:
+        return list(all_datasets), list(all_counters)
+
+    if isinstance(desired_groups, str):
+        desired_groups = [desired_groups]
+
+    if match == "substring":
+        selected = []
+        for entry in all_datasets:
+            # This is looking to see if the string is anywhere in the name
+            # of the dataset
+            if any(desdat in entry for desdat in desired_groups):
+                selected.append(entry)
+            elif verbose:
+                print(f"Not reading out {entry} from the file....")
 
         if verbose:
-            print("Building the indices...\n")
-            print("data.keys()")
-            print(data.keys())
-            print("\n")
+            print("After only selecting certain datasets ----- ")
+            print(f"all_datasets: {selected}")
 
-        # We will need to keep track of the indices in the entire file
-        # This way, if the user specifies a subset of the data, we have the full
-        # indices already calculated
-        full_file_indices = {}
+        return selected, list(all_counters)
 
-        for counter_name in data["_LIST_OF_COUNTERS_"]:
-            if verbose:
-                print(f"counter name: ------------ {counter_name}\n")
+    map_datasets_to_counters = schema["_MAP_DATASETS_TO_COUNTERS_"]
+    members = _get_members(schema)
 
-            full_file_counters = infile[counter_name]
-            full_file_index = _calculate_index_from_counters(full_file_counters)
+    selected = set()
+    for name in _match_names(members, desired_groups, match):
+        selected |= members[name]
 
-            if verbose:
-                print(f"full file counters: {full_file_counters}\n")
-                print(f"full file index: {full_file_index}\n")
-
-            if subset is not None:
-                # We tack on +1 to the high range of subset when we get the counters
-                # and index because we want all of the entries for the last entry.
-                data[counter_name] = infile[counter_name][subset[0] : subset[1] + 1]
-                index = full_file_index[subset[0] : subset[1] + 1]
-            else:
-                data[counter_name] = infile[counter_name][:]
-                index = full_file_index
+    # every bucket has an entry in the singletons counter, so always read it. This
+    # also keeps the output data dictionary writable with write_to_file.
+    counters = selected & set(all_counters)
+    counters.add("_SINGLETONS_GROUP_/COUNTER")
+    counters.update(
+        map_datasets_to_counters[name]
+        for name in selected
+        if name in map_datasets_to_counters
+    )
+    selected |= counters
+
+    if verbose:
+        print("After only selecting certain datasets ----- ")
+        print(f"all_datasets: {sorted(selected)}")
 
-            subset_index = index
-            # If the file is *not* empty....
-            # Just to make sure the "local" index of the data dictionary starts at 0
-            if len(index) > 0:
-                subset_index = index - index[0]
+    return sorted(selected), sorted(counters)
 
-            index_name = f"{counter_name}_INDEX"
 
-            data[index_name] = subset_index
-            full_file_indices[index_name] = index
+def _get_members(schema: dict) -> dict:
+    """
+    Private method to get the names that can be selected with match='exact',
+    'glob', or 'regex' and the datasets that each of them selects
+    """
+
+    singletons = set(schema["_SINGLETONS_GROUP_"])
+
+    members = {}
+    for name, counter in schema["_MAP_DATASETS_TO_COUNTERS_"].items():
+        if name in constants.protected_names:
+            continue
+
+        group = name.split("/")[0]
+        if name in singletons:
+            members.setdefault(name, set()).add(name)
+        else:
+            members.setdefault(group, {group, counter}).add(name)
+            members.setdefault(name, {group}).add(name)
+            members.setdefault(counter, {group}).add(counter)
+
+    # the singletons are a group too
+    if len(singletons) > 0:
+        members["_SINGLETONS_GROUP_"] = set(singletons)
+
+    return members
+
+
+def _match_names(names: dict, patterns: list[str], match: str) -> list[str]:
+    """
+    Private method to get the names that match any of the patterns. match is one of
+    'exact' (the name is one of the patterns), 'glob' (the name matches one of the
+    patterns with `fnmatch.fnmatchcase`), or 'regex' (the name matches one of the
+    regular expressions with `re.fullmatch`).
+
+    Raises:
+        InputError: If match isn't a valid option or if, with match='exact', one of
+                    the patterns isn't a name.
+    """
 
+    if match == "exact":
+        missing = [pattern for pattern in patterns if pattern not in names]
+        if len(missing) > 0:
+            raise InputError(f"{missing} are not groups or datasets in the file!")
+        return list(patterns)
+
+    if match == "glob":
+        matched = set()
+        for pattern in patterns:
+            matched.update(fnmatch.filter(names, pattern))
+        return sorted(matched)
+
+    if match == "regex":
+        regexes = [re.compile(pattern) for pattern in patterns]
+        return [
+            name for name in names if any(regex.fullmatch(name) for regex in regexes)
+        ]
+
+    raise InputError("match must be exact, glob, or regex")
+
+
+def _build_groups(singletons: list[str], datasets: list[str]) -> dict:
+    """
+    Private method to build the _GROUPS_ of a data dictionary from the names of
+    the singletons and the datasets in it
+    """
+
+    singletons_group = set(singletons)
+
+    groups = {}
+    for name in datasets:
+        group = name.split("/")[0]
+        if group in singletons_group or group in constants.protected_names:
+            continue
+
+        members = groups.setdefault(group, [])
+        if name != group:
+            members.append(name.split("/")[-1])
+
+    out = {"_SINGLETONS_GROUP_": list(singletons)}
+    for group in sorted(groups):
+        out[group] = groups[group]
+
+    return out
+
+
+def _check_friends(friends: str | list[str]) -> list[str]:
+    """
+    Private method to convert the friends argument to a list of file names
+    """
+
+    if friends is None:
+        return []
+
+    if isinstance(friends, str):
+        return [friends]
+
+    return list(friends)
+
+
+def _check_friend(
+    infile: h5.File,
+    schema: dict,
+    friend_infile: h5.File,
+    friend_schema: dict,
+    friend: str,
+) -> None:
+    """
+    Private method to check that a friend file can be read along with infile: it
+    has the same number of buckets, the groups in both files have the same counter,
+    and no other dataset is in both files.
+
+    Raises:
+        InputError: If the friend doesn't match infile
+    """
+
+    nbuckets = _read_nbuckets(infile)
+    friend_nbuckets = _read_nbuckets(friend_infile)
+    if friend_nbuckets != nbuckets:
+        raise InputError(
+            f"The friend file {friend} has {friend_nbuckets} buckets but "
+            + f"{infile.filename} has {nbuckets}!"
+        )
+
+    map_datasets_to_counters = schema["_MAP_DATASETS_TO_COUNTERS_"]
+    groups = set(
+        _build_groups(schema["_SINGLETONS_GROUP_"], schema["_LIST_OF_DATASETS_"])
+    )
+    friend_groups = set(
+        _build_groups(
+            friend_schema["_SINGLETONS_GROUP_"], friend_schema["_LIST_OF_DATASETS_"]
+        )
+    )
+
+    for name, counter in friend_schema["_MAP_DATASETS_TO_COUNTERS_"].items():
+        if name in constants.protected_names or name not in map_datasets_to_counters:
+            continue
+
+        if name in groups and name in friend_groups:
+            if counter != map_datasets_to_counters[name]:
+                raise InputError(
+                    f"The group {name} is counted by {counter} in the friend file "
+                    + f"{friend} but by {map_datasets_to_counters[name]} in "
+                    + f"{infile.filename}!"
+                )
+            continue
+
+        raise InputError(
+            f"{name} is in both {infile.filename} and the friend file {friend}!"
+        )
+
+
+def _split_desired_groups(
+    schemas: list[dict], desired_groups: list[str], match: str
+) -> list:
+    """
+    Private method to get the desired_groups to read from each of a file and its
+    friends. With match='exact' each file only gets the names that it has, the
+    other matches can select nothing in a file and are passed to all of them.
+
+    Raises:
+        InputError: If, with match='exact', one of desired_groups isn't in any of
+                    the files
+    """
+
+    if match != "exact" or desired_groups is None or len(schemas) == 1:
+        return [desired_groups] * len(schemas)
+
+    if isinstance(desired_groups, str):
+        desired_groups = [desired_groups]
+
+    members = [_get_members(schema) for schema in schemas]
+    missing = [
+        name for name in desired_groups if not any(name in names for names in members)
+    ]
+    if len(missing) > 0:
+        raise InputError(
+            f"{missing} are not groups or datasets in the file or its friends!"
+        )
+
+    return [[name for name in desired_groups if name in names] for names in members]
+
+
+def _add_friend(
+    data: dict, bucket: dict, friend_data: dict, friend_bucket: dict, friend: str
+) -> None:
+    """
+    Private method to add the groups and datasets read from a friend file to the
+    data and bucket dictionaries read from the main file, in place.
+
+    Raises:
+        InputError: If a counter of a group in both files has different values
+    """
+
+    for counter in friend_data["_LIST_OF_COUNTERS_"]:
+        if counter in data["_LIST_OF_COUNTERS_"]:
+            if not np.array_equal(data[counter], friend_data[counter]):
+                raise InputError(
+                    f"The counter {counter} has different values in the friend "
+                    + f"file {friend}!"
+                )
+            continue
+
+        data["_LIST_OF_COUNTERS_"].append(counter)
+        data[f"{counter}_INDEX"] = friend_data[f"{counter}_INDEX"]
+
+    datasets = set(data["_LIST_OF_DATASETS_"])
+    for name in friend_data["_LIST_OF_DATASETS_"]:
+        # the groups and counters in both files are already in data
+        if name in datasets:
+            continue
+
+        data["_LIST_OF_DATASETS_"].append(name)
+        if name in friend_data:
+            data[name] = friend_data[name]
+        if name in friend_bucket:
+            bucket[name] = None
+
+    for key in (
+        "_MAP_DATASETS_TO_COUNTERS_",
+        "_MAP_DATASETS_TO_INDEX_",
+        "_MAP_DATASETS_TO_DATA_TYPES_",
+        "_META_",
+    ):
+        for name, value in friend_data[key].items():
+            data[key].setdefault(name, value)
+
+    singletons = list(data["_SINGLETONS_GROUP_"])
+    singletons += [
+        name for name in friend_data["_SINGLETONS_GROUP_"] if name not in singletons
+    ]
+    data["_SINGLETONS_GROUP_"] = np.array(singletons)
+    data["_MAP_DATASETS_TO_DATA_TYPES_"]["_SINGLETONS_GROUP_"] = data[
+        "_SINGLETONS_GROUP_"
+    ].dtype
+    data["_GROUPS_"] = _build_groups(singletons, data["_LIST_OF_DATASETS_"])
+
+
+def _check_subset(subset: int | list, nbuckets: int, verbose: bool = False) -> list:
+    """
+    Private method to convert the subset argument of load to a [low, high] range of
+    buckets and check it against the number of buckets in the file.
+    """
+
+    if isinstance(subset, tuple):
+        subset = list(subset)
+
+    if isinstance(subset, (int, np.integer)):
         if verbose:
-            print("Built the indices!")
-            print("full_file_index: ")
-            print(f"{full_file_indices}\n")
-
-        # Loop over the all_datasets we want and pull out the data.
-        for name in all_datasets:
-            # If this is a counter, we're going to have to grab the indices
-            # differently than for a "normal" dataset
-            is_counter = True
-            index_name = None
-            if name not in data["_LIST_OF_COUNTERS_"]:
-                index_name = data["_MAP_DATASETS_TO_INDEX_"][name]
-                is_counter = False  # We will use different indices for the counters
+            warning = "\n".join(
+                (
+                    f"Single subset value ({subset}) being used as high range",
+                    f"subset being set to a range of (0,{subset})\n",
+                )
+            )
+            warnings.warn(warning)
+
+        subset = [0, subset]
+    else:
+        subset = list(subset)
+
+    # If the user has specified `subset` incorrectly, then let's return
+    # an empty data and bucket
+    if subset[1] - subset[0] <= 0:
+        raise RangeSubsetError(
+            "The range in subset is either 0 or negative! "
+            + f"{subset[1]} - {subset[0]} = {subset[1] - subset[0]}"
+        )
 
-            if verbose:
-                print(f"------ {name}")
-                print(f"index_name: {index_name}\n")
+    # Make sure the user is not asking for something bigger than the file!
+    if subset[0] > nbuckets:
+        raise RangeSubsetError(
+            "Range for subset starts greater than number of buckets "
+            + f"in file! {subset[0]} > {nbuckets}"
+        )
 
-            dataset = infile[name]
+    if subset[1] > nbuckets:
+        warnings.warn(
+            "Range for subset is greater than number of buckets in "
+            + f"file!\n{subset[1]} > {nbuckets}\nHigh range of subset will "
+            + f"be set to {nbuckets}\n"
+        )
+        subset[1] = nbuckets
 
-            if verbose:
-                print(f"dataset type: {type(dataset)}")
+    if verbose:
+        print("Will read in a subset of the file!")
+        print(
+            f"From bucket {subset[0]} (inclusive) through bucket"
+            + f"{subset[1]-1} (inclusive)"
+        )
+        print(f"Bucket {subset[1]} is not read in")
+        print(f"Reading in {subset[1] - subset[0]} buckets\n")
 
-            # This will ignore the groups
-            if isinstance(dataset, h5.Dataset):
-                dataset_name = name
+    return subset
 
-                if subset is not None:
-                    if is_counter:
-                        # If this is a counter, then the subset indices
-                        # map on to the same locations for any counters
-                        low = subset[0]
-                        high = subset[1]
-                    else:
-                        low = full_file_indices[index_name][0]
-                        high = full_file_indices[index_name][-1]
-                    if verbose:
-                        print(f"dataset name/low/high: {dataset_name},{low},{high}\n")
-                    data[dataset_name] = dataset[int(low) : int(high)]
-                else:
-                    data[dataset_name] = dataset[:]
 
-                bucket[dataset_name] = None  # This will be filled for individual bucket
-                if verbose:
-                    print(dataset)
+def _is_subset_range(subset: list | tuple) -> bool:
+    """
+    Private method to check if a list subset of load is a [low, high) range of
+    buckets, rather than bucket indices or a boolean mask
+    """
+
+    return len(subset) == 2 and all(
+        isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+        for value in subset
+    )
 
-            # write the metadata for that group to data if it exists
-            if name not in constants.protected_names and "meta" in dataset.attrs.keys():
-                data["_META_"][name] = dataset.attrs["meta"]
 
-        # Add the GROUPS field to the bucket. It's a bit of extra data
-        # that most of the time is not needed, but can be helpful for
-        # if we want to convert the bucket to a dataframe.
+def _read_counter(
+    infile: h5.File, counter_name: str, stats: IOStats = None, cache: dict = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Private method to read a counter of the whole file and calculate its offsets.
+    If cache is not None the counter and offsets are looked up in and added to it,
+    read only so that they can't be changed for the later reads.
+    """
+
+    if cache is not None and counter_name in cache:
+        return cache[counter_name]
+
+    tic = time.perf_counter()
+    counters = infile[counter_name][:]
+    toc = time.perf_counter()
+    offsets = _offsets_from_counter(counters)
+
+    if stats is not None:
+        stats.record(
+            counter_name,
+            nbytes=counters.nbytes,
+            storage_size=infile[counter_name].id.get_storage_size(),
+            io_time=toc - tic,
+        )
+        stats.record_index(counter_name, time.perf_counter() - toc)
+
+    if cache is not None:
+        counters.flags.writeable = False
+        offsets.flags.writeable = False
+        cache[counter_name] = (counters, offsets)
+
+    return counters, offsets
+
+
+def _read_counter_range(
+    infile: h5.File,
+    schema: dict,
+    counter_name: str,
+    subset: list = None,
+    stats: IOStats = None,
+    cache: dict = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Private method to read the counter of the buckets in subset (or all buckets if
+    subset is None) and their offsets in the file, so that bucket i of the subset
+    spans offsets[i] to offsets[i+1] in the datasets of the group.
+
+    If the file stores the offsets of the counter, only the offsets of the subset
+    are read. Otherwise the whole counter is read and the offsets are calculated.
+    The singletons have one entry per bucket, so their offsets are never read.
+    """
+
+    if subset is not None and counter_name == "_SINGLETONS_GROUP_/COUNTER":
+        nbuckets = _read_nbuckets(infile)
+        first = min(subset[0], nbuckets)
+        last = min(subset[1], nbuckets)
+        counters = np.ones(
+            last - first, dtype=_counter_dtype(infile, schema, counter_name)
+        )
+        return counters, np.arange(first, last + 1, dtype=np.int64)
+
+    offsets_name = schema["_OFFSETS_"].get(counter_name)
+    if subset is not None and cache is None and offsets_name is not None:
+        offsets_dataset = infile[offsets_name]
+        ncounters = len(offsets_dataset) - 1
+        first = min(subset[0], ncounters)
+        last = min(subset[1], ncounters)
+
+        tic = time.perf_counter()
+        offsets = offsets_dataset[first : last + 1]
+        toc = time.perf_counter()
+        counters = np.diff(offsets).astype(_counter_dtype(infile, schema, counter_name))
+
+        if stats is not None:
+            stats.record(
+                offsets_name,
+                nbytes=offsets.nbytes,
+                storage_size=offsets_dataset.id.get_storage_size(),
+                io_time=toc - tic,
+            )
+            stats.record_index(counter_name, time.perf_counter() - toc)
+
+        return counters, offsets
+
+    counters, offsets = _read_counter(infile, counter_name, stats=stats, cache=cache)
+
+    if subset is not None:
+        # The offsets have one more entry than the counters, so the offset
+        # at the high range of subset is where the last bucket ends.
+        first = min(subset[0], len(counters))
+        last = min(subset[1], len(counters))
+    else:
+        first = 0
+        last = len(counters)
+
+    # copy so that the cached counters can't be edited through the output
+    return counters[first:last].copy(), offsets[first : last + 1]
+
+
+def _check_subset_indices(
+    subset: np.ndarray, nbuckets: int, verbose: bool = False
+) -> np.ndarray:
+    """
+    Private method to convert a subset array of load (a sorted array of bucket
+    indices or a boolean mask) to the indices of the buckets to read and check them
+    against the number of buckets in the file.
+    """
+
+    if subset.ndim != 1:
+        raise RangeSubsetError("An array subset must be one dimensional!")
+
+    if subset.dtype.kind == "b":
+        if len(subset) != nbuckets:
+            raise RangeSubsetError(
+                f"The mask in subset has {len(subset)} entries but there are "
+                + f"{nbuckets} buckets in the file!"
+            )
+        indices = np.flatnonzero(subset)
+    elif subset.dtype.kind in {"i", "u"}:
+        indices = subset.astype(np.int64)
+    else:
+        raise RangeSubsetError(
+            "An array subset must be bucket indices or a boolean mask, "
+            + f"not {subset.dtype}!"
+        )
+
+    if len(indices) == 0:
+        raise RangeSubsetError("The subset does not select any buckets!")
+
+    if np.any(np.diff(indices) <= 0):
+        raise RangeSubsetError(
+            "The bucket indices in subset must be sorted and unique!"
+        )
+
+    if indices[0] < 0 or indices[-1] >= nbuckets:
+        raise RangeSubsetError(
+            "The bucket indices in subset must be between 0 and the number of "
+            + f"buckets in the file! {indices[0]} - {indices[-1]} is not in "
+            + f"0 - {nbuckets - 1}"
+        )
 
     if verbose:
-        print("Data is read in and input file is closed.")
+        print(f"Reading in {len(indices)} selected buckets\n")
 
-    # edit data so it matches the format of the data dict that was saved to the file
-    # this makes it so that data can be directly passed to write_to_file
-    # 1) add back in _GROUP_
-    datasets = np.array(data["_LIST_OF_DATASETS_"])
+    return indices
 
-    allgroups = np.array([d.split("/")[0] for d in datasets])
 
-    singletons_group = set(data["_SINGLETONS_GROUP_"])
-    groups = {}
+def _counter_dtype(infile: h5.File, schema: dict, counter_name: str) -> np.dtype:
+    """
+    Private method to get the dtype of a counter. The schema record has it, so we
+    only open the counter for files without one.
+    """
+
+    dtype = schema["_DATASETS_"].get(counter_name, {}).get("dtype")
+    if dtype is None:
+        dtype = infile[counter_name].dtype
+
+    return np.dtype(dtype)
+
+
+def _bucket_runs(indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Private method to split sorted bucket indices into runs of consecutive buckets.
+    Returns the first bucket of each run and the bucket after its last one.
+    """
+
+    breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+    starts = indices[np.concatenate(([0], breaks))]
+    stops = indices[np.concatenate((breaks - 1, [len(indices) - 1]))] + 1
+
+    return starts, stops
+
+
+def _read_counter_selection(
+    infile: h5.File,
+    schema: dict,
+    counter_name: str,
+    indices: np.ndarray,
+    stats: IOStats = None,
+    cache: dict = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Private method to read the counter of the buckets in indices, and the rows where
+    each of them starts and stops in the datasets of the group.
+
+    If the file stores the offsets of the counter, only the offsets around the runs
+    of consecutive buckets are read. Otherwise the whole counter is read. The
+    singletons have one entry per bucket, so their offsets are never read.
+    """
+
+    if counter_name == "_SINGLETONS_GROUP_/COUNTER":
+        counters = np.ones(
+            len(indices), dtype=_counter_dtype(infile, schema, counter_name)
+        )
+        return counters, indices, indices + 1
+
+    offsets_name = schema["_OFFSETS_"].get(counter_name)
+    if cache is None and offsets_name is not None:
+        offsets_dataset = infile[offsets_name]
+        runs_start, runs_stop = _bucket_runs(indices)
+
+        tic = time.perf_counter()
+        # every run of n buckets needs n + 1 offsets
+        offsets = _read_runs(offsets_dataset, runs_start, runs_stop + 1)
+        toc = time.perf_counter()
+
+        ends = np.cumsum(runs_stop - runs_start + 1)
+        last_of_run = np.zeros(len(offsets), dtype=bool)
+        last_of_run[ends - 1] = True
+        first_of_run = np.zeros(len(offsets), dtype=bool)
+        first_of_run[np.concatenate(([0], ends[:-1]))] = True
+
+        starts = offsets[~last_of_run]
+        stops = offsets[~first_of_run]
+        counters = (stops - starts).astype(_counter_dtype(infile, schema, counter_name))
+
+        if stats is not None:
+            stats.record(
+                offsets_name,
+                nbytes=offsets.nbytes,
+                storage_size=offsets_dataset.id.get_storage_size(),
+                io_time=toc - tic,
+            )
+            stats.record_index(counter_name, time.perf_counter() - toc)
+
+        return counters, starts, stops
+
+    counters, offsets = _read_counter(infile, counter_name, stats=stats, cache=cache)
+
+    return counters[indices], offsets[indices], offsets[indices + 1]
+
+
+def _coalesce_rows(
+    starts: np.ndarray, stops: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Private method to merge the sorted row ranges of the selected buckets into as
+    few contiguous ranges as possible, dropping the empty ones.
+    """
+
+    nonempty = stops > starts
+    starts = starts[nonempty]
+    stops = stops[nonempty]
+    if len(starts) == 0:
+        return starts, stops
+
+    breaks = np.flatnonzero(starts[1:] != stops[:-1]) + 1
+
+    return (
+        starts[np.concatenate(([0], breaks))],
+        stops[np.concatenate((breaks - 1, [len(stops) - 1]))],
+    )
+
+
+def _read_runs(
+    dataset: h5.Dataset, starts: np.ndarray, stops: np.ndarray
+) -> np.ndarray:
+    """
+    Private method to read the sorted, non-overlapping row ranges starts to stops
+    of a dataset.
 
-    groups["_SINGLETONS_GROUP_"] = data["_SINGLETONS_GROUP_"]  # copy over the data
-    for key in np.unique(allgroups):
-        if key in singletons_group:
+    HDF5 gets slow with selections of many separate ranges, so ranges that are
+    closer than one chunk (or constants.read_gap_rows rows for datasets that are
+    not chunked) are read as one span, and the rows in between are dropped.
+    """
+
+    if len(starts) == 0:
+        return dataset[0:0]
+
+    if len(starts) == 1:
+        return dataset[int(starts[0]) : int(stops[0])]
+
+    max_gap = constants.read_gap_rows
+    if dataset.chunks is not None:
+        max_gap = dataset.chunks[0]
+
+    breaks = np.flatnonzero(starts[1:] - stops[:-1] > max_gap) + 1
+    spans = zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [len(starts)])))
+
+    pieces = []
+    for first, last in spans:
+        low = int(starts[first])
+        values = dataset[low : int(stops[last - 1])]
+        if last - first == 1:
+            pieces.append(values)
             continue
-        if key in constants.protected_names:
+
+        # the rows of the ranges in this span, relative to its start
+        lengths = stops[first:last] - starts[first:last]
+        skipped = starts[first:last] - low - (np.cumsum(lengths) - lengths)
+        rows = np.repeat(skipped, lengths) + np.arange(lengths.sum())
+        pieces.append(values[rows])
+
+    return np.concatenate(pieces)
+
+
+def _load(
+    infile: h5.File,
+    schema: dict,
+    desired_groups: list[str] = None,
+    subset: int = None,
+    verbose: bool = False,
+    stats: IOStats = None,
+    cache: dict = None,
+    match: str = "substring",
+) -> tuple[dict, dict]:
+    """
+    Private method to read the data from an open hepfile with an already parsed
+    schema. This does all the work of `hepfile.read.load` except converting the
+    output to the return_type.
+    """
+
+    # Create the initial data and bucket dictionary to hold the data
+    data = {}
+    bucket = {}
+
+    # We'll fill the data dictionary with some extra fields, though we won't
+    # need them all for the bucket. Copy them so that the schema isn't changed
+    # if the user edits the data dictionary.
+    datasets, counters = _select_datasets(
+        schema, desired_groups=desired_groups, match=match, verbose=verbose
+    )
+
+    if match == "substring":
+        data["_MAP_DATASETS_TO_COUNTERS_"] = dict(schema["_MAP_DATASETS_TO_COUNTERS_"])
+        data["_MAP_DATASETS_TO_INDEX_"] = dict(schema["_MAP_DATASETS_TO_INDEX_"])
+        singletons = list(schema["_SINGLETONS_GROUP_"])
+    else:
+        # only keep what was selected so the data can be written back to a file
+        data["_MAP_DATASETS_TO_COUNTERS_"] = {}
+        data["_MAP_DATASETS_TO_INDEX_"] = {}
+        for name in datasets:
+            if name in schema["_MAP_DATASETS_TO_COUNTERS_"]:
+                data["_MAP_DATASETS_TO_COUNTERS_"][name] = schema[
+                    "_MAP_DATASETS_TO_COUNTERS_"
+                ][name]
+                data["_MAP_DATASETS_TO_INDEX_"][name] = schema[
+                    "_MAP_DATASETS_TO_INDEX_"
+                ][name]
+
+        data["_MAP_DATASETS_TO_COUNTERS_"][
+            "_SINGLETONS_GROUP_"
+        ] = "_SINGLETONS_GROUP_/COUNTER"
+
+        selected = set(datasets)
+        singletons = [name for name in schema["_SINGLETONS_GROUP_"] if name in selected]
+
+    data["_LIST_OF_COUNTERS_"] = counters
+    data["_LIST_OF_DATASETS_"] = datasets
+    data["_META_"] = {}
+
+    # Get the number of buckets.
+    # In HEP (High Energy Physics), this would be the number of events
+    data["_NUMBER_OF_BUCKETS_"] = _read_nbuckets(infile)
+
+    # We might only read in a subset of the data though! A list is a [low, high)
+    # range only if it is two integers, anything else selects buckets
+    if isinstance(subset, (list, tuple)) and not _is_subset_range(subset):
+        subset = np.asarray(subset)
+
+    indices = None
+    if isinstance(subset, np.ndarray):
+        indices = _check_subset_indices(
+            subset, data["_NUMBER_OF_BUCKETS_"], verbose=verbose
+        )
+        data["_NUMBER_OF_BUCKETS_"] = len(indices)
+    elif subset is not None:
+        subset = _check_subset(subset, data["_NUMBER_OF_BUCKETS_"], verbose=verbose)
+        data["_NUMBER_OF_BUCKETS_"] = subset[1] - subset[0]
+
+    data["_SINGLETONS_GROUP_"] = singletons
+
+    if verbose:
+        print("\nDatasets and counters:")
+        print(data["_MAP_DATASETS_TO_COUNTERS_"])
+        print("\nList of counters:")
+        print(data["_LIST_OF_COUNTERS_"])
+        print("\n")
+
+    ############################################################################
+    # Pull out the counters and build the indices
+    ############################################################################
+
+    if verbose:
+        print("Building the indices...\n")
+
+    # We will need to keep track of the indices in the entire file
+    # This way, if the user specifies a subset of the data, we have the full
+    # indices already calculated. These are the (starts, stops) of the contiguous
+    # ranges of rows to read from the datasets of each group.
+    full_file_ranges = {}
+
+    for counter_name in data["_LIST_OF_COUNTERS_"]:
+        if verbose:
+            print(f"counter name: ------------ {counter_name}\n")
+
+        index_name = f"{counter_name}_INDEX"
+
+        if indices is not None:
+            counters, starts, stops = _read_counter_selection(
+                infile, schema, counter_name, indices, stats=stats, cache=cache
+            )
+            data[counter_name] = counters
+            data[index_name] = _offsets_from_counter(counters)[:-1]
+            full_file_ranges[index_name] = _coalesce_rows(starts, stops)
             continue
 
-        where_groups = np.where((key == allgroups) * (key != datasets))[0]
-        groups[key] = [dataset.split("/")[-1] for dataset in datasets[where_groups]]
+        counters, offsets = _read_counter_range(
+            infile, schema, counter_name, subset=subset, stats=stats, cache=cache
+        )
+
+        if verbose:
+            print(f"counters: {counters}\n")
+            print(f"offsets: {offsets}\n")
+
+        data[counter_name] = counters
+        low = offsets[0]
+        high = offsets[-1]
+
+        # Just to make sure the "local" index of the data dictionary starts at 0
+        data[index_name] = offsets[:-1] - low
+        full_file_ranges[index_name] = (np.array([low]), np.array([high]))
+
+    if verbose:
+        print("Built the indices!")
+        print("full_file_ranges: ")
+        print(f"{full_file_ranges}\n")
+
+    # Loop over the datasets we want and pull out the data.
+    counters = set(data["_LIST_OF_COUNTERS_"])
+    for name in data["_LIST_OF_DATASETS_"]:
+        if verbose:
+            print(f"------ {name}")
+
+        dataset = infile[name]
+
+        # This will ignore the groups
+        if isinstance(dataset, h5.Dataset):
+            # The counters (and their subsets) were already read in to build
+            # the indices, so we only need to read the other datasets
+            if name not in counters:
+                index_name = data["_MAP_DATASETS_TO_INDEX_"][name]
+                tic = time.perf_counter()
+                if subset is not None:
+                    starts, stops = full_file_ranges[index_name]
+                    if verbose:
+                        print(f"dataset name/starts/stops: {name},{starts},{stops}\n")
+                    data[name] = _read_runs(dataset, starts, stops)
+                else:
+                    data[name] = dataset[:]
+
+                if stats is not None:
+                    stats.record(
+                        name,
+                        nbytes=data[name].nbytes,
+                        storage_size=dataset.id.get_storage_size(),
+                        io_time=time.perf_counter() - tic,
+                    )
+
+            bucket[name] = None  # This will be filled for individual bucket
+            if verbose:
+                print(dataset)
 
-    data["_GROUPS_"] = groups
+        # write the metadata for that group to data if it exists
+        if name not in constants.protected_names and "meta" in dataset.attrs.keys():
+            data["_META_"][name] = dataset.attrs["meta"]
+
+    # edit data so it matches the format of the data dict that was saved to the file
+    # this makes it so that data can be directly passed to write_to_file
+    # 1) add back in _GROUP_
+    data["_GROUPS_"] = _build_groups(
+        data["_SINGLETONS_GROUP_"], data["_LIST_OF_DATASETS_"]
+    )
 
     # 2) add back in _MAP_DATASETS_TO_DATA_TYPES
     dtypes = {}
@@ -374,33 +1902,24 @@ def load(
     # 3) add _PROTECTED_NAMES_
     data["_PROTECTED_NAMES_"] = constants.protected_names
 
-    if return_type == "awkward":
-        from hepfile.awkward_tools import hepfile_to_awkward
-
-        return hepfile_to_awkward(data), bucket
-
-    if return_type == "pandas":
-        from hepfile.df_tools import hepfile_to_df
-
-        return hepfile_to_df(data), bucket
-
     return data, bucket
 
 
 ################################################################################
-
-
-################################################################################
-def _calculate_index_from_counters(counters: int) -> int:
+def _offsets_from_counter(counter: np.ndarray, start: int = 0) -> np.ndarray:
     """
-    Calculates an index array from the counters
+    Private method to calculate the offsets of a counter. This is the index array
+    with one extra entry at the end, the total number of entries, so that bucket i
+    spans offsets[i] to offsets[i+1]. The first offset is start.
     """
-    index = np.add.accumulate(counters) - counters
 
-    return index
+    counter = np.asarray(counter, dtype=np.int64)
+    offsets = np.empty(len(counter) + 1, dtype=np.int64)
+    offsets[0] = start
+    np.cumsum(counter, out=offsets[1:])
+    offsets[1:] += start
 
-
-################################################################################
+    return offsets
 
 
 ################################################################################
@@ -458,21 +1977,11 @@ def get_nbuckets_in_file(filename: str) -> int:
         InputError: if something is wrong with the input filename
     """
 
-    # f = h5.File(filename, "r+")
-    # a = f.attrs
-
     if not isinstance(filename, str):
         raise InputError("Expecting the input filename to be a string!")
 
-    with h5.File(filename, "r+") as infile:
-        attr = infile.attrs
-        if "_NUMBER_OF_BUCKETS_" not in attr:
-            raise AttributeError(
-                'File does not contain the attribute, "_NUMBER_OF_BUCKETS_"'
-            )
-
-        num_buckets = attr.get("_NUMBER_OF_BUCKETS_")
-        return num_buckets
+    with h5.File(filename, "r") as infile:
+        return _read_nbuckets(infile)
 
 
 ################################################################################
@@ -522,17 +2031,25 @@ def get_file_metadata(filename: str) -> dict:
         MetadataNotFound: If there is not metadata in filename
     """
 
-    with h5.File(filename, "r+") as infile:
-        attrs = infile.attrs
+    with h5.File(filename, "r") as infile:
+        return _read_metadata(infile, filename)
 
-        if len(attrs) < 1:
-            raise MetadataNotFound(
-                f"No metadata in file {filename}! File has no attributes.\n"
-            )
 
-        metadata = {}
-        for key in attrs:
-            metadata[key] = attrs[key]
+def _read_metadata(infile: h5.File, filename: str) -> dict:
+    """
+    Private method to get the metadata of an open hepfile
+    """
+
+    attrs = infile.attrs
+
+    if len(attrs) < 1:
+        raise MetadataNotFound(
+            f"No metadata in file {filename}! File has no attributes.\n"
+        )
+
+    metadata = {}
+    for key in attrs:
+        metadata[key] = attrs[key]
 
     return metadata
 
@@ -560,6 +2077,15 @@ def get_file_header(filename: str, return_type: str = "dict") -> dict:
         HeaderNotFound: If there is not header in filename
     """
 
+    with h5.File(filename, "r") as infile:
+        return _read_header(infile, filename, return_type=return_type)
+
+
+def _read_header(infile: h5.File, filename: str, return_type: str = "dict") -> dict:
+    """
+    Private method to get the header of an open hepfile
+    """
+
     if return_type in {"df", "dataframe"}:
         if not hf._PANDAS:
             raise MissingOptionalDependency("pandas")
@@ -568,27 +2094,26 @@ def get_file_header(filename: str, return_type: str = "dict") -> dict:
     if return_type is not None and return_type not in ["dict", "df", "dataframe"]:
         raise InputError("'return_type' must be 'dict', 'df', or 'dataframe!")
 
-    with h5.File(filename, "r+") as infile:
-        if "_HEADER_" not in infile:
-            raise HeaderNotFound(
-                f"No header data in file {filename}! File has no _HEADER_ group.\n"
-            )
+    if "_HEADER_" not in infile:
+        raise HeaderNotFound(
+            f"No header data in file {filename}! File has no _HEADER_ group.\n"
+        )
 
-        header_group = infile["_HEADER_"]
+    header_group = infile["_HEADER_"]
 
-        header = {}
-        for key in header_group:
-            # Let's decode the binary strings to make it easier on the user.
-            values = header_group[key][:]
-            temp = []
-            for val in values:
-                temp.append(val[0].decode())
+    header = {}
+    for key in header_group:
+        # Let's decode the binary strings to make it easier on the user.
+        values = header_group[key][:]
+        temp = []
+        for val in values:
+            temp.append(val[0].decode())
 
-            # Convert it to numpy array as that may be more expected for the user.
-            header[key] = np.array(temp)
+        # Convert it to numpy array as that may be more expected for the user.
+        header[key] = np.array(temp)
 
-        if return_type in ("dataframe", "df"):
-            header = pd.DataFrame.from_dict(header)
+    if return_type in ("dataframe", "df"):
+        header = pd.DataFrame.from_dict(header)
 
     return header
 
@@ -608,13 +2133,21 @@ def print_file_metadata(filename: str) -> str:
         MetadataNotFound: If there is not metadata in filename
     """
 
-    output = ""
-
     try:
         metadata = get_file_metadata(filename)
     except MetadataNotFound:
         warnings.warn(f"No Metadata in {filename}!")
-        return output
+        return ""
+
+    return _print_metadata(metadata)
+
+
+def _print_metadata(metadata: dict) -> str:
+    """
+    Private method to pretty print a metadata dictionary
+    """
+
+    output = ""
 
     keys = list(metadata.keys())
 
@@ -672,7 +2205,13 @@ def print_file_header(filename: str) -> str:
         HeaderNotFound: If there is not header in filename
     """
 
-    hdr = get_file_header(filename, return_type="dict")
+    return _print_header(get_file_header(filename, return_type="dict"))
+
+
+def _print_header(hdr: dict) -> str:
+    """
+    Private method to pretty print a header dictionary
+    """
 
     return_str = f"{'#':#>64}\n"
     return_str += f"###{' ':>22}Hepfile Header{' ':>22}###\n"
@@ -0,0 +1,176 @@
+"""
+Instrumentation for reading and writing hepfiles.
+
+Pass an `hepfile.stats.IOStats` object as the :code:`stats` argument of
+`hepfile.read.load`, `hepfile.read.iterate`, or `hepfile.write.write_to_file` to
+collect, for every dataset, the number of bytes read or written, the size on disk,
+and the time spent in HDF5 I/O versus converting the data in python. The time
+spent building the counter indices is also recorded. The same object can be
+passed to many calls and the numbers add up.
+
+Only the writes have a conversion time for every dataset. The reads get numpy
+arrays straight from HDF5, and the conversion to the return_type of
+`hepfile.read.load` works on all of the datasets at once, so its time is only
+recorded in total, in timings['conversion'].
+
+.. code-block:: python
+
+    stats = hepfile.stats.IOStats()
+    data, bucket = hepfile.load("myfile.h5", stats=stats)
+    print(stats.summary())
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+
+
+class IOStats:
+    """
+    Collects per dataset timing and byte counts from `hepfile.read.load` and
+    `hepfile.write.write_to_file`.
+
+    Attributes:
+        datasets (dict): for every dataset name, a dictionary with the number of
+                         bytes read or written ('nbytes'), the size of the dataset in
+                         the file ('storage_size'), and the seconds spent in HDF5 I/O
+                         ('io_time') and in python conversions ('conversion_time',
+                         only for writes)
+        index_time (dict): for every counter, the seconds spent building its index
+        timings (dict): seconds spent in other steps, like reading or writing the
+                        schema ('schema') or converting all of the datasets to the
+                        return_type of load ('conversion')
+        callback (Callable): if not None, called with the name and the newly recorded
+                             values each time something is recorded. Use this to log
+                             the numbers as they come in.
+    """
+
+    def __init__(self, callback: Callable[[str, dict], None] = None):
+        """
+        Args:
+            callback (Callable): function called as callback(name, values) each time
+                                 something is recorded, where values is a dictionary
+                                 of the newly recorded numbers. Default is None.
+        """
+
+        self.datasets = {}
+        self.index_time = {}
+        self.timings = {}
+        self.callback = callback
+
+    def record(
+        self,
+        name: str,
+        nbytes: int = 0,
+        storage_size: int = 0,
+        io_time: float = 0.0,
+        conversion_time: float = 0.0,
+    ) -> None:
+        """
+        Add the bytes and time for one read or write of a dataset.
+
+        Args:
+            name (str): full name of the dataset, like 'jet/px'
+            nbytes (int): number of (uncompressed) bytes read or written
+            storage_size (int): size of the dataset in the file after this operation
+            io_time (float): seconds spent in HDF5 I/O and decompression
+            conversion_time (float): seconds spent converting the data in python
+        """
+
+        values = {
+            "nbytes": int(nbytes),
+            "storage_size": int(storage_size),
+            "io_time": io_time,
+            "conversion_time": conversion_time,
+        }
+
+        if name not in self.datasets:
+            self.datasets[name] = dict.fromkeys(values, 0)
+
+        entry = self.datasets[name]
+        entry["nbytes"] += values["nbytes"]
+        entry["io_time"] += io_time
+        entry["conversion_time"] += conversion_time
+        # the storage size is the size of the dataset, it does not add up
+        entry["storage_size"] = values["storage_size"]
+
+        if self.callback is not None:
+            self.callback(name, values)
+
+    def record_index(self, counter: str, seconds: float) -> None:
+        """
+        Add the time spent building the index of a counter.
+
+        Args:
+            counter (str): full name of the counter, like 'jet/njet'
+            seconds (float): seconds spent building the index
+        """
+
+        self.index_time[counter] = self.index_time.get(counter, 0.0) + seconds
+
+        if self.callback is not None:
+            self.callback(counter, {"index_time": seconds})
+
+    def record_time(self, step: str, seconds: float) -> None:
+        """
+        Add the time spent in a step that isn't specific to a dataset.
+
+        Args:
+            step (str): name of the step, like 'schema'
+            seconds (float): seconds spent in the step
+        """
+
+        self.timings[step] = self.timings.get(step, 0.0) + seconds
+
+        if self.callback is not None:
+            self.callback(step, {"time": seconds})
+
+    def totals(self) -> dict:
+        """
+        Get the totals over all datasets.
+
+        Returns:
+            dict: total 'nbytes', 'storage_size', 'io_time', 'conversion_time' over
+                  all datasets and the total 'index_time' over all counters
+        """
+
+        totals = dict.fromkeys(("nbytes", "storage_size", "io_time", "conversion_time"))
+        for key in totals:
+            totals[key] = sum(entry[key] for entry in self.datasets.values())
+        totals["index_time"] = sum(self.index_time.values())
+
+        return totals
+
+    def summary(self) -> str:
+        """
+        Get a table of the recorded numbers, with the slowest datasets first.
+
+        Returns:
+            str: String representation of the recorded numbers
+        """
+
+        output = (
+            f"{'dataset':<32s} {'MB':>10s} {'MB on disk':>10s} "
+            + f"{'I/O (s)':>10s} {'conv. (s)':>10s}\n"
+        )
+
+        def total_time(item):
+            return item[1]["io_time"] + item[1]["conversion_time"]
+
+        for name, entry in sorted(self.datasets.items(), key=total_time, reverse=True):
+            output += (
+                f"{name:<32s} {entry['nbytes'] / 1e6:>10.3f} "
+                + f"{entry['storage_size'] / 1e6:>10.3f} "
+                + f"{entry['io_time']:>10.4f} {entry['conversion_time']:>10.4f}\n"
+            )
+
+        totals = self.totals()
+        output += (
+            f"{'TOTAL':<32s} {totals['nbytes'] / 1e6:>10.3f} "
+            + f"{totals['storage_size'] / 1e6:>10.3f} "
+            + f"{totals['io_time']:>10.4f} {totals['conversion_time']:>10.4f}\n"
+        )
+        output += f"{'index build time (s)':<32s} {totals['index_time']:>10.4f}\n"
+        for step, seconds in self.timings.items():
+            output += f"{step + ' time (s)':<32s} {seconds:>10.4f}\n"
+
+        return output
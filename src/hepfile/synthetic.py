@@ -0,0 +1,304 @@
+"""
+Tools to generate large, realistic looking hepfiles for scale testing and
+benchmarking without any real data.
+
+The data is built directly in columnar form (no buckets are packed one at a time)
+and written chunk by chunk, so the memory use only depends on the chunk size and
+files of tens of GB can be generated. The schema is a dictionary of groups, e.g.
+
+.. code-block:: python
+
+    schema = {
+        "jet": {
+            "counter": "njet",
+            "mean": 5.0,
+            "datasets": {"e": float, "px": float, "btag": np.float32},
+        },
+        "photons": {
+            "counter": "nphoton",
+            "mean": 1.5,
+            "occupancy": 0.05,
+            "datasets": {"e": float},
+        },
+        "_SINGLETONS_GROUP_": {"datasets": {"MET": float, "trigger": str}},
+    }
+
+The number of entries of each group in a bucket is Poisson distributed with the
+given mean. Groups with an occupancy < 1 are sparse, they are only filled in that
+fraction of the buckets.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+import numpy as np
+
+from hepfile.write import initialize, create_group, create_dataset, _stream_to_file
+from hepfile.errors import InputError
+
+# The default schema, loosely modeled after a collider physics ntuple
+DEFAULT_SCHEMA = {
+    "jet": {
+        "counter": "njet",
+        "mean": 5.0,
+        "datasets": {
+            "e": float,
+            "px": float,
+            "py": float,
+            "pz": float,
+            "btag": np.float32,
+            "flavor": np.int32,
+        },
+    },
+    "muons": {
+        "counter": "nmuon",
+        "mean": 1.0,
+        "datasets": {
+            "e": float,
+            "px": float,
+            "py": float,
+            "pz": float,
+            "nhits": np.int16,
+        },
+    },
+    "photons": {
+        "counter": "nphoton",
+        "mean": 1.5,
+        "occupancy": 0.05,
+        "datasets": {"e": float, "px": float, "py": float, "pz": float},
+    },
+    "_SINGLETONS_GROUP_": {
+        "datasets": {
+            "METpx": float,
+            "METpy": float,
+            "run": np.int64,
+            "trigger": str,
+        }
+    },
+}
+
+# values used for string datasets
+STRING_VALUES = ("HLT_IsoMu24", "HLT_Ele32_WPTight", "HLT_PFJet500", "HLT_PFMET120")
+
+# rough number of bytes per string entry, used to estimate file sizes
+_STRING_NBYTES = 16
+
+
+################################################################################
+def make_data(
+    nbuckets: int, schema: dict = None, seed: int | np.random.Generator = None
+) -> dict:
+    """
+    Build a data dictionary with nbuckets randomly generated buckets. The data is
+    in the same columnar form as the output of `hepfile.read.load` and can be passed
+    directly to `hepfile.write.write_to_file`.
+
+    Args:
+        nbuckets (int): number of buckets to generate
+        schema (dict): groups, counters, multiplicities and datasets to generate. See
+                       the module documentation for the format. Default is
+                       `hepfile.synthetic.DEFAULT_SCHEMA`.
+        seed (int | np.random.Generator): seed for (or an instance of) the random
+                                          number generator
+
+    Returns:
+        dict: hepfile data dictionary
+
+    Raises:
+        InputError: If the schema or nbuckets are not valid
+    """
+
+    if nbuckets < 0:
+        raise InputError("nbuckets must not be negative!")
+
+    schema = _check_schema(DEFAULT_SCHEMA if schema is None else schema)
+    rng = np.random.default_rng(seed)
+
+    data = initialize()
+    for group, spec in schema.items():
+        if group == "_SINGLETONS_GROUP_":
+            for dataset, dtype in spec["datasets"].items():
+                create_dataset(data, dataset, dtype=dtype)
+                data[dataset] = _random_values(rng, dtype, nbuckets)
+            continue
+
+        counter = spec["counter"]
+        create_group(data, group, counter=counter)
+
+        num = rng.poisson(spec["mean"], size=nbuckets).astype(np.int32)
+        if spec["occupancy"] < 1:
+            num[rng.random(nbuckets) >= spec["occupancy"]] = 0
+        data[f"{group}/{counter}"] = num
+
+        nentries = int(num.sum())
+        for dataset, dtype in spec["datasets"].items():
+            create_dataset(data, dataset, group=group, dtype=dtype)
+            data[f"{group}/{dataset}"] = _random_values(rng, dtype, nentries)
+
+    data["_SINGLETONS_GROUP_/COUNTER"] = np.ones(nbuckets, dtype=np.int32)
+    data["_NUMBER_OF_BUCKETS_"] = nbuckets
+
+    return data
+
+
+################################################################################
+def generate(
+    outfile: str,
+    nbuckets: int,
+    schema: dict = None,
+    seed: int = None,
+    chunk_size: int = 100_000,
+    **kwargs,
+) -> str:
+    """
+    Write a hepfile with nbuckets randomly generated buckets, chunk_size buckets
+    at a time. Only one chunk is held in memory at once so this can write files
+    that are much larger than the available memory.
+
+    The file is reproducible for the same schema, seed, and chunk_size.
+
+    Args:
+        outfile (str): path to the hepfile to write
+        nbuckets (int): total number of buckets to generate. See
+                        `hepfile.synthetic.nbuckets_for_size` to get the number of
+                        buckets for a given file size.
+        schema (dict): groups, counters, multiplicities and datasets to generate. See
+                       the module documentation for the format. Default is
+                       `hepfile.synthetic.DEFAULT_SCHEMA`.
+        seed (int): seed for the random number generator
+        chunk_size (int): number of buckets to generate and write at once.
+                          Default is 100,000.
+        **kwargs: passed to `hepfile.write.write_to_file`
+
+    Returns:
+        str: path to the output hepfile
+
+    Raises:
+        InputError: If the schema, nbuckets, or chunk_size are not valid
+    """
+
+    if nbuckets <= 0:
+        raise InputError("nbuckets must be a positive integer!")
+
+    if chunk_size <= 0:
+        raise InputError("chunk_size must be a positive integer!")
+
+    schema = _check_schema(DEFAULT_SCHEMA if schema is None else schema)
+    _stream_to_file(
+        outfile, _generate_chunks(nbuckets, schema, seed, chunk_size), **kwargs
+    )
+
+    return outfile
+
+
+################################################################################
+def nbuckets_for_size(nbytes: int, schema: dict = None) -> int:
+    """
+    Estimate the number of buckets needed for the (uncompressed) datasets of a
+    generated hepfile to take up about nbytes. Note that `hepfile.write.write_to_file`
+    stores 64 bit floats as 32 bit floats by default which halves their size.
+
+    Args:
+        nbytes (int): the target size in bytes
+        schema (dict): the schema of the generated file. Default is
+                       `hepfile.synthetic.DEFAULT_SCHEMA`.
+
+    Returns:
+        int: number of buckets to generate
+    """
+
+    schema = _check_schema(DEFAULT_SCHEMA if schema is None else schema)
+
+    # every bucket has an entry in each counter and in the singleton counter
+    ncounters = len(set(schema) - {"_SINGLETONS_GROUP_"}) + 1
+    per_bucket = np.dtype(np.int32).itemsize * ncounters
+    for group, spec in schema.items():
+        row = sum(_itemsize(dtype) for dtype in spec["datasets"].values())
+        if group == "_SINGLETONS_GROUP_":
+            per_bucket += row
+        else:
+            per_bucket += spec["mean"] * spec["occupancy"] * row
+
+    return max(1, int(nbytes / per_bucket))
+
+
+################################################################################
+def _generate_chunks(
+    nbuckets: int, schema: dict, seed: int, chunk_size: int
+) -> Iterator[dict]:
+    """
+    Private generator of the data dictionaries of each chunk
+    """
+
+    rng = np.random.default_rng(seed)
+    for start in range(0, nbuckets, chunk_size):
+        yield make_data(min(chunk_size, nbuckets - start), schema, rng)
+
+
+def _check_schema(schema: dict) -> dict:
+    """
+    Private method to validate a schema and fill in the default values
+    """
+
+    if not isinstance(schema, dict) or len(schema) == 0:
+        raise InputError("The schema must be a non-empty dictionary of groups!")
+
+    checked = {}
+    for group, spec in schema.items():
+        if not isinstance(spec, dict) or not isinstance(spec.get("datasets"), dict):
+            raise InputError(
+                f"The schema of group {group} must be a dictionary with a "
+                + "'datasets' dictionary of dataset names and data types!"
+            )
+
+        if group == "_SINGLETONS_GROUP_":
+            checked[group] = {"datasets": dict(spec["datasets"])}
+            continue
+
+        mean = spec.get("mean", 1.0)
+        occupancy = spec.get("occupancy", 1.0)
+        if mean < 0:
+            raise InputError(f"The mean multiplicity of group {group} is negative!")
+        if not 0 <= occupancy <= 1:
+            raise InputError(f"The occupancy of group {group} must be in [0, 1]!")
+
+        checked[group] = {
+            "counter": spec.get("counter", f"n{group}"),
+            "mean": mean,
+            "occupancy": occupancy,
+            "datasets": dict(spec["datasets"]),
+        }
+
+    return checked
+
+
+def _random_values(rng: np.random.Generator, dtype: type, size: int) -> np.ndarray:
+    """
+    Private method to generate size random values of type dtype
+    """
+
+    if dtype is str:
+        return rng.choice(np.array(STRING_VALUES, dtype=object), size=size)
+
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f":
+        return rng.exponential(50.0, size=size).astype(dtype)
+
+    if dtype.kind in {"i", "u"}:
+        return rng.integers(0, 100, size=size, dtype=dtype)
+
+    if dtype.kind == "b":
+        return rng.random(size) < 0.5
+
+    raise InputError(f"Can not generate random values of type {dtype}!")
+
+
+def _itemsize(dtype: type) -> int:
+    """
+    Private method to get the (approximate) number of bytes of one entry
+    """
+
+    if dtype is str:
+        return _STRING_NBYTES
+
+    return np.dtype(dtype).itemsize
@@ -5,8 +5,12 @@ Functions to assist in writing a hepfile "from scratch"
 from __future__ import annotations
 
 import datetime
+import json
+import os
 import sys
+import time
 import warnings
+from collections.abc import Iterator
 
 import numpy as np
 import h5py as h5
@@ -14,6 +18,21 @@ import h5py as h5
 import hepfile
 from hepfile import constants
 from hepfile.errors import InputError, DatasetSizeDiscrepancy, MissingSingletonValue
+from hepfile.read import _offsets_from_counter, _read_schema
+from hepfile.stats import IOStats
+
+__all__ = [
+    "initialize",
+    "clear_bucket",
+    "create_single_bucket",
+    "create_group",
+    "create_dataset",
+    "add_meta",
+    "pack",
+    "write_file_metadata",
+    "write_file_header",
+    "write_to_file",
+]
 
 
 ################################################################################
@@ -519,6 +538,161 @@ def _append(data, bucket):
         raise ValueError("data should be a list or numpy array!")
 
 
+def _write_dataset(
+    hdoutfile: h5.File,
+    name: str,
+    dset: np.ndarray,
+    dataset_dtype: type,
+    comp_type: str = None,
+    comp_opts: list = None,
+    buffer_size: int = None,
+    extendible: bool = False,
+    stats: IOStats = None,
+) -> dict:
+    """
+    Private method to write a single dataset to an open HDF5 file.
+
+    The dataset is created empty and then filled buffer_size entries at a time,
+    so type conversions (like to single precision or to strings) are only ever
+    done on one slice of the array rather than copying all of it.
+
+    Returns:
+        dict: the dtype and shape (after the first dimension) of the dataset, for
+              the schema record
+    """
+
+    start = time.perf_counter()
+    if not isinstance(dset, np.ndarray):
+        dset = np.asarray(dset)
+    conversion_time = time.perf_counter() - start
+
+    if dataset_dtype is None:
+        # HDF5 can't store unicode or python objects, so write those as strings
+        dataset_dtype = str if dset.dtype.kind in {"U", "S", "O"} else dset.dtype
+
+    if dataset_dtype is str:
+        # For writing strings, we need to make sure our strings are ascii
+        # and not Unicode
+        #
+        # See my question on StackOverflow and the super-helpful response!
+        #
+        # https://stackoverflow.com/questions/68500454/can-i-use-h5py-to-write-strings-to-an-hdf5-file-in-one-line-rather-than-looping
+        h5_dtype = h5.special_dtype(vlen=str)
+    else:
+        h5_dtype = dataset_dtype
+
+    maxshape = None
+    if extendible:
+        maxshape = (None,) + dset.shape[1:]
+
+    out = hdoutfile.create_dataset(
+        name,
+        shape=dset.shape,
+        maxshape=maxshape,
+        dtype=h5_dtype,
+        compression=comp_type,
+        compression_opts=comp_opts,
+    )
+
+    nbytes, io_time, fill_conversion_time = _fill_dataset(
+        out, dset, 0, buffer_size=buffer_size
+    )
+
+    if stats is not None:
+        stats.record(
+            name,
+            nbytes=nbytes,
+            storage_size=out.id.get_storage_size(),
+            io_time=io_time,
+            conversion_time=conversion_time + fill_conversion_time,
+        )
+
+    return {
+        "dtype": "str" if dataset_dtype is str else out.dtype.str,
+        "shape": list(out.shape[1:]),
+    }
+
+
+def _extend_dataset(
+    h5dset: h5.Dataset,
+    dset: np.ndarray,
+    buffer_size: int = None,
+    stats: IOStats = None,
+) -> None:
+    """
+    Private method to append the values in dset to the end of an extendible
+    dataset in an open HDF5 file.
+    """
+
+    start = time.perf_counter()
+    if not isinstance(dset, np.ndarray):
+        dset = np.asarray(dset)
+    conversion_time = time.perf_counter() - start
+
+    start = len(h5dset)
+    h5dset.resize((start + len(dset),) + h5dset.shape[1:])
+
+    nbytes, io_time, fill_conversion_time = _fill_dataset(
+        h5dset, dset, start, buffer_size=buffer_size
+    )
+
+    if stats is not None:
+        stats.record(
+            h5dset.name.lstrip("/"),
+            nbytes=nbytes,
+            storage_size=h5dset.id.get_storage_size(),
+            io_time=io_time,
+            conversion_time=conversion_time + fill_conversion_time,
+        )
+
+
+def _fill_dataset(
+    h5dset: h5.Dataset, dset: np.ndarray, start: int, buffer_size: int = None
+) -> tuple[int, float, float]:
+    """
+    Private method to copy dset into an HDF5 dataset starting at entry start,
+    buffer_size entries at a time.
+
+    Returns:
+        tuple(int, float, float): number of bytes written, seconds spent writing,
+                                  and seconds spent converting the values
+    """
+
+    if buffer_size is None:
+        buffer_size = constants.buffer_size
+
+    is_string = h5.check_string_dtype(h5dset.dtype) is not None
+
+    nbytes = 0
+    io_time = 0.0
+    conversion_time = 0.0
+    for low in range(0, len(dset), buffer_size):
+        values = dset[low : low + buffer_size]
+
+        if is_string:
+            tic = time.perf_counter()
+            values = _convert_to_byte_strings(values)
+            conversion_time += time.perf_counter() - tic
+            nbytes += values.nbytes
+        else:
+            nbytes += len(values) * h5dset.dtype.itemsize
+
+        tic = time.perf_counter()
+        h5dset[start + low : start + low + len(values)] = values
+        io_time += time.perf_counter() - tic
+
+    return nbytes, io_time, conversion_time
+
+
+def _convert_to_byte_strings(values: np.ndarray) -> np.ndarray:
+    """Private method to convert an array of values to fixed length byte strings"""
+
+    if not hasattr(values[0], "__len__"):
+        values = values.astype(str)
+    longest_word = len(max(values, key=len))
+    return np.array(values, dtype="S" + str(longest_word))
+
+
 def _convert_list_and_key_to_string_data(datalist: list[any], key: str) -> str:
     """Converts data dictionary to a string
 
@@ -541,7 +715,7 @@ def _convert_list_and_key_to_string_data(datalist: list[any], key: str) -> str:
             strb += np.string_("__:__")
     mydataset.append([stra, strb])
 
-    return mydataset, len(strb)
+    return mydataset, max(len(stra), len(strb))
 
 
 ################################################################################
@@ -717,6 +891,10 @@ def write_to_file(
     comp_opts: list = None,
     force_single_precision: bool = True,
     verbose: bool = False,
+    buffer_size: int = None,
+    extendible: bool = False,
+    stats: IOStats = None,
+    append: bool = False,
 ) -> h5.File:
     """Writes the selected data to an HDF5 file
 
@@ -730,16 +908,49 @@ def write_to_file(
         force_single_precision (boolean): True if data should be written in single
                                           precision
 
+        buffer_size (int): Maximum number of entries of a dataset converted and
+                           written at once. Large datasets are written in slices
+                           of this size to bound the memory overhead. Default is
+                           None, which uses `hepfile.constants.buffer_size`.
+
+        extendible (boolean): True if the datasets should be created so that more
+                              buckets can be appended to them later. Default is
+                              False.
+
+        stats (IOStats): If not None, a `hepfile.stats.IOStats` object that records
+                         the bytes written and the time spent on each dataset.
+                         Default is None.
+
+        append (boolean): True to add the buckets in data to the end of filename
+                          instead of overwriting it. Only the new data is written.
+                          The file must have been written with extendible=True (or
+                          append=True) and have the same groups, datasets, and data
+                          types as data. If the file doesn't exist yet it is created
+                          with extendible datasets, so that later writes can append
+                          to it. The compression of the existing file is kept.
+                          Default is False.
+
     Returns:
         h5py.File: HDF5 File to which the data has been written
 
     Raises:
         Warning: If two counters have a different number of entries. This usually means
                  something is wrong with the data dictionary you are trying to write.
+        InputError: If append is True and data can not be appended to the file
     """
 
+    if append:
+        if os.path.exists(filename):
+            return _extend_file(
+                filename, data, buffer_size=buffer_size, verbose=verbose, stats=stats
+            )
+
+        extendible = True
+
     # hdoutfile = h5.File(filename, "w")
 
+    schema_start = time.perf_counter()
+
     with h5.File(filename, "w") as hdoutfile:
         groups = data["_GROUPS_"].keys()
 
@@ -757,10 +968,12 @@ def write_to_file(
             compression_opts=comp_opts,
         )
 
+        singletons = _get_singletons(data)
+
         # Convert this to a 2xN array for writing to the hdf5 file.
         # This has the _GROUPS_ and the datasets in them.
         mydataset, length = _convert_list_and_key_to_string_data(
-            data["_GROUPS_"]["_SINGLETONS_GROUP_"], "_SINGLETONSGROUPFORSTORAGE_"
+            singletons, "_SINGLETONSGROUPFORSTORAGE_"
         )
 
         hdoutfile.create_dataset(
@@ -771,6 +984,10 @@ def write_to_file(
             compression_opts=comp_opts,
         )
 
+        if stats is not None:
+            stats.record_time("schema", time.perf_counter() - schema_start)
+
+        dataset_info = {}
         for group in groups:
             hdoutfile.create_group(group)
             hdoutfile[group].attrs["counter"] = np.string_(
@@ -781,6 +998,8 @@ def write_to_file(
                 hdoutfile[group].attrs["meta"] = np.string_(data["_META_"][group])
 
             datasets = data["_GROUPS_"][group]
+            if group == "_SINGLETONS_GROUP_":
+                datasets = singletons
 
             for dataset in datasets:
                 name = None
@@ -799,7 +1018,10 @@ def write_to_file(
                 if isinstance(dset, list):
                     if verbose:
                         print("\tConverting list to array...")
+                    tic = time.perf_counter()
                     dset = np.array(dset)
+                    if stats is not None:
+                        stats.record(name, conversion_time=time.perf_counter() - tic)
 
                 # Do single precision only, unless specified
                 if force_single_precision:
@@ -814,42 +1036,25 @@ def write_to_file(
                                 + " skipping!"
                             )
 
+                    # The conversion itself happens slice by slice as we write
                     if dtype == np.float64:
                         if verbose:
                             print("\tConverting array to single precision...")
-                        dset = dset.astype(np.float32)
                         dataset_dtype = np.float32
 
-                if dataset_dtype is not str:
-                    if verbose:
-                        print("\tWriting to file...")
-                    hdoutfile.create_dataset(
-                        name,
-                        data=dset,
-                        compression=comp_type,
-                        compression_opts=comp_opts,
-                        dtype=dataset_dtype,
-                    )
-                else:
-                    # For writing strings, we need to make sure our strings are ascii
-                    # and not Unicode
-                    #
-                    # See my question on StackOverflow and the super-helpful response!
-                    #
-                    # https://stackoverflow.com/questions/68500454/can-i-use-h5py-to-write-strings-to-an-hdf5-file-in-one-line-rather-than-looping
-                    dataset_dtype = h5.special_dtype(vlen=str)
-
-                    if not hasattr(dset[0], "__len__"):
-                        dset = dset.astype(str)
-                    longest_word = len(max(dset, key=len))
-                    arr = np.array(dset, dtype="S" + str(longest_word))
-                    hdoutfile.create_dataset(
-                        name,
-                        data=arr,
-                        dtype=dataset_dtype,
-                        compression=comp_type,
-                        compression_opts=comp_opts,
-                    )
+                if verbose:
+                    print("\tWriting to file...")
+                dataset_info[name] = _write_dataset(
+                    hdoutfile,
+                    name,
+                    dset,
+                    dataset_dtype,
+                    comp_type=comp_type,
+                    comp_opts=comp_opts,
+                    buffer_size=buffer_size,
+                    extendible=extendible,
+                    stats=stats,
+                )
 
                 # write the dataset metadata if there is some
                 if name in data["_META_"]:
@@ -858,28 +1063,284 @@ def write_to_file(
                 if verbose:
                     print(f"Writing to file {name} as type {str(dataset_dtype)}")
 
+        # Write the offsets of every group, so readers can find the entries of a
+        # range of buckets without reading the whole counter. The singletons have
+        # one entry per bucket, so readers don't need their offsets.
+        offsets = {}
+        for counter in data["_LIST_OF_COUNTERS_"]:
+            if counter == "_SINGLETONS_GROUP_/COUNTER":
+                continue
+
+            offsets[counter] = _offsets_path(counter)
+            _write_dataset(
+                hdoutfile,
+                offsets[counter],
+                _offsets_from_counter(data[counter]),
+                np.int64,
+                comp_type=comp_type,
+                comp_opts=comp_opts,
+                buffer_size=buffer_size,
+                extendible=extendible,
+                stats=stats,
+            )
+
+        schema_start = time.perf_counter()
+        _write_schema(hdoutfile, data, dataset_info, offsets)
+        if stats is not None:
+            stats.record_time("schema", time.perf_counter() - schema_start)
+
         # Get the number of buckets
-        counters = data["_LIST_OF_COUNTERS_"]
-        num_buckets = -1
-        prevcounter = None
-        for i, countername in enumerate(counters):
-            ncounter = len(data[countername])
+        hdoutfile.attrs["_NUMBER_OF_BUCKETS_"] = _get_number_of_buckets(
+            data, verbose=verbose
+        )
 
-            if verbose:
-                print(f"{countername:<32s} has {ncounter:<12d} entries")
+    write_file_metadata(filename)
 
-            if i > 0 and ncounter != num_buckets:
-                warnings.warn(
-                    f"{countername} and {prevcounter} have differing number of entries!"
-                )
-                # SHOULD WE EXIT ON THIS?
+    return hdoutfile
 
-            num_buckets = max(num_buckets, ncounter)
 
-            prevcounter = countername
+################################################################################
+def _get_number_of_buckets(data: dict, verbose: bool = False) -> int:
+    """
+    Private method to get the number of buckets in a data dictionary from the
+    length of the counters
 
-        hdoutfile.attrs["_NUMBER_OF_BUCKETS_"] = num_buckets
+    Raises:
+        Warning: If two counters have a different number of entries.
+    """
 
-    write_file_metadata(filename)
+    counters = data["_LIST_OF_COUNTERS_"]
+    num_buckets = -1
+    prevcounter = None
+    for i, countername in enumerate(counters):
+        ncounter = len(data[countername])
+
+        if verbose:
+            print(f"{countername:<32s} has {ncounter:<12d} entries")
+
+        if i > 0 and ncounter != num_buckets:
+            warnings.warn(
+                f"{countername} and {prevcounter} have differing number of entries!"
+            )
+            # SHOULD WE EXIT ON THIS?
+
+        num_buckets = max(num_buckets, ncounter)
+
+        prevcounter = countername
+
+    return num_buckets
+
+
+################################################################################
+def _extend_file(
+    filename: str,
+    data: dict,
+    buffer_size: int = None,
+    verbose: bool = False,
+    stats: IOStats = None,
+) -> h5.File:
+    """
+    Private method to append the buckets in a data dictionary to the end of a
+    hepfile that was written with `write_to_file(..., extendible=True)`.
+
+    Raises:
+        InputError: If the datasets in data are not the same as in the file, or the
+                    file can't be extended
+    """
+
+    with h5.File(filename, "a") as hdoutfile:
+        _check_append(hdoutfile, data)
+
+        for group in data["_GROUPS_"]:
+            datasets = data["_GROUPS_"][group]
+            if group == "_SINGLETONS_GROUP_":
+                datasets = _get_singletons(data)
+
+            for dataset in datasets:
+                if group == "_SINGLETONS_GROUP_" and dataset != "COUNTER":
+                    name = dataset
+                else:
+                    name = f"{group}/{dataset}"
+
+                if name not in hdoutfile:
+                    raise InputError(
+                        f"{name} is not in {filename}! Can not append to it."
+                    )
+
+                if verbose:
+                    print(f"Appending {len(data[name])} entries to {name}")
+
+                _extend_dataset(
+                    hdoutfile[name], data[name], buffer_size=buffer_size, stats=stats
+                )
+
+        # files written before the offsets were stored don't have them
+        for counter in data["_LIST_OF_COUNTERS_"]:
+            path = _offsets_path(counter)
+            if path not in hdoutfile:
+                continue
+
+            offsets = hdoutfile[path]
+            new_offsets = _offsets_from_counter(data[counter], start=offsets[-1])
+            _extend_dataset(
+                offsets, new_offsets[1:], buffer_size=buffer_size, stats=stats
+            )
+
+        hdoutfile.attrs["_NUMBER_OF_BUCKETS_"] += _get_number_of_buckets(
+            data, verbose=verbose
+        )
 
     return hdoutfile
+
+
+def _check_append(hdoutfile: h5.File, data: dict) -> None:
+    """
+    Private method to check that the buckets in a data dictionary can be appended
+    to an open hepfile: the groups, datasets, and counters must be the same, the
+    data types must be compatible, and the datasets must be extendible.
+    """
+
+    schema = _read_schema(hdoutfile)
+    filename = hdoutfile.filename
+
+    ours = {
+        name: counter
+        for name, counter in data["_MAP_DATASETS_TO_COUNTERS_"].items()
+        if name in data["_GROUPS_"] or name in data
+    }
+    if ours != schema["_MAP_DATASETS_TO_COUNTERS_"]:
+        missing = set(schema["_MAP_DATASETS_TO_COUNTERS_"]) - set(ours)
+        extra = set(ours) - set(schema["_MAP_DATASETS_TO_COUNTERS_"])
+        raise InputError(
+            f"The datasets in data are not the same as in {filename}! "
+            + f"Missing from data: {sorted(missing)}, not in the file: {sorted(extra)}"
+        )
+
+    for group in data["_GROUPS_"]:
+        datasets = data["_GROUPS_"][group]
+        if group == "_SINGLETONS_GROUP_":
+            datasets = _get_singletons(data)
+
+        for dataset in datasets:
+            if group == "_SINGLETONS_GROUP_" and dataset != "COUNTER":
+                name = dataset
+            else:
+                name = f"{group}/{dataset}"
+
+            if name not in hdoutfile:
+                raise InputError(f"{name} is not in {filename}! Can not append to it.")
+
+            h5dset = hdoutfile[name]
+            if h5dset.maxshape[0] is not None:
+                raise InputError(
+                    f"{name} in {filename} can not be extended! Write the file with "
+                    + "extendible=True to be able to append to it."
+                )
+
+            values = data[name]
+            dtype = (
+                values.dtype
+                if isinstance(values, np.ndarray)
+                else np.dtype(data["_MAP_DATASETS_TO_DATA_TYPES_"].get(name, float))
+            )
+            if h5.check_string_dtype(h5dset.dtype) is not None:
+                compatible = dtype.kind in {"U", "S", "O"}
+            else:
+                compatible = np.can_cast(dtype, h5dset.dtype, casting="same_kind")
+
+            if not compatible:
+                raise InputError(
+                    f"{name} is {dtype} in data but {h5dset.dtype} in {filename}!"
+                )
+
+            if np.ndim(values) > 1 and np.shape(values)[1:] != h5dset.shape[1:]:
+                raise InputError(
+                    f"The entries of {name} have shape {np.shape(values)[1:]} in data "
+                    + f"but {h5dset.shape[1:]} in {filename}!"
+                )
+
+
+################################################################################
+def _get_singletons(data: dict) -> list[str]:
+    """
+    Private method to get the names of the singletons to write, including the
+    COUNTER. The data dictionaries from hepfile.load don't list the COUNTER in the
+    singletons group, but we still need to write it.
+    """
+
+    singletons = list(data["_GROUPS_"]["_SINGLETONS_GROUP_"])
+    if "COUNTER" not in singletons and "_SINGLETONS_GROUP_/COUNTER" in data:
+        singletons.insert(0, "COUNTER")
+
+    return singletons
+
+
+def _offsets_path(counter: str) -> str:
+    """
+    Private method to get the name of the offsets dataset of a counter
+    """
+
+    return f"_OFFSETS_/{counter.split('/')[0]}"
+
+
+def _write_schema(
+    hdoutfile: h5.File, data: dict, dataset_info: dict, offsets: dict
+) -> None:
+    """
+    Private method to write the schema record of a hepfile. This is a single,
+    versioned, JSON string with everything a reader needs to know about the layout
+    of the file, so that it doesn't have to rebuild it from the other tables.
+
+    The record has the keys:
+        version: the version of the record, `hepfile.constants.schema_version`
+        map_datasets_to_counters: the full name of every dataset (and group) and the
+                                  full name of its counter
+        singletons: the names of the singleton datasets
+        datasets: the dtype and shape (after the first dimension) of every dataset
+        offsets: the name of the offsets dataset of every counter
+    """
+
+    record = {
+        "version": constants.schema_version,
+        "map_datasets_to_counters": data["_MAP_DATASETS_TO_COUNTERS_"],
+        "singletons": [
+            name for name in data["_GROUPS_"]["_SINGLETONS_GROUP_"] if name != "COUNTER"
+        ],
+        "datasets": dataset_info,
+        "offsets": offsets,
+    }
+
+    hdoutfile.create_dataset("_SCHEMA_", data=np.bytes_(json.dumps(record)))
+
+
+################################################################################
+def _stream_to_file(filename: str, batches: Iterator[dict], **kwargs) -> dict:
+    """
+    Private method to write an iterator of data dictionaries with the same groups
+    and datasets to a single hepfile. The first data dictionary creates the file
+    with extendible datasets and each later one is appended to it.
+
+    Args:
+        filename (str): Name of output file
+        batches (Iterator): data dictionaries to write
+        **kwargs: passed to `hepfile.write.write_to_file`
+
+    Returns:
+        dict: The last data dictionary that was written, or None if there were none
+    """
+
+    buffer_size = kwargs.get("buffer_size")
+    verbose = kwargs.get("verbose", False)
+    stats = kwargs.get("stats")
+
+    data = None
+    for batch in batches:
+        if data is None:
+            write_to_file(filename, batch, extendible=True, **kwargs)
+        else:
+            _extend_file(
+                filename, batch, buffer_size=buffer_size, verbose=verbose, stats=stats
+            )
+        data = batch
+
+    return data
@@ -0,0 +1,60 @@
+"""
+Tests for stats.py
+"""
+import numpy as np
+import hepfile as hf
+
+
+def test_load_stats():
+    """
+    Test recording the reads in load and iterate
+    """
+
+    hf.synthetic.generate("stats-test.h5", 100, seed=1)
+
+    records = []
+    stats = hf.stats.IOStats(callback=lambda name, values: records.append(name))
+    data, _ = hf.load("stats-test.h5", stats=stats)
+
+    for name in ["jet/e", "jet/njet", "METpx"]:
+        assert name in stats.datasets
+        assert stats.datasets[name]["nbytes"] == data[name].nbytes
+        assert stats.datasets[name]["io_time"] > 0
+        assert stats.datasets[name]["storage_size"] > 0
+
+    assert set(stats.index_time) == set(data["_LIST_OF_COUNTERS_"])
+    assert "schema" in stats.timings and "conversion" in stats.timings
+    assert "jet/e" in records
+
+    # the numbers add up over the chunks
+    stats = hf.stats.IOStats()
+    for _ in hf.iterate("stats-test.h5", chunk_size=30, stats=stats):
+        pass
+    assert stats.datasets["jet/e"]["nbytes"] == data["jet/e"].nbytes
+    assert stats.totals()["nbytes"] >= data["jet/e"].nbytes
+    assert "jet/e" in stats.summary()
+
+
+def test_write_stats():
+    """
+    Test recording the writes in write_to_file
+    """
+
+    data = hf.synthetic.make_data(1000, seed=1)
+    stats = hf.stats.IOStats()
+    hf.write_to_file("stats-test.h5", data, comp_type="gzip", stats=stats)
+
+    # doubles are written as floats
+    assert stats.datasets["jet/e"]["nbytes"] == 4 * len(data["jet/e"])
+    assert stats.datasets["jet/flavor"]["nbytes"] == data["jet/flavor"].nbytes
+    assert stats.datasets["trigger"]["conversion_time"] > 0
+
+    # gzip compresses the integer counters
+    storage = stats.datasets["jet/njet"]["storage_size"]
+    assert 0 < storage < stats.datasets["jet/njet"]["nbytes"]
+
+    totals = stats.totals()
+    assert totals["nbytes"] == sum(entry["nbytes"] for entry in stats.datasets.values())
+    assert np.isclose(
+        totals["io_time"], sum(entry["io_time"] for entry in stats.datasets.values())
+    )
@@ -0,0 +1,245 @@
+"""
+Tests for file_tools.py
+"""
+import os
+
+import numpy as np
+import hepfile as hf
+import pytest
+
+
+def test_skim():
+    """
+    Test skim
+    """
+
+    infile = "skim-test-in.h5"
+    hf.synthetic.generate(infile, 5000, seed=4)
+    expected, _ = hf.load(infile)
+
+    outfile = "skim-test-out.h5"
+    nbuckets = hf.skim(
+        infile, outfile, lambda data: data["jet/njet"] >= 6, chunk_size=1500
+    )
+
+    mask = expected["jet/njet"] >= 6
+    assert nbuckets == np.count_nonzero(mask)
+    assert hf.get_nbuckets_in_file(outfile) == nbuckets
+
+    # the same as loading the selected buckets
+    selected, _ = hf.load(infile, subset=mask)
+    data, _ = hf.load(outfile)
+    for name in ["jet/njet", "jet/e", "muons/nmuon", "muons/nhits", "METpx", "trigger"]:
+        assert np.all(data[name] == selected[name])
+    assert np.all(data["_SINGLETONS_GROUP_/COUNTER"] == 1)
+
+    # only keep some of the columns
+    outfile = "skim-test-columns.h5"
+    hf.skim(infile, outfile, columns=["jet", "METpx"], comp_type="gzip")
+    data, _ = hf.load(outfile)
+    assert "muons/e" not in data and "METpy" not in data
+    assert np.all(data["jet/e"] == expected["jet/e"])
+
+    with pytest.raises(hf.errors.InputError):
+        hf.skim(infile, "skim-test-bad.h5", lambda data: data["jet/njet"])
+
+
+def test_merge():
+    """
+    Test merge
+    """
+
+    inputs = []
+    for i, nbuckets in enumerate([1000, 2500, 300]):
+        filename = f"merge-test-{i}.h5"
+        hf.synthetic.generate(filename, nbuckets, seed=i, comp_type="gzip")
+        inputs.append(filename)
+
+    nbuckets = hf.merge(inputs, "merge-test-out.h5")
+    assert nbuckets == 3800
+    assert hf.get_nbuckets_in_file("merge-test-out.h5") == 3800
+
+    data, _ = hf.load("merge-test-out.h5")
+    parts = [hf.load(filename)[0] for filename in inputs]
+    for name in ["jet/njet", "jet/e", "photons/px", "METpx", "trigger"]:
+        assert np.all(data[name] == np.concatenate([part[name] for part in parts]))
+
+    # the offsets continue across the inputs
+    with hf.File("merge-test-out.h5") as f:
+        offsets = np.concatenate(([0], np.cumsum(data["jet/njet"])))
+        assert np.all(f.get_offsets("jet/njet") == offsets)
+        assert np.all(
+            f.get_bucket(1200)["jet/e"]
+            == parts[1]["jet/e"][
+                parts[1]["jet/njet_INDEX"][200] : parts[1]["jet/njet_INDEX"][201]
+            ]
+        )
+
+    schema = {"jet": {"counter": "njet", "datasets": {"e": float}}}
+    hf.synthetic.generate("merge-test-other.h5", 10, schema=schema)
+    with pytest.raises(hf.errors.InputError):
+        hf.merge([inputs[0], "merge-test-other.h5"], "merge-test-bad.h5")
+
+
+def test_merge_empty_sparse_group():
+    """
+    Test merging extendible files where the first has no entries in a sparse
+    group, so that its empty dataset has chunks longer than the merged dataset
+    """
+
+    schema = {
+        "jet": {"counter": "njet", "datasets": {"e": float}},
+        "photons": {"counter": "nphoton", "occupancy": 0.0, "datasets": {"e": float}},
+    }
+    hf.write_to_file(
+        "merge-sparse-test-0.h5",
+        hf.synthetic.make_data(5, schema=schema, seed=1),
+        extendible=True,
+    )
+    schema["photons"]["occupancy"] = 1.0
+    hf.write_to_file(
+        "merge-sparse-test-1.h5",
+        hf.synthetic.make_data(4, schema=schema, seed=2),
+        extendible=True,
+    )
+
+    inputs = ["merge-sparse-test-0.h5", "merge-sparse-test-1.h5"]
+    assert hf.merge(inputs, "merge-sparse-test-out.h5") == 9
+
+    data, _ = hf.load("merge-sparse-test-out.h5")
+    parts = [hf.load(filename)[0] for filename in inputs]
+    for name in ["jet/e", "photons/nphoton", "photons/e"]:
+        assert np.all(data[name] == np.concatenate([part[name] for part in parts]))
+
+
+def produce_shard(i):
+    """
+    Producer of the shards of test_write_parallel
+    """
+
+    if i == 1:
+        return (hf.synthetic.make_data(100, seed=10 + j) for j in range(3))
+    return hf.synthetic.make_data(500, seed=i)
+
+
+def test_write_parallel():
+    """
+    Test write_parallel and merge with virtual=True
+    """
+
+    nbuckets = hf.write_parallel("parallel-test.h5", produce_shard, 3, max_workers=2)
+    assert nbuckets == 1300
+    assert os.path.exists("parallel-test.shard2.h5")
+
+    parts = [hf.load(f"parallel-test.shard{i}.h5")[0] for i in range(3)]
+    data, bucket = hf.load("parallel-test.h5")
+    for name in ["jet/njet", "jet/e", "photons/px", "METpx", "trigger"]:
+        assert np.all(data[name] == np.concatenate([part[name] for part in parts]))
+
+    with hf.File("parallel-test.h5") as f:
+        assert np.all(
+            f.get_bucket(700)["muons/e"] == f.load(subset=(700, 701))[0]["muons/e"]
+        )
+
+    # the virtual output can be materialized with a normal merge
+    hf.merge(["parallel-test.h5"], "parallel-test-copy.h5")
+    copy, _ = hf.load("parallel-test-copy.h5")
+    assert np.all(copy["jet/e"] == data["jet/e"])
+
+    with pytest.raises(hf.errors.InputError):
+        hf.merge(
+            ["parallel-test.shard0.h5"],
+            "parallel-test-bad.h5",
+            virtual=True,
+            extendible=True,
+        )
+
+
+def test_split():
+    """
+    Test split and split_boundaries
+    """
+
+    # the first half of the buckets have far fewer jets than the second half
+    few = {"jet": {"counter": "njet", "mean": 0.5, "datasets": {"e": float}}}
+    many = {"jet": {"counter": "njet", "mean": 20, "datasets": {"e": float}}}
+    hf.synthetic.generate("split-test-few.h5", 2000, schema=few, seed=1)
+    hf.synthetic.generate("split-test-many.h5", 2000, schema=many, seed=2)
+    hf.merge(["split-test-few.h5", "split-test-many.h5"], "split-test-in.h5")
+
+    boundaries = hf.split_boundaries("split-test-in.h5", 4, weight="buckets")
+    assert list(boundaries) == [0, 1000, 2000, 3000, 4000]
+
+    # balancing the bytes puts more of the small buckets in the first shard
+    boundaries = hf.split_boundaries("split-test-in.h5", 4)
+    assert boundaries[1] > 2000
+
+    outfiles = [f"split-test-out-{i}.h5" for i in range(4)]
+    ranges = hf.split("split-test-in.h5", outfiles, chunk_size=500, max_workers=2)
+    assert ranges == list(zip(boundaries[:-1], boundaries[1:]))
+
+    expected, _ = hf.load("split-test-in.h5")
+    shards = [hf.load(outfile)[0] for outfile in outfiles]
+    for name in ["jet/njet", "jet/e"]:
+        assert np.all(
+            np.concatenate([shard[name] for shard in shards]) == expected[name]
+        )
+
+    with pytest.raises(hf.errors.InputError):
+        hf.split_boundaries("split-test-in.h5", 5000)
+
+
+def test_add_and_drop():
+    """
+    Test add_group_to_file, add_dataset_to_file, drop_from_file, and repack_file
+    """
+
+    filename = "add-drop-test.h5"
+    hf.write_to_file(filename, hf.synthetic.make_data(500, seed=5), extendible=True)
+    expected, _ = hf.load(filename)
+
+    rng = np.random.default_rng(5)
+    score = rng.random(len(expected["jet/e"]))
+    hf.add_dataset_to_file(filename, "jet/score", score)
+    hf.add_dataset_to_file(filename, "weight", np.ones(500))
+
+    ntrack = rng.poisson(2, size=500).astype(np.int32)
+    pt = rng.random(ntrack.sum())
+    hf.add_group_to_file(filename, "tracks", "ntrack", ntrack, {"pt": pt})
+
+    data, _ = hf.load(filename)
+    assert np.allclose(data["jet/score"], score)
+    assert np.all(data["weight"] == 1)
+    assert np.all(data["tracks/ntrack"] == ntrack)
+    assert np.allclose(data["tracks/pt"], pt)
+    assert np.all(data["jet/e"] == expected["jet/e"])
+    assert "weight" in data["_SINGLETONS_GROUP_"]
+
+    with hf.File(filename) as f:
+        assert len(f.get_bucket(3)["tracks/pt"]) == ntrack[3]
+
+    # the new datasets are extendible like the rest of the file
+    hf.write_to_file(filename, hf.load(filename, subset=(0, 10))[0], append=True)
+    assert hf.get_nbuckets_in_file(filename) == 510
+
+    with pytest.raises(hf.errors.InputError):
+        hf.add_dataset_to_file(filename, "jet/bad", score[:-1])
+    with pytest.raises(hf.errors.InputError):
+        hf.add_dataset_to_file(filename, "nogroup/x", score)
+    with pytest.raises(hf.errors.InputError, match="protected"):
+        hf.add_dataset_to_file(filename, "_SCHEMA_", np.ones(510))
+    with pytest.raises(hf.errors.InputError):
+        hf.drop_from_file(filename, "jet/njet")
+
+    # names listed twice, and datasets of groups that are dropped, are fine
+    size = os.path.getsize(filename)
+    hf.drop_from_file(
+        filename, ["jet/e", "jet", "tracks/pt", "weight", "weight"], repack=True
+    )
+    assert os.path.getsize(filename) < size
+
+    data, _ = hf.load(filename)
+    assert "jet" not in data["_GROUPS_"] and "jet/e" not in data
+    assert data["_GROUPS_"]["tracks"] == ["ntrack"]
+    assert "weight" not in data["_SINGLETONS_GROUP_"]
+    assert np.all(data["muons/e"][: len(expected["muons/e"])] == expected["muons/e"])
@@ -0,0 +1,100 @@
+"""
+Tests for parallel.py
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import hepfile as hf
+import pytest
+
+
+def jet_energy_histogram(data):
+    counts, _ = np.histogram(data["jet/e"], bins=20, range=(0, 500))
+    return {"counts": counts, "nbuckets": hf.get_nbuckets_in_data(data)}
+
+
+def jet_energies(data):
+    return data["jet/e"]
+
+
+def sum_shared(descriptor, name):
+    data = hf.attach_shared(descriptor)
+    return data[name].sum(dtype=float)
+
+
+def test_process():
+    """
+    Test process with the built in reducers, one and many workers
+    """
+
+    filenames = ["process-test-1.h5", "process-test-2.h5"]
+    hf.synthetic.generate(filenames[0], 3000, seed=6)
+    hf.synthetic.generate(filenames[1], 1000, seed=7)
+
+    energies = np.concatenate([hf.load(filename)[0]["jet/e"] for filename in filenames])
+    expected, _ = np.histogram(energies, bins=20, range=(0, 500))
+
+    for max_workers in [1, 3]:
+        result = hf.process(
+            filenames, jet_energy_histogram, max_workers=max_workers, chunk_size=250
+        )
+        assert np.all(result["counts"] == expected)
+        assert result["nbuckets"] == 4000
+
+        # the results are combined in the order of the buckets
+        result = hf.process(
+            filenames,
+            jet_energies,
+            reducer="concatenate",
+            max_workers=max_workers,
+            chunk_size=250,
+        )
+        assert np.all(result == energies)
+
+    # any function works without worker processes
+    result = hf.process(
+        filenames[0],
+        lambda data: data["jet"]["e"],
+        reducer=lambda a, b: np.concatenate((a, b)),
+        max_workers=1,
+        desired_groups=["jet"],
+        match="exact",
+        return_type="awkward",
+    )
+    assert len(result) == 3000
+
+    with pytest.raises(hf.errors.InputError):
+        hf.process(filenames, jet_energies, reducer="multiply")
+
+    with pytest.raises(hf.errors.InputError):
+        hf.process([], jet_energies)
+
+
+def test_shared_data():
+    """
+    Test loading a file into shared memory and attaching to it in workers
+    """
+
+    filename = "shared-test.h5"
+    hf.synthetic.generate(filename, 2000, seed=8)
+    expected, _ = hf.load(filename, subset=(100, 1100))
+
+    with hf.load_shared(filename, subset=(100, 1100)) as shared:
+        assert np.all(shared.data["jet/e"] == expected["jet/e"])
+        assert np.all(shared.data["trigger"] == expected["trigger"])
+        assert not shared.data["jet/e"].flags.writeable
+
+        names = ["jet/e", "METpx", "muons/nmuon"]
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            sums = list(executor.map(sum_shared, [shared.descriptor] * 3, names))
+        for name, total in zip(names, sums):
+            assert total == pytest.approx(expected[name].sum(dtype=float))
+
+        # the shared data is still a data dictionary
+        data = hf.attach_shared(shared.descriptor)
+        assert hf.get_nbuckets_in_data(data) == 1000
+        hf.write_to_file("shared-test-out.h5", data)
+        assert hf.get_nbuckets_in_file("shared-test-out.h5") == 1000
+
+    with pytest.raises(hf.errors.InputError):
+        hf.load_shared(filename, return_type="awkward")
@@ -0,0 +1,83 @@
+"""
+Tests for async_tools.py
+"""
+import asyncio
+
+import numpy as np
+import hepfile as hf
+import pytest
+
+
+def test_load_async():
+    """
+    Test the async versions of load and the metadata readers
+    """
+
+    filenames = [f"async-test-{i}.h5" for i in range(3)]
+    for i, filename in enumerate(filenames):
+        hf.synthetic.generate(filename, 1000, seed=i)
+
+    async def read_all():
+        loads = [hf.load_async(filename, subset=(10, 20)) for filename in filenames]
+        return (
+            await asyncio.gather(*loads),
+            await hf.get_nbuckets_in_file_async(filenames[0]),
+            await hf.get_file_metadata_async(filenames[0]),
+        )
+
+    results, nbuckets, metadata = asyncio.run(read_all())
+    for filename, (data, _) in zip(filenames, results):
+        expected, _ = hf.load(filename, subset=(10, 20))
+        assert np.all(data["jet/e"] == expected["jet/e"])
+    assert nbuckets == 1000
+    assert metadata == hf.get_file_metadata(filenames[0])
+
+
+def test_iterate_async():
+    """
+    Test the async iterator and cancelling calls that are waiting
+    """
+
+    filename = "async-test-iterate.h5"
+    hf.synthetic.generate(filename, 1000, seed=3)
+    expected, _ = hf.load(filename)
+
+    async def read_chunks():
+        return [
+            chunk["jet/e"]
+            async for chunk, _ in hf.iterate_async(filename, chunk_size=300, prefetch=2)
+        ]
+
+    chunks = asyncio.run(read_chunks())
+    assert len(chunks) == 4
+    assert np.all(np.concatenate(chunks) == expected["jet/e"])
+
+    async def cancel_waiting():
+        async with hf.AsyncReader(max_workers=1) as reader:
+            tasks = [asyncio.ensure_future(reader.load(filename)) for _ in range(4)]
+            await asyncio.sleep(0)
+            for task in tasks[1:]:
+                task.cancel()
+            data, _ = await tasks[0]
+            return data, [task.cancelled() for task in tasks]
+
+    data, cancelled = asyncio.run(cancel_waiting())
+    assert np.all(data["jet/e"] == expected["jet/e"])
+    assert cancelled == [False, True, True, True]
+
+    async def bad_chunk_size():
+        async for _ in hf.iterate_async(filename, chunk_size=0):
+            pass
+
+    with pytest.raises(hf.errors.InputError):
+        asyncio.run(bad_chunk_size())
+
+    with pytest.raises(hf.errors.InputError):
+        hf.AsyncReader(max_workers=0)
+
+    async def numpy_workers():
+        async with hf.AsyncReader(max_workers=np.int64(2)) as reader:
+            return await reader.load(filename)
+
+    data, _ = asyncio.run(numpy_workers())
+    assert np.all(data["jet/e"] == expected["jet/e"])
@@ -1,7 +1,36 @@
+import subprocess
+import sys
+
+import pytest
 import hepfile as m
 
 def test_version():
 
     assert m._PANDAS
     assert m._AWKWARD
+    assert m._ARROW
     assert m.__version__
+
+
+def test_lazy_imports():
+
+    # the optional backends are only imported when they are first used
+    code = "; ".join(
+        (
+            "import sys",
+            "import hepfile",
+            "assert 'awkward' not in sys.modules",
+            "assert 'pandas' not in sys.modules",
+            "assert 'pyarrow' not in sys.modules",
+            "hepfile.df_tools",
+            "assert 'pandas' in sys.modules",
+        )
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    with pytest.raises(AttributeError):
+        m.not_a_module
+
+    # the modules the submodules import aren't part of hepfile
+    with pytest.raises(AttributeError):
+        m.json
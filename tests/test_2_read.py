@@ -134,6 +134,36 @@ def test_load():
         test_data, test_bucket = hepfile.load(
             filename, True, desired_datasets, subset=int(1e10))
     
+def test_load_subset_at_end_of_file():
+
+    filename = "FOR_TESTS.hdf5"
+    data, bucket = hepfile.load(filename)
+
+    # the last bucket should be read in full
+    test_data, test_bucket = hepfile.load(filename, subset=(5, 10))
+    assert len(test_data["jet/e"]) == data["jet/njet"][5:].sum()
+    assert np.all(test_data["jet/e"] == data["jet/e"][-len(test_data["jet/e"]) :])
+
+
+def test_iterate():
+
+    filename = "FOR_TESTS.hdf5"
+    data, bucket = hepfile.load(filename)
+
+    chunks = list(hepfile.iterate(filename, chunk_size=4))
+    assert [hepfile.get_nbuckets_in_data(d) for d, _ in chunks] == [4, 4, 2]
+    assert np.all(np.concatenate([d["jet/e"] for d, _ in chunks]) == data["jet/e"])
+    assert np.all(np.concatenate([d["METpx"] for d, _ in chunks]) == data["METpx"])
+
+    # the inputs are checked when iterate is called, not at the first chunk
+    with pytest.raises(hepfile.errors.InputError):
+        hepfile.iterate(filename, chunk_size=0)
+
+    with hepfile.File(filename) as f:
+        with pytest.raises(hepfile.errors.InputError):
+            f.iterate(chunk_size=0)
+
+
 def test_unpack():
 
     # This assumes you run nosetests from the h5hep directory and not
@@ -278,3 +308,309 @@ def test_get_file_header():
 
     # just test printing the file header to make sure it runs
     hdr = hepfile.print_file_header(filename)
+
+
+def test_File():
+
+    filename = "FOR_TESTS.hdf5"
+
+    with hepfile.File(filename) as f:
+        assert f.nbuckets == hepfile.get_nbuckets_in_file(filename)
+        assert "jet" in f.groups
+        assert "e" in f.groups["jet"]
+
+        # the same as load
+        data, bucket = f.load()
+        expected, expected_bucket = hepfile.load(filename)
+        assert set(data.keys()) == set(expected.keys())
+        assert bucket == expected_bucket
+        for key in ["jet/e", "jet/njet", "jet/njet_INDEX", "METpx"]:
+            assert np.all(data[key] == expected[key])
+
+        data, _ = f.load(desired_groups=["jet"], subset=(2, 7))
+        expected, _ = hepfile.load(filename, desired_groups=["jet"], subset=(2, 7))
+        assert "METpx" not in data
+        assert np.all(data["jet/e"] == expected["jet/e"])
+        assert np.all(data["jet/njet_INDEX"] == expected["jet/njet_INDEX"])
+
+        # the counters are cached, and can't be changed through the output data
+        data["jet/njet"][:] = -1
+        assert np.all(f.get_counter("jet/njet") >= 0)
+        offsets = f.get_offsets("jet/njet")
+        assert len(offsets) == f.nbuckets + 1
+        assert offsets[-1] == np.sum(f.get_counter("jet/njet"))
+
+        # nor through get_counter and get_offsets
+        with pytest.raises(ValueError):
+            f.get_counter("jet/njet")[0] = 0
+        with pytest.raises(ValueError):
+            offsets[0] = 1
+
+        chunks = list(f.iterate(chunk_size=4))
+        assert len(chunks) == 3
+
+        metadata = f.get_metadata()
+        assert metadata == hepfile.get_file_metadata(filename)
+        assert f.print_metadata() == hepfile.print_file_metadata(filename)
+
+        awk, _ = f.load(return_type="awkward")
+        assert len(awk["jet"]) == f.nbuckets
+
+    with pytest.raises(ValueError):
+        f.load()
+
+
+def test_load_match():
+
+    schema = {
+        "jet": {"counter": "njet", "mean": 3, "datasets": {"e": float, "px": float}},
+        "fatjet": {"counter": "nfatjet", "mean": 1, "datasets": {"e": float}},
+        "_SINGLETONS_GROUP_": {"datasets": {"MET": float, "run": np.int64}},
+    }
+    filename = "match-test.h5"
+    hepfile.synthetic.generate(filename, 50, schema=schema, seed=1)
+
+    # substring matching also reads fatjet
+    data, _ = hepfile.load(filename, desired_groups=["jet"])
+    assert "fatjet/e" in data
+
+    # only read the jet group and the counters it needs
+    data, bucket = hepfile.load(filename, desired_groups=["jet"], match="exact")
+    assert "jet/e" in data and "jet/px" in data
+    assert "fatjet/e" not in data and "fatjet/nfatjet" not in data
+    assert "MET" not in data
+    assert data["_LIST_OF_COUNTERS_"] == ["_SINGLETONS_GROUP_/COUNTER", "jet/njet"]
+    assert list(data["_GROUPS_"]) == ["_SINGLETONS_GROUP_", "jet"]
+    assert "jet/e" in bucket
+
+    # single datasets and singletons
+    data, _ = hepfile.load(filename, desired_groups=["jet/e", "MET"], match="exact")
+    assert data["_GROUPS_"] == {"_SINGLETONS_GROUP_": ["MET"], "jet": ["e", "njet"]}
+
+    expected, _ = hepfile.load(filename)
+    assert np.all(data["jet/e"] == expected["jet/e"])
+    assert np.all(data["MET"] == expected["MET"])
+
+    # the selection can be written back to a file
+    hepfile.write_to_file("match-test-out.h5", data)
+    loaded, _ = hepfile.load("match-test-out.h5")
+    assert np.all(loaded["jet/e"] == expected["jet/e"])
+
+    data, _ = hepfile.load(filename, desired_groups=["*jet/e"], match="glob")
+    assert "jet/e" in data and "fatjet/e" in data and "jet/px" not in data
+
+    data, _ = hepfile.load(filename, desired_groups=[r"jet/(e|px)"], match="regex")
+    assert "jet/px" in data and "fatjet/e" not in data
+
+    data, _ = hepfile.load(
+        filename, desired_groups=["_SINGLETONS_GROUP_"], match="exact", subset=(5, 10)
+    )
+    assert np.all(data["run"] == expected["run"][5:10])
+    assert "jet/e" not in data
+
+    with hepfile.File(filename) as f:
+        data, _ = f.load(desired_groups=["fatjet"], match="exact")
+        assert "jet/e" not in data
+        assert np.all(data["fatjet/e"] == expected["fatjet/e"])
+
+    with pytest.raises(hepfile.errors.InputError):
+        hepfile.load(filename, desired_groups=["jets"], match="exact")
+
+    with pytest.raises(hepfile.errors.InputError):
+        hepfile.load(filename, match="fuzzy")
+
+
+def test_get_bucket():
+
+    filename = "get-bucket-test.h5"
+    hepfile.synthetic.generate(filename, 10_000, seed=2, comp_type="gzip", comp_opts=4)
+    data, bucket = hepfile.load(filename)
+
+    # a small cache, so that blocks are dropped
+    with hepfile.File(filename, cache_size=1_000_000) as f:
+        for i in [0, 1, 4095, 4096, 5000, 9999]:
+            hepfile.unpack(bucket, data, i)
+            fetched = f.get_bucket(i)
+            assert fetched.keys() == bucket.keys()
+            for key in bucket:
+                assert np.all(fetched[key] == bucket[key])
+
+        assert np.all(f.get_bucket(-1)["jet/e"] == f.get_bucket(9999)["jet/e"])
+
+        # nearby buckets come from the cache
+        f.get_bucket(5001)
+        info = f.cache_info()
+        assert info["hits"] > 0
+        assert 0 < info["nbytes"] <= 1_000_000
+
+        # the cached blocks can't be changed through the output
+        fetched = f.get_bucket(5000)
+        fetched["jet/e"][:] = -1
+        assert np.all(f.get_bucket(5000)["jet/e"] >= 0)
+
+        buckets = f.get_buckets([3, 2], desired_groups=["muons"], match="exact")
+        assert set(buckets[0].keys()) == {
+            "_SINGLETONS_GROUP_/COUNTER",
+            "muons/e",
+            "muons/nhits",
+            "muons/nmuon",
+            "muons/px",
+            "muons/py",
+            "muons/pz",
+        }
+        assert buckets[1]["muons/nmuon"] == data["muons/nmuon"][2]
+
+        f.clear_cache()
+        assert f.cache_info()["blocks"] == 0
+
+        with pytest.raises(hepfile.errors.RangeSubsetError):
+            f.get_bucket(10_000)
+
+
+def test_load_subset_array():
+
+    filename = "subset-array-test.h5"
+    hepfile.synthetic.generate(filename, 1000, seed=3)
+    expected, _ = hepfile.load(filename)
+    offsets = np.concatenate(([0], np.cumsum(expected["jet/njet"])))
+
+    indices = np.array([0, 1, 2, 10, 500, 501, 999])
+    mask = np.zeros(1000, dtype=bool)
+    mask[indices] = True
+
+    for subset in [indices, mask]:
+        data, bucket = hepfile.load(filename, subset=subset)
+        assert data["_NUMBER_OF_BUCKETS_"] == len(indices)
+        assert np.all(data["jet/njet"] == expected["jet/njet"][indices])
+        assert np.all(data["METpx"] == expected["METpx"][indices])
+
+        jets = [expected["jet/e"][offsets[i] : offsets[i + 1]] for i in indices]
+        assert np.all(data["jet/e"] == np.concatenate(jets))
+
+        hepfile.unpack(bucket, data, 4)
+        assert np.all(bucket["jet/e"] == jets[4])
+
+    with hepfile.File(filename) as f:
+        data, _ = f.load(subset=indices)
+        assert np.all(data["muons/e"] == hepfile.load(filename, subset=mask)[0]["muons/e"])
+
+    # lists that aren't a [low, high) range select buckets too
+    data, _ = hepfile.load(filename, subset=[1, 3, 5])
+    assert np.all(data["jet/njet"] == expected["jet/njet"][[1, 3, 5]])
+
+    data, _ = hepfile.load(filename, subset=mask.tolist())
+    assert np.all(data["jet/njet"] == expected["jet/njet"][indices])
+
+    data, _ = hepfile.load(filename, subset=[1, 3])
+    assert np.all(data["jet/njet"] == expected["jet/njet"][1:3])
+
+    with pytest.raises(hepfile.errors.RangeSubsetError):
+        hepfile.load(filename, subset=np.array([5, 2]))
+
+    with pytest.raises(hepfile.errors.RangeSubsetError):
+        hepfile.load(filename, subset=np.array([999, 1000]))
+
+    with pytest.raises(hepfile.errors.RangeSubsetError):
+        hepfile.load(filename, subset=np.ones(10, dtype=bool))
+
+
+def test_friends():
+
+    filename = "friends-test-base.h5"
+    friend = "friends-test-friend.h5"
+    hepfile.synthetic.generate(filename, 100, seed=4)
+    base, _ = hepfile.load(filename)
+
+    # the friend adds a dataset to the jet group and a new singleton
+    data = hepfile.initialize()
+    hepfile.create_group(data, "jet", counter="njet")
+    hepfile.create_dataset(data, "btag2", group="jet", dtype=float)
+    hepfile.create_dataset(data, "weight", dtype=float)
+    data["jet/njet"] = base["jet/njet"]
+    data["jet/btag2"] = np.arange(base["jet/njet"].sum(), dtype=float)
+    data["weight"] = np.arange(100, dtype=float)
+    data["_SINGLETONS_GROUP_/COUNTER"] = np.ones(100, dtype=int)
+    data["_NUMBER_OF_BUCKETS_"] = 100
+    hepfile.write_to_file(friend, data)
+
+    offsets = np.concatenate(([0], np.cumsum(base["jet/njet"])))
+
+    data, bucket = hepfile.load(filename, friends=[friend], subset=(10, 20))
+    assert np.all(data["weight"] == np.arange(10, 20))
+    assert np.all(data["jet/e"] == base["jet/e"][offsets[10] : offsets[20]])
+    assert np.all(data["jet/btag2"] == np.arange(offsets[10], offsets[20]))
+    assert "btag2" in data["_GROUPS_"]["jet"]
+    assert "weight" in data["_SINGLETONS_GROUP_"]
+
+    hepfile.unpack(bucket, data, 2)
+    assert bucket["weight"] == 12
+    assert np.all(bucket["jet/btag2"] == np.arange(offsets[12], offsets[13]))
+
+    data, _ = hepfile.load(
+        filename,
+        friends=friend,
+        subset=np.array([3, 40]),
+        desired_groups=["jet/e", "weight"],
+        match="exact",
+    )
+    assert np.all(data["weight"] == [3, 40])
+    assert "jet/btag2" not in data
+
+    with hepfile.File(filename, friends=[friend]) as f:
+        bucket = f.get_bucket(12)
+        assert bucket["weight"] == 12
+        assert np.all(bucket["jet/btag2"] == np.arange(offsets[12], offsets[13]))
+
+        weights = [chunk["weight"] for chunk, _ in f.iterate(chunk_size=30)]
+        assert np.all(np.concatenate(weights) == np.arange(100))
+
+    # the datasets of the base file are in both files
+    with pytest.raises(hepfile.errors.InputError):
+        hepfile.load(filename, friends=[filename])
+
+    with pytest.raises(hepfile.errors.InputError):
+        hepfile.load(filename, friends=[friend], desired_groups=["nope"], match="exact")
+
+    hepfile.synthetic.generate("friends-test-short.h5", 10, seed=4)
+    with pytest.raises(hepfile.errors.InputError):
+        hepfile.File(filename, friends=["friends-test-short.h5"])
+
+
+def test_iterate_prefetch():
+
+    filename = "prefetch-test.h5"
+    hepfile.synthetic.generate(filename, 1000, seed=5)
+    data, _ = hepfile.load(filename)
+
+    for prefetch in [1, 3]:
+        chunks = list(hepfile.iterate(filename, chunk_size=64, prefetch=prefetch))
+        assert len(chunks) == 16
+        assert np.all(np.concatenate([d["jet/e"] for d, _ in chunks]) == data["jet/e"])
+
+    # at most prefetch chunks are read ahead of the one the caller is using
+    read = []
+
+    def chunks_read():
+        for i in range(10):
+            read.append(i)
+            yield i
+
+    prefetched = hepfile.read._prefetch(chunks_read(), 2)
+    assert next(prefetched) == 0
+    time.sleep(0.2)
+    assert len(read) == 3
+    assert list(prefetched) == list(range(1, 10))
+
+    # stopping early stops the background thread
+    with hepfile.File(filename) as f:
+        chunks = f.iterate(chunk_size=10, prefetch=2)
+        first, _ = next(chunks)
+        chunks.close()
+        assert np.all(first["METpx"] == data["METpx"][:10])
+
+    # errors in the background thread are raised in the loop
+    with pytest.raises(hepfile.errors.InputError):
+        next(hepfile.iterate(filename, desired_groups=["nope"], match="exact", prefetch=1))
+
+    with pytest.raises(hepfile.errors.InputError):
+        hepfile.iterate(filename, prefetch=-1)
@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 import hepfile
 import h5py as h5
@@ -363,3 +365,105 @@ def test_write_file():
         assert (
             f["testing/test"].attrs["meta"].decode() == "This is just more for testing"
         )
+
+
+def test_write_schema_record():
+    import json
+
+    data = hepfile.synthetic.make_data(100, seed=3)
+    filename = "schema-test.h5"
+    hepfile.write_to_file(filename, data)
+
+    with h5.File(filename, "r") as f:
+        record = json.loads(f["_SCHEMA_"][()])
+        assert record["version"] == hepfile.constants.schema_version
+        assert record["map_datasets_to_counters"]["jet/e"] == "jet/njet"
+        assert "trigger" in record["singletons"]
+        assert record["datasets"]["jet/e"]["dtype"] == "<f4"
+        assert record["datasets"]["trigger"]["dtype"] == "str"
+
+        # the offsets of every group
+        offsets = f[record["offsets"]["jet/njet"]][:]
+        assert offsets[0] == 0
+        assert np.all(np.diff(offsets) == data["jet/njet"])
+
+        # but not of the singletons, they have one entry per bucket
+        assert "_SINGLETONS_GROUP_/COUNTER" not in record["offsets"]
+        assert "_OFFSETS_/_SINGLETONS_GROUP_" not in f
+
+    full, _ = hepfile.load(filename)
+    expected, _ = hepfile.load(filename, subset=(10, 20))
+    assert np.all(expected["trigger"] == full["trigger"][10:20])
+    assert np.all(expected["_SINGLETONS_GROUP_/COUNTER"] == 1)
+
+    selected, _ = hepfile.load(filename, subset=np.array([3, 4, 50]))
+    assert np.all(selected["trigger"] == full["trigger"][[3, 4, 50]])
+
+    # files without the schema record are still read from the other tables
+    with h5.File(filename, "a") as f:
+        del f["_SCHEMA_"]
+        del f["_OFFSETS_"]
+
+    loaded, _ = hepfile.load(filename, subset=(10, 20))
+    for key in ["jet/e", "jet/njet", "jet/njet_INDEX", "trigger"]:
+        assert np.all(loaded[key] == expected[key])
+    assert loaded["_GROUPS_"] == expected["_GROUPS_"]
+
+    # and so are files with a schema record from a newer version of hepfile
+    hepfile.write_to_file(filename, data)
+    with h5.File(filename, "a") as f:
+        record = json.loads(f["_SCHEMA_"][()])
+        record["version"] += 1
+        del f["_SCHEMA_"]
+        f["_SCHEMA_"] = np.bytes_(json.dumps(record))
+
+    with pytest.warns(UserWarning):
+        loaded, _ = hepfile.load(filename, subset=(10, 20))
+    assert np.all(loaded["jet/e"] == expected["jet/e"])
+
+
+def test_write_append():
+    filename = "append-test.h5"
+
+    # appending to files left over from an earlier run would add to them
+    for leftover in [filename, "append-test-fixed.h5"]:
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+    days = [hepfile.synthetic.make_data(100 + i, seed=i) for i in range(3)]
+
+    # the first write creates the file, the others append to it
+    for data in days:
+        hepfile.write_to_file(filename, data, append=True)
+
+    assert hepfile.get_nbuckets_in_file(filename) == 303
+    loaded, _ = hepfile.load(filename)
+    for key in ["jet/njet", "jet/e", "METpx"]:
+        expected = np.concatenate([data[key] for data in days])
+        if expected.dtype == np.float64:
+            expected = expected.astype(np.float32)
+        assert np.all(loaded[key] == expected)
+
+    triggers = np.concatenate([data["trigger"] for data in days])
+    assert [value.decode() for value in loaded["trigger"]] == list(triggers)
+
+    with hepfile.File(filename) as f:
+        offsets = f.get_offsets("jet/njet")
+        assert np.all(f.get_counter("jet/njet") == np.diff(offsets))
+        assert offsets[-1] == len(loaded["jet/e"])
+
+    # data that was loaded from the file can be appended too
+    subset, _ = hepfile.load(filename, subset=(0, 10))
+    hepfile.write_to_file(filename, subset, append=True)
+    assert hepfile.get_nbuckets_in_file(filename) == 313
+
+    # the datasets must be the same
+    schema = {"jet": {"counter": "njet", "datasets": {"e": float}}}
+    other = hepfile.synthetic.make_data(10, schema=schema, seed=1)
+    with pytest.raises(hepfile.errors.InputError):
+        hepfile.write_to_file(filename, other, append=True)
+
+    # and the file must be extendible
+    hepfile.write_to_file("append-test-fixed.h5", days[0])
+    with pytest.raises(hepfile.errors.InputError):
+        hepfile.write_to_file("append-test-fixed.h5", days[1], append=True)
@@ -133,3 +133,77 @@ def test_is_valid_awkward():
 
     with pytest.raises(hf.errors.AwkwardStructureError):
         hf.awkward_tools._is_valid_awkward(np.array([1]))
+
+
+def test_awkward_to_hepfile_buffered():
+    """
+    Tests writing a sliced awkward array in small buffers
+    """
+
+    awk = ak.Array(
+        {
+            "jet": {
+                "e": [[1.0, 2.0], [], [3.0, 4.0, 5.0]],
+                "tag": [["a", "b"], [], ["c", "dd", "e"]],
+            },
+            "met": [1.0, 2.0, 3.0],
+        }
+    )
+
+    # slicing means the offsets do not start at 0
+    data = hf.awkward_tools.awkward_to_hepfile(
+        awk[1:], outfile="awk-buffer-test.h5", buffer_size=2
+    )
+    assert np.all(data["jet/njet"] == [0, 3])
+    assert np.all(data["jet/e"] == [3.0, 4.0, 5.0])
+
+    loaded, _ = hf.load("awk-buffer-test.h5")
+    assert np.all(loaded["jet/njet"] == [0, 3])
+    assert np.all(loaded["jet/e"] == [3.0, 4.0, 5.0])
+    assert [val.decode() for val in loaded["jet/tag"]] == ["c", "dd", "e"]
+    assert np.all(loaded["met"] == [2.0, 3.0])
+
+
+def test_awkward_to_hepfile_batches():
+    """
+    Tests streaming batches of awkward arrays into one hepfile
+    """
+
+    rng = np.random.default_rng(42)
+
+    def batches():
+        for _ in range(3):
+            njet = rng.poisson(3, size=4)
+            yield ak.Array(
+                {
+                    "jet": {
+                        "e": ak.unflatten(rng.random(njet.sum()), njet),
+                        "id": ak.unflatten(np.arange(njet.sum()), njet),
+                    },
+                    "met": rng.random(4),
+                }
+            )
+
+    all_batches = list(batches())
+    rng = np.random.default_rng(42)
+    last = hf.awkward_tools.awkward_to_hepfile(
+        batches(), outfile="awk-batch-test.h5", comp_type="gzip", comp_opts=4
+    )
+    assert len(last["met"]) == 4
+
+    full = ak.concatenate(all_batches)
+    assert hf.get_nbuckets_in_file("awk-batch-test.h5") == 12
+
+    loaded, _ = hf.load("awk-batch-test.h5")
+    assert np.all(loaded["jet/njet"] == ak.to_numpy(ak.num(full.jet.e)))
+    assert np.allclose(loaded["jet/e"], ak.to_numpy(ak.flatten(full.jet.e)))
+    assert np.all(loaded["jet/id"] == ak.to_numpy(ak.flatten(full.jet.id)))
+    assert np.allclose(loaded["met"], ak.to_numpy(full.met))
+
+    # batches can only be streamed to a file
+    with pytest.raises(hf.errors.InputError):
+        hf.awkward_tools.awkward_to_hepfile(iter(all_batches), write_hepfile=False)
+
+    # and there has to be at least one batch
+    with pytest.raises(hf.errors.AwkwardStructureError):
+        hf.awkward_tools.awkward_to_hepfile(iter([]), outfile="awk-batch-test.h5")
@@ -145,3 +145,46 @@ def test_dict_append():
     }
     with pytest.raises(hf.errors.InputError):
         mod = hf.dict_tools.append(ak_dict, new_dict)
+
+
+def test_event_accumulator():
+    """
+    Unit tests for hepfile.dict_tools.EventAccumulator
+    """
+
+    d = [
+        {
+            "jet": {"px": [1, 2, 3], "py": [1, 2, 3]},
+            "other": "this",
+        },
+        {
+            "jet": {"px": [3, 4, 6, 7], "py": [3, 4, 6, 7]},
+            "other": "that",
+        },
+    ]
+
+    # start from scratch
+    acc = hf.dict_tools.EventAccumulator()
+    acc.extend(d)
+    acc.append({"jet": {"px": [10], "py": [0]}, "other": "new"})
+    assert len(acc) == 3
+
+    mod = acc.snapshot()
+    test1 = d[0]["jet"]["px"] + d[1]["jet"]["px"] + [10]
+    assert ak.all(ak.flatten(mod.jet.px) == test1)
+    assert ak.to_list(mod.other) == ["this", "that", "new"]
+
+    # start from an existing awkward array
+    acc = hf.dict_tools.EventAccumulator(ak.Array(d))
+    assert ak.to_list(acc.snapshot().other) == ["this", "that"]
+    acc.append({"jet": {"px": [10, 100], "py": [0, 0]}, "other": "new"})
+    assert len(acc) == 3
+    assert ak.to_list(acc.snapshot().jet.px[-1]) == [10, 100]
+
+    # write it out
+    data = acc.to_hepfile(write_hepfile=False)
+    assert np.all(data["jet/px"] == test1[:-1] + [10, 100])
+
+    # keys must match
+    with pytest.raises(hf.errors.InputError):
+        acc.append({"jet": {"px": [10], "py": [0]}})
@@ -101,6 +101,19 @@ def test_awkward_to_df():
     # check data integrity
     assert np.all(dfs.e.values == ak.flatten(data["jet"]["e"]))
 
+    # check the event numbers line up with the number of jets in each event
+    nums = ak.to_numpy(ak.num(data["jet"]["e"]))
+    assert np.all(dfs.event_num.values == np.repeat(np.arange(len(nums)), nums))
+
+    # the flat buffers should be shared with the awkward array
+    layout = ak.to_layout(data["jet"]["e"])
+    assert np.shares_memory(dfs.e.values, np.asarray(layout.content.data))
+
+    # slices of an awkward array should still give the right event numbers
+    dfs = hf.df_tools.awkward_to_df(data[3:], groups="jet")
+    assert np.all(dfs.e.values == ak.flatten(data["jet"]["e"][3:]))
+    assert np.all(dfs.event_num.values == np.repeat(np.arange(len(nums) - 3), nums[3:]))
+
     # now check with a subset
     dfs = hf.df_tools.awkward_to_df(data, events=1, groups="jet")
 
@@ -0,0 +1,107 @@
+"""
+Tests for arrow_tools.py
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import hepfile as hf
+import pytest
+
+
+def test_hepfile_to_arrow():
+    """
+    Test hepfile_to_arrow
+    """
+
+    data, _ = hf.load("FOR_TESTS.hdf5")
+    batch = hf.arrow_tools.hepfile_to_arrow(data)
+
+    assert batch.num_rows == hf.get_nbuckets_in_data(data)
+    for name in ["jet", "muons", "METpx", "METpy"]:
+        assert name in batch.schema.names
+
+    # groups are lists of structs with the counters as the list lengths
+    jet = batch.column("jet")
+    assert pa.types.is_list(jet.type)
+    assert np.all(np.diff(jet.offsets.to_numpy()) == data["jet/njet"])
+    assert np.all(jet.flatten().field("e").to_numpy() == data["jet/e"])
+    assert np.all(batch.column("METpx").to_numpy() == data["METpx"])
+
+    # the numeric buffers are shared with the data dictionary
+    assert np.shares_memory(jet.flatten().field("e").to_numpy(), data["jet/e"])
+
+    # just one group
+    batch = hf.arrow_tools.hepfile_to_arrow(data, groups="jet")
+    assert batch.schema.names == ["jet"]
+
+    with pytest.raises(hf.errors.InputError):
+        hf.arrow_tools.hepfile_to_arrow(data, groups="foo")
+
+
+def test_arrow_to_hepfile():
+    """
+    Test arrow_to_hepfile
+    """
+
+    data, _ = hf.load("FOR_TESTS.hdf5")
+    batch = hf.arrow_tools.hepfile_to_arrow(data)
+
+    newdata = hf.arrow_tools.arrow_to_hepfile(batch, outfile="arrow-test.h5")
+    assert np.all(newdata["jet/njet"] == data["jet/njet"])
+    assert np.all(newdata["jet/e"] == data["jet/e"])
+    assert np.all(newdata["METpy"] == data["METpy"])
+
+    loaded, _ = hf.load("arrow-test.h5")
+    assert np.all(loaded["muons/nmuons"] == data["muons/nmuon"])
+    assert np.all(loaded["jet/px"] == data["jet/px"])
+
+    # a sliced batch with strings
+    batch = pa.RecordBatch.from_pydict(
+        {
+            "jet": [[{"e": 1.0, "tag": "a"}], [], [{"e": 2.0, "tag": "b"}] * 2],
+            "run": ["x", "y", "z"],
+        }
+    )
+    newdata = hf.arrow_tools.arrow_to_hepfile(batch.slice(1), write_hepfile=False)
+    assert np.all(newdata["jet/njet"] == [0, 2])
+    assert np.all(newdata["jet/e"] == [2.0, 2.0])
+    assert list(newdata["jet/tag"]) == ["b", "b"]
+    assert list(newdata["run"]) == ["y", "z"]
+
+    # stream a few batches into one file
+    batches = [hf.arrow_tools.hepfile_to_arrow(data).slice(i, 3) for i in (0, 3, 6)]
+    hf.arrow_tools.arrow_to_hepfile(iter(batches), outfile="arrow-test.h5")
+    loaded, _ = hf.load("arrow-test.h5")
+    assert hf.get_nbuckets_in_file("arrow-test.h5") == 9
+    assert np.all(loaded["jet/e"] == data["jet/e"][: data["jet/njet"][:9].sum()])
+
+    # check the errors
+    with pytest.raises(hf.errors.InputError):
+        hf.arrow_tools.arrow_to_hepfile(batch)
+
+    with pytest.raises(hf.errors.InputError):
+        hf.arrow_tools.arrow_to_hepfile(iter(batches), write_hepfile=False)
+
+    with pytest.raises(hf.errors.InputError):
+        hf.arrow_tools.arrow_to_hepfile(
+            pa.RecordBatch.from_pydict({"x": [[1], [2]]}), write_hepfile=False
+        )
+
+
+def test_parquet():
+    """
+    Test streaming to and from parquet files
+    """
+
+    data, _ = hf.load("FOR_TESTS.hdf5")
+
+    hf.arrow_tools.hepfile_to_parquet("FOR_TESTS.hdf5", "test.parquet", batch_size=3)
+    table = pq.read_table("test.parquet")
+    assert table.num_rows == hf.get_nbuckets_in_data(data)
+
+    hf.arrow_tools.parquet_to_hepfile("test.parquet", "parquet-test.h5", batch_size=4)
+    loaded, _ = hf.load("parquet-test.h5")
+    assert hf.get_nbuckets_in_file("parquet-test.h5") == hf.get_nbuckets_in_data(data)
+    assert np.all(loaded["jet/njet"] == data["jet/njet"])
+    assert np.all(loaded["muons/e"] == data["muons/e"])
+    assert np.all(loaded["METpx"] == data["METpx"])
@@ -0,0 +1,67 @@
+"""
+Tests for synthetic.py
+"""
+import numpy as np
+import hepfile as hf
+import pytest
+
+
+def test_make_data():
+    """
+    Test make_data
+    """
+
+    data = hf.synthetic.make_data(1000, seed=42)
+
+    assert hf.get_nbuckets_in_data(data) == 1000
+    for group, spec in hf.synthetic.DEFAULT_SCHEMA.items():
+        assert group in data["_GROUPS_"]
+        if group == "_SINGLETONS_GROUP_":
+            continue
+
+        counter = f"{group}/{spec['counter']}"
+        for dataset in spec["datasets"]:
+            assert len(data[f"{group}/{dataset}"]) == data[counter].sum()
+
+    # sparse groups are empty in most buckets
+    assert np.mean(data["photons/nphoton"] > 0) < 0.2
+    assert data["jet/flavor"].dtype == np.int32
+    assert set(data["trigger"]) <= set(hf.synthetic.STRING_VALUES)
+
+    # the same seed gives the same data
+    again = hf.synthetic.make_data(1000, seed=42)
+    assert np.all(again["jet/e"] == data["jet/e"])
+
+    schema = {"hits": {"mean": 2, "datasets": {"x": np.float32}}}
+    data = hf.synthetic.make_data(10, schema=schema, seed=1)
+    assert data["_MAP_DATASETS_TO_COUNTERS_"]["hits"] == "hits/nhits"
+    assert data["hits/x"].dtype == np.float32
+
+    with pytest.raises(hf.errors.InputError):
+        hf.synthetic.make_data(10, schema={"hits": {"mean": 2}})
+
+    with pytest.raises(hf.errors.InputError):
+        hf.synthetic.make_data(10, schema={"hits": {"datasets": {"x": complex}}})
+
+
+def test_generate():
+    """
+    Test generate
+    """
+
+    outfile = hf.synthetic.generate("synthetic-test.h5", 2500, seed=7, chunk_size=1000)
+
+    assert hf.get_nbuckets_in_file(outfile) == 2500
+
+    data, _ = hf.load(outfile)
+    assert len(data["jet/e"]) == data["jet/njet"].sum()
+    assert len(data["METpx"]) == 2500
+
+    # the chunks continue the same random number stream
+    first = hf.synthetic.make_data(1000, seed=np.random.default_rng(7))
+    assert np.all(data["jet/njet"][:1000] == first["jet/njet"])
+
+    assert hf.synthetic.nbuckets_for_size(1e6) > hf.synthetic.nbuckets_for_size(1e5)
+
+    with pytest.raises(hf.errors.InputError):
+        hf.synthetic.generate("synthetic-test.h5", 10, chunk_size=0)